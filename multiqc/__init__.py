@@ -4,3 +4,14 @@ from multiqc.utils import config
 config.logger = logging.getLogger(__name__)
 
 __version__ = config.version
+
+def run(analysis_dir, **kwargs):
+    """
+    Run MultiQC from Python. Can be called many times in the same process,
+    each run gets fresh config settings and an empty report.
+    Takes the command line options and config settings as keyword arguments,
+    eg. multiqc.run('data/', title='My Report', force=True)
+    See multiqc.multiqc.MultiQCSession.run()
+    """
+    from multiqc.multiqc import get_default_session
+    return get_default_session().run(analysis_dir, **kwargs)
@@ -4,13 +4,14 @@
 
 from __future__ import print_function
 from collections import OrderedDict
-import io
 import fnmatch
+import io
 import logging
 import os
+import pickle
 import re
 
-from multiqc.utils import report, config, util_functions
+from multiqc.utils import report, config, parallel, parse_cache, profiler, search, util_functions
 logger = logging.getLogger(__name__)
 
 class BaseMultiqcModule(object):
@@ -31,9 +32,27 @@ class BaseMultiqcModule(object):
         self.intro = '<p>{} {}</p>{}'.format( mname, info, extra )
         self.sections = list()
 
+    def __getstate__(self):
+        """ Modules are pickled to send them back from worker processes (see
+        --processes). Leave out any attributes that can't be pickled, eg.
+        defaultdicts with lambda functions, as the report doesn't need them. """
+        try:
+            pickle.dumps(self.__dict__, pickle.HIGHEST_PROTOCOL)
+            return self.__dict__
+        except Exception:
+            state = dict()
+            for k, v in self.__dict__.items():
+                try:
+                    pickle.dumps(v, pickle.HIGHEST_PROTOCOL)
+                    state[k] = v
+                except Exception:
+                    logger.debug("Not sending back module attribute '{}' from worker process".format(k))
+            return state
+
     def find_log_files(self, sp_key, filecontents=True, filehandles=False):
         """
-        Return matches log files of interest.
+        Return matches log files of interest. If the file search is
+        still running in the background, waits for new files to be found.
         :param sp_key: Search pattern key specified in config
         :param filehandles: Set to true to return a file handle instead of slurped file contents
         :return: Yields a dict with filename (fn), root directory (root), cleaned sample name
@@ -44,6 +63,7 @@ class BaseMultiqcModule(object):
 
         # Old, depreciated syntax support. Likely to be removed in a future version.
         if isinstance(sp_key, dict):
+            report.wait_for_search()
             report.files[self.name] = list()
             for sf in report.searchfiles:
                 if report.search_file(sp_key, {'fn': sf[0], 'root': sf[1]}):
@@ -58,24 +78,123 @@ class BaseMultiqcModule(object):
             logger.warn("Did not understand find_log_files() search key")
             return
 
-        for f in report.files[sp_key]:
+        for f in report.iter_files(sp_key):
             # Make a sample name from the filename
             f['s_name'] = self.clean_s_name(f['fn'], f['root'])
+            if filehandles or filecontents:
+                # Trace events cover reading the file and the module's work on it
+                with profiler.span(f['fn'], 'log_file', module=self.name, key=sp_key):
+                    try:
+                        with io.TextIOWrapper(report.open_found_file(f), encoding='utf-8') as fh:
+                            if filehandles:
+                                f['f'] = fh
+                                yield f
+                            elif filecontents:
+                                f['f'] = fh.read()
+                                yield f
+                    except search.READ_ERRORS + (UnicodeDecodeError,):
+                        if config.report_readerrors:
+                            logger.debug("Couldn't open filehandle when returning file: {}".format(f['fn']))
+                            f['f'] = None
+            else:
+                yield f
+
+    def map_log_files(self, sp_key, parser, workers=None, filecontents=True, filehandles=False, section=None):
+        """
+        Read and parse log files of interest with a pool of workers. Each worker
+        process or thread reads and parses files on its own, and the results are
+        collected here in the order that the files were found.
+        :param sp_key: Search pattern key specified in config
+        :param parser: Function called with each file dict, as yielded by find_log_files().
+                       Should return a dict of parsed data keyed by sample name, or None.
+                       It may run in a separate process, so can't change the module.
+        :param workers: Number of workers. Default: config.parse_workers
+        :param filecontents: Set to false to leave reading the file to the parser
+        :param filehandles: Set to true to give the parser a file handle instead of file contents
+        :param section: Section name for the data sources
+        :return: Dict of parsed data keyed by sample name. Data sources are added for each sample.
+        """
+        if workers is None:
+            workers = config.parse_workers
+
+        def read_and_parse(f):
+            f = dict(f)
             if filehandles or filecontents:
                 try:
-                    with io.open (os.path.join(f['root'],f['fn']), "r", encoding='utf-8') as fh:
-                        if filehandles:
-                            f['f'] = fh
-                            yield f
-                        elif filecontents:
-                            f['f'] = fh.read()
-                            yield f
-                except (IOError, OSError, ValueError, UnicodeDecodeError):
+                    fh = io.TextIOWrapper(report.open_found_file(f), encoding='utf-8')
+                    if not filehandles:
+                        with fh:
+                            fh = fh.read()
+                except search.READ_ERRORS + (UnicodeDecodeError,):
                     if config.report_readerrors:
                         logger.debug("Couldn't open filehandle when returning file: {}".format(f['fn']))
-                        f['f'] = None
+                    return f, None
+                f['f'] = fh
+                try:
+                    parsed = parser(f)
+                finally:
+                    if filehandles:
+                        fh.close()
             else:
-                yield f
+                parsed = parser(f)
+            f.pop('f', None)
+            return f, parsed
+
+        # Files parsed in a previous run that is being updated (--update)
+        previous = report.previous_parsed_log_files.get((self.name, sp_key), dict())
+        results = list()
+        for path, json_data in previous.items():
+            report.add_parsed_log_file(self.name, sp_key, path, json_data=json_data)
+            results.append(({'root': os.path.dirname(path), 'fn': os.path.basename(path)}, report.from_json_data(json_data)))
+
+        files = self.find_log_files(sp_key, filecontents=False)
+        if len(previous) > 0:
+            files = [ f for f in files if os.path.abspath(os.path.join(f['root'], f['fn'])) not in previous ]
+        if config.parse_cache is not None:
+            new_results = self.map_cached_log_files(sp_key, parser, read_and_parse, files, workers)
+        else:
+            new_results = parallel.map_files(read_and_parse, files, workers)
+        for f, parsed in new_results:
+            if parsed:
+                report.add_parsed_log_file(self.name, sp_key, os.path.abspath(os.path.join(f['root'], f['fn'])), parsed)
+        results.extend(new_results)
+
+        parsed_data = dict()
+        for f, parsed in results:
+            for s_name, d in (parsed or {}).items():
+                if s_name in parsed_data:
+                    logger.debug("Duplicate sample name found in {}! Overwriting: {}".format(f['fn'], s_name))
+                self.add_data_source(f, s_name, section=section)
+                parsed_data[s_name] = d
+        return parsed_data
+
+    def map_cached_log_files(self, sp_key, parser, read_and_parse, files, workers):
+        """
+        Use parsed data from the parse cache for files that haven't changed
+        since they were last parsed, and only parse the rest. Called by
+        map_log_files() when the parse_cache config option is set.
+        :return: List of (file dict, parsed data) tuples, in the order that files were found
+        """
+        cache = parse_cache.ParseCache(config.parse_cache, self.anchor, sp_key, parser)
+        results = list()
+        to_parse = list()
+        for f in files:
+            try:
+                key = cache.file_key(f)
+                found, parsed = cache.get(key)
+            except (IOError, OSError):
+                key, found = None, False
+            results.append([f, parsed if found else None])
+            if not found:
+                to_parse.append((len(results) - 1, key, f))
+        new_results = parallel.map_files(read_and_parse, [ f for i, key, f in to_parse ], workers)
+        for (i, key, f), (parsed_f, parsed) in zip(to_parse, new_results):
+            results[i][1] = parsed
+            # Files that gave no data are cheap to parse, and may depend on other files
+            if key is not None and parsed:
+                cache.set(key, parsed)
+        logger.info("{}: Parsed data cache for '{}': {} hits, {} misses".format(self.name, sp_key, cache.hits, len(to_parse)))
+        return results
 
     def add_section(self, name=None, anchor=None, description='', helptext='', plot='', content='', autoformat=True):
         """ Add a section to the module report output """
@@ -23,10 +23,8 @@ class StatsReportMixin():
           input filename for each set as the name.
         """
 
-        self.bcftools_stats = dict()
-        self.bcftools_stats_indels = dict()
-        depth_data = dict()
-        for f in self.find_log_files('bcftools/stats'):
+        def parse_stats(f):
+            parsed_data = dict()
             s_names = list()
             for line in f['f'].splitlines():
                 s = line.split("\t")
@@ -34,13 +32,10 @@ class StatsReportMixin():
                 if s[0] == "ID":
                     s_name = self.clean_s_name(s[2], f['root'])
                     s_names.append(s_name)
-                    if s_name in self.bcftools_stats:
+                    if s_name in parsed_data:
                         log.debug("Duplicate sample name found! Overwriting: {}".format(s_name))
-                    self.add_data_source(f, s_name, section='stats')
-                    self.bcftools_stats[s_name] = dict()
-                    self.bcftools_stats_indels[s_name] = dict()
-                    depth_data[s_name] = OrderedDict()
-                    self.bcftools_stats_indels[s_name][0] = None # Avoid joining line across missing 0
+                    parsed_data[s_name] = {'stats': dict(), 'indels': dict(), 'depth': OrderedDict()}
+                    parsed_data[s_name]['indels'][0] = None # Avoid joining line across missing 0
 
                 # Parse key stats
                 if s[0] == "SN" and len(s_names) > 0:
@@ -48,44 +43,54 @@ class StatsReportMixin():
                     field = s[2].strip()[:-1]
                     field = field.replace(' ', '_')
                     value = float(s[3].strip())
-                    self.bcftools_stats[s_name][field] = value
+                    parsed_data[s_name]['stats'][field] = value
 
                 # Parse transitions/transversions stats
                 if s[0] == "TSTV" and len(s_names) > 0:
                     s_name = s_names[int(s[1])]
                     fields = ['ts', 'tv', 'tstv', 'ts_1st_ALT', 'tv_1st_ALT', 'tstv_1st_ALT']
-                    for i, f in enumerate(fields):
+                    for i, field in enumerate(fields):
                         value = float(s[i+2].strip())
 
-                        self.bcftools_stats[s_name][f] = value
+                        parsed_data[s_name]['stats'][field] = value
 
                 # Parse substitution types
                 if s[0] == "ST" and len(s_names) > 0:
                     s_name = s_names[int(s[1])]
                     field = 'substitution_type_{}'.format(s[2].strip())
                     value = float(s[3].strip())
-                    self.bcftools_stats[s_name][field] = value
+                    parsed_data[s_name]['stats'][field] = value
 
                 # Indel length distributions
                 if s[0] == "IDD" and len(s_names) > 0:
                     s_name = s_names[int(s[1])]
                     length = float(s[2].strip())
                     count = float(s[3].strip())
-                    self.bcftools_stats_indels[s_name][length] = count
+                    parsed_data[s_name]['indels'][length] = count
 
                 # Per-sample counts
                 if s[0] == "PSC" and len(s_names) > 0:
                     s_name = s_names[int(s[1])]
                     fields = ['variations_hom', 'variations_het']
-                    for i, f in enumerate(fields):
-                        self.bcftools_stats[s_name][f] = int(s[i + 4].strip())
+                    for i, field in enumerate(fields):
+                        parsed_data[s_name]['stats'][field] = int(s[i + 4].strip())
 
                 # Depth plots
                 if s[0] == "DP" and len(s_names) > 0:
                     s_name = s_names[int(s[1])]
                     bin_name = s[2].strip()
                     percent_sites = float(s[-1].strip())
-                    depth_data[s_name][bin_name] = percent_sites
+                    parsed_data[s_name]['depth'][bin_name] = percent_sites
+
+            return parsed_data
+
+        self.bcftools_stats = dict()
+        self.bcftools_stats_indels = dict()
+        depth_data = dict()
+        for s_name, d in self.map_log_files('bcftools/stats', parse_stats, section='stats').items():
+            self.bcftools_stats[s_name] = d['stats']
+            self.bcftools_stats_indels[s_name] = d['indels']
+            depth_data[s_name] = d['depth']
 
         # Filter to strip out ignored sample names
         self.bcftools_stats = self.ignore_samples(self.bcftools_stats)
@@ -10,6 +10,7 @@ import re
 from multiqc import config
 from multiqc.plots import bargraph
 from multiqc.modules.base_module import BaseMultiqcModule
+from multiqc.utils import search
 
 # Initialise the logger
 log = logging.getLogger(__name__)
@@ -38,7 +39,7 @@ class MultiqcModule(BaseMultiqcModule):
             'bowtie.right_kept_reads.m2g_um_seg2.log'
         ]
         for f in self.find_log_files('bowtie'):
-            if f['fn'] in fn_ignore:
+            if search.strip_compression_ext(f['fn']) in fn_ignore:
                 log.debug('Skipping file because looks like tophat log: {}/{}'.format(f['root'], f['fn']))
                 continue
             # Check that this isn't actually Bismark using bowtie
@@ -10,7 +10,7 @@ import os
 import yaml
 
 from multiqc import config
-from multiqc.utils import report
+from multiqc.utils import report, search
 from multiqc.modules.base_module import BaseMultiqcModule
 from multiqc.plots import table, bargraph, linegraph, scatter, heatmap, beeswarm
 
@@ -66,7 +66,7 @@ def custom_module_classes():
     for k in search_patterns:
         for f in bm.find_log_files(k):
 
-            f_extension = os.path.splitext(f['fn'])[1]
+            f_extension = os.path.splitext(search.strip_compression_ext(f['fn']))[1]
 
             # YAML and JSON files are the easiest
             parsed_data = None
@@ -285,7 +285,7 @@ def _guess_file_format(f):
     eg. if tab, all 10 lines should have x columns when split by tab.
     Returns: csv | tsv | spaces   (spaces by default if all else fails)
     """
-    filename, file_extension = os.path.splitext(f['fn'])
+    filename, file_extension = os.path.splitext(search.strip_compression_ext(f['fn']))
     tabs = []
     commas = []
     spaces = []
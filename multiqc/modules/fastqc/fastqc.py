@@ -20,6 +20,7 @@ import re
 import zipfile
 
 from multiqc import config
+from multiqc.utils import report
 from multiqc.plots import linegraph, bargraph
 from multiqc.modules.base_module import BaseMultiqcModule
 
@@ -36,36 +37,20 @@ class MultiqcModule(BaseMultiqcModule):
         info="is a quality control tool for high throughput sequence data,"\
         " written by Simon Andrews at the Babraham Institute in Cambridge.")
 
-        self.fastqc_data = dict()
-
         # Find and parse unzipped FastQC reports
-        for f in self.find_log_files('fastqc/data'):
-            s_name = self.clean_s_name(os.path.basename(f['root']), os.path.dirname(f['root']))
-            self.parse_fastqc_report(f['f'], s_name, f)
+        self.fastqc_data = self.map_log_files('fastqc/data', self.parse_fastqc_data)
+        parsed = list(self.fastqc_data.values())
 
         # Find and parse zipped FastQC reports
-        for f in self.find_log_files('fastqc/zip', filecontents=False):
-            s_name = f['fn']
-            if s_name.endswith('_fastqc.zip'):
-                s_name = s_name[:-11]
-            # Skip if we already have this report - parsing zip files is slow..
-            if s_name in self.fastqc_data.keys():
-                log.debug("Skipping '{}' as already parsed '{}'".format(f['fn'], s_name))
-                continue
-            try:
-                fqc_zip = zipfile.ZipFile(os.path.join(f['root'], f['fn']))
-            except Exception as e:
-                log.warn("Couldn't read '{}' - Bad zip file".format(f['fn']))
-                log.debug("Bad zip file error:\n{}".format(e))
-                continue
-            # FastQC zip files should have just one directory inside, containing report
-            d_name = fqc_zip.namelist()[0]
-            try:
-                with fqc_zip.open(os.path.join(d_name, 'fastqc_data.txt')) as fh:
-                    r_data = fh.read().decode('utf8')
-                    self.parse_fastqc_report(r_data, s_name, f)
-            except KeyError:
-                log.warning("Error - can't find fastqc_raw_data.txt in {}".format(f))
+        for s_name, d in self.map_log_files('fastqc/zip', self.parse_fastqc_zip, filecontents=False).items():
+            if s_name in self.fastqc_data:
+                log.debug("Duplicate sample name found! Overwriting: {}".format(s_name))
+            self.fastqc_data[s_name] = d
+            parsed.append(d)
+
+        # Remember the order of the duplication keys, from the last report parsed
+        for d in parsed:
+            self.dup_keys = d.pop('dup_keys')
 
         # Filter to strip out ignored sample names
         self.fastqc_data = self.ignore_samples(self.fastqc_data)
@@ -114,25 +99,51 @@ class MultiqcModule(BaseMultiqcModule):
         self.overrepresented_sequences()
         self.adapter_content_plot()
 
+    def parse_fastqc_data(self, f):
+        """ Parse an unzipped fastqc_data.txt file, for map_log_files() """
+        s_name = self.clean_s_name(os.path.basename(f['root']), os.path.dirname(f['root']))
+        return self.parse_fastqc_report(f['f'], s_name, f)
+
+    def parse_fastqc_zip(self, f):
+        """ Parse fastqc_data.txt from inside a FastQC zip file, for map_log_files() """
+        s_name = f['fn']
+        if s_name.endswith('_fastqc.zip'):
+            s_name = s_name[:-11]
+        # Skip if we already have this report - parsing zip files is slow..
+        if s_name in self.fastqc_data.keys():
+            log.debug("Skipping '{}' as already parsed '{}'".format(f['fn'], s_name))
+            return None
+        try:
+            fqc_zip = zipfile.ZipFile(report.open_found_file(f))
+        except Exception as e:
+            log.warn("Couldn't read '{}' - Bad zip file".format(f['fn']))
+            log.debug("Bad zip file error:\n{}".format(e))
+            return None
+        # FastQC zip files should have just one directory inside, containing report
+        d_name = fqc_zip.namelist()[0]
+        try:
+            with fqc_zip.open(os.path.join(d_name, 'fastqc_data.txt')) as fh:
+                r_data = fh.read().decode('utf8')
+                return self.parse_fastqc_report(r_data, s_name, f)
+        except KeyError:
+            log.warning("Error - can't find fastqc_raw_data.txt in {}".format(f))
+
     def parse_fastqc_report(self, file_contents, s_name=None, f=None):
         """ Takes contents from a fastq_data.txt file and parses out required
-        statistics and data. Returns a dict with keys 'stats' and 'data'.
-        Data is for plotting graphs, stats are for top table. """
+        statistics and data. Returns a dict with the parsed data for the sample,
+        keyed by sample name. The order of the duplication level keys is kept
+        in 'dup_keys'. """
 
         # Make the sample name from the input filename if we find it
         fn_search = re.search(r"Filename\s+(.+)", file_contents)
         if fn_search:
             s_name = self.clean_s_name(fn_search.group(1) , f['root'])
 
-        if s_name in self.fastqc_data.keys():
-            log.debug("Duplicate sample name found! Overwriting: {}".format(s_name))
-        self.add_data_source(f, s_name)
-        self.fastqc_data[s_name] = { 'statuses': dict() }
+        data = { 'statuses': dict(), 'dup_keys': list() }
 
         # Parse the report
         section = None
         s_headers = None
-        self.dup_keys = []
         for l in file_contents.splitlines():
             if l == '>>END_MODULE':
                 section = None
@@ -140,13 +151,13 @@ class MultiqcModule(BaseMultiqcModule):
             elif l.startswith('>>'):
                 (section, status) = l[2:].split("\t", 1)
                 section = section.lower().replace(' ', '_')
-                self.fastqc_data[s_name]['statuses'][section] = status
+                data['statuses'][section] = status
             elif section is not None:
                 if l.startswith('#'):
                     s_headers = l[1:].split("\t")
                     # Special case: Total Deduplicated Percentage header line
                     if s_headers[0] == 'Total Deduplicated Percentage':
-                        self.fastqc_data[s_name]['basic_statistics'].append({
+                        data['basic_statistics'].append({
                             'measure': 'total_deduplicated_percentage',
                             'value': float(s_headers[1])
                         })
@@ -155,7 +166,7 @@ class MultiqcModule(BaseMultiqcModule):
                         if s_headers[1] == 'Relative count':
                             s_headers[1] = 'Percentage of total'
                         s_headers = [s.lower().replace(' ', '_') for s in s_headers]
-                        self.fastqc_data[s_name][section] = list()
+                        data[section] = list()
 
                 elif s_headers is not None:
                     s = l.split("\t")
@@ -167,25 +178,27 @@ class MultiqcModule(BaseMultiqcModule):
                         except ValueError:
                             pass
                         row[s_headers[i]] = v
-                    self.fastqc_data[s_name][section].append(row)
+                    data[section].append(row)
                     # Special case - need to remember order of duplication keys
                     if section == 'sequence_duplication_levels':
                         try:
-                            self.dup_keys.append(float(s[0]))
+                            data['dup_keys'].append(float(s[0]))
                         except ValueError:
-                            self.dup_keys.append(s[0])
+                            data['dup_keys'].append(s[0])
 
         # Tidy up the Basic Stats
-        self.fastqc_data[s_name]['basic_statistics'] = {d['measure']: d['value'] for d in self.fastqc_data[s_name]['basic_statistics']}
+        data['basic_statistics'] = {d['measure']: d['value'] for d in data['basic_statistics']}
 
         # Calculate the average sequence length (Basic Statistics gives a range)
         length_bp = 0
         total_count = 0
-        for d in self.fastqc_data[s_name].get('sequence_length_distribution', {}):
+        for d in data.get('sequence_length_distribution', {}):
             length_bp += d['count'] * self.avg_bp_from_range(d['length'])
             total_count += d['count']
         if total_count > 0:
-            self.fastqc_data[s_name]['basic_statistics']['avg_sequence_length'] = length_bp / total_count
+            data['basic_statistics']['avg_sequence_length'] = length_bp / total_count
+
+        return { s_name: data }
 
     def fastqc_general_stats(self):
         """ Add some single-number stats to the basic statistics
@@ -9,6 +9,7 @@ import logging
 from multiqc import config
 from multiqc.plots import bargraph
 from multiqc.modules.base_module import BaseMultiqcModule
+from multiqc.utils import search
 
 # Initialise the logger
 log = logging.getLogger(__name__)
@@ -78,7 +79,7 @@ class MultiqcModule(BaseMultiqcModule):
 
     def parse_hicup_logs(self, f):
         """ Parse a HiCUP summary report """
-        if not f['fn'].endswith('.txt'):
+        if not search.strip_compression_ext(f['fn']).endswith('.txt'):
             return None
         header = []
         lines = f['f'].splitlines()
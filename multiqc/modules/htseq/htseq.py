@@ -30,6 +30,9 @@ class MultiqcModule(BaseMultiqcModule):
         for f in self.find_log_files('htseq', filehandles=True):
             parsed_data = self.parse_htseq_report(f)
             if parsed_data is not None:
+                if f['s_name'] in self.htseq_data:
+                    log.debug("Duplicate sample name found! Overwriting: {}".format(f['s_name']))
+                self.add_data_source(f)
                 self.htseq_data[f['s_name']] = parsed_data
 
         # Filter to strip out ignored sample names
@@ -52,7 +55,8 @@ class MultiqcModule(BaseMultiqcModule):
 
 
     def parse_htseq_report (self, f):
-        """ Parse the HTSeq Count log file. """
+        """ Parse the HTSeq Count log file. The assigned count is the sum of
+        the gene table, so the whole file is read in a single pass. """
         keys = [ '__no_feature', '__ambiguous', '__too_low_aQual', '__not_aligned', '__alignment_not_unique' ]
         parsed_data = dict()
         assigned_counts = 0
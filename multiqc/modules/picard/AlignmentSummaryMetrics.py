@@ -15,11 +15,8 @@ log = logging.getLogger(__name__)
 def parse_reports(self):
     """ Find Picard AlignmentSummaryMetrics reports and parse their data """
 
-    # Set up vars
-    self.picard_alignment_metrics = dict()
-
     # Go through logs and find Metrics
-    for f in self.find_log_files('picard/alignment_metrics', filehandles=True):
+    def parse_log(f):
         parsed_data = dict()
         s_name = None
         keys = None
@@ -56,13 +53,9 @@ def parse_reports(self):
         for s_name in list(parsed_data.keys()):
             if len(parsed_data[s_name]) == 0:
                 parsed_data.pop(s_name, None)
+        return parsed_data
 
-        # Manipulate sample names if multiple baits found
-        for s_name in parsed_data.keys():
-            if s_name in self.picard_alignment_metrics:
-                log.debug("Duplicate sample name found in {}! Overwriting: {}".format(f['fn'], s_name))
-            self.add_data_source(f, s_name, section='AlignmentSummaryMetrics')
-            self.picard_alignment_metrics[s_name] = parsed_data[s_name]
+    self.picard_alignment_metrics = self.map_log_files('picard/alignment_metrics', parse_log, filehandles=True, section='AlignmentSummaryMetrics')
 
     # Filter to strip out ignored sample names
     self.picard_alignment_metrics = self.ignore_samples(self.picard_alignment_metrics)
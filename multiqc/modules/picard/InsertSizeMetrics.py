@@ -16,13 +16,9 @@ log = logging.getLogger(__name__)
 def parse_reports(self):
     """ Find Picard InsertSizeMetrics reports and parse their data """
 
-    # Set up vars
-    self.picard_insertSize_data = dict()
-    self.picard_insertSize_histogram = dict()
-    self.picard_insertSize_samplestats = dict()
-
     # Go through logs and find Metrics
-    for f in self.find_log_files('picard/insertsize', filehandles=True):
+    def parse_log(f):
+        parsed_data = dict()
         s_name = None
         in_hist = False
         for l in f['f']:
@@ -33,8 +29,8 @@ def parse_reports(self):
                     sections = l.split("\t")
                     ins = int(sections[0])
                     tot_count = sum( [int(x) for x in sections[1:]] )
-                    self.picard_insertSize_histogram[s_name][ins] = tot_count
-                    self.picard_insertSize_samplestats[s_name]['total_count'] += tot_count
+                    parsed_data[s_name]['histogram'][ins] = tot_count
+                    parsed_data[s_name]['samplestats']['total_count'] += tot_count
                 except ValueError:
                     # Reset in case we have more in this log file
                     s_name = None
@@ -51,30 +47,30 @@ def parse_reports(self):
 
             if s_name is not None:
                 if 'InsertSizeMetrics' in l and '## METRICS CLASS' in l:
-                    if s_name in self.picard_insertSize_data:
+                    if s_name in parsed_data:
                         log.debug("Duplicate sample name found in {}! Overwriting: {}".format(f['fn'], s_name))
-                    self.add_data_source(f, s_name, section='InsertSizeMetrics')
                     keys = f['f'].readline().strip("\n").split("\t")
                     vals = f['f'].readline().strip("\n").split("\t")
-                    self.picard_insertSize_samplestats[s_name] = {'total_count': 0, 'meansum':0, 'total_pairs':0 }
+                    rows = OrderedDict()
+                    samplestats = {'total_count': 0, 'meansum':0, 'total_pairs':0 }
                     orientation_idx = keys.index('PAIR_ORIENTATION')
                     while len(vals) == len(keys):
                         pair_orientation = vals[orientation_idx]
                         rowkey = '{}_{}'.format(s_name, pair_orientation)
-                        self.picard_insertSize_data[rowkey] = OrderedDict()
-                        self.picard_insertSize_data[rowkey]['SAMPLE_NAME'] = s_name
+                        rows[rowkey] = OrderedDict()
+                        rows[rowkey]['SAMPLE_NAME'] = s_name
                         for i, k in enumerate(keys):
                             try:
-                                self.picard_insertSize_data[rowkey][k] = float(vals[i])
+                                rows[rowkey][k] = float(vals[i])
                             except ValueError:
-                                self.picard_insertSize_data[rowkey][k] = vals[i]
+                                rows[rowkey][k] = vals[i]
                             except IndexError:
                                 pass # missing data
                         # Add to mean sums
-                        rp = self.picard_insertSize_data[rowkey]['READ_PAIRS']
-                        mis = self.picard_insertSize_data[rowkey]['MEAN_INSERT_SIZE']
-                        self.picard_insertSize_samplestats[s_name]['meansum'] += (rp * mis)
-                        self.picard_insertSize_samplestats[s_name]['total_pairs'] += rp
+                        rp = rows[rowkey]['READ_PAIRS']
+                        mis = rows[rowkey]['MEAN_INSERT_SIZE']
+                        samplestats['meansum'] += (rp * mis)
+                        samplestats['total_pairs'] += rp
 
                         vals = f['f'].readline().strip("\n").split("\t")
 
@@ -82,16 +78,20 @@ def parse_reports(self):
                     l = f['f'].readline().strip("\n")
                     l = f['f'].readline().strip("\n")
 
-                    self.picard_insertSize_histogram[s_name] = dict()
+                    parsed_data[s_name] = {'rows': rows, 'histogram': dict(), 'samplestats': samplestats}
                     in_hist = True
+        return parsed_data
 
-        for key in list(self.picard_insertSize_data.keys()):
-            if len(self.picard_insertSize_data[key]) == 0:
-                self.picard_insertSize_data.pop(key, None)
-        for s_name in list(self.picard_insertSize_histogram.keys()):
-            if len(self.picard_insertSize_histogram[s_name]) == 0:
-                self.picard_insertSize_histogram.pop(s_name, None)
-                log.debug("Ignoring '{}' histogram as no data parsed".format(s_name))
+    self.picard_insertSize_data = dict()
+    self.picard_insertSize_histogram = dict()
+    self.picard_insertSize_samplestats = dict()
+    for s_name, parsed in self.map_log_files('picard/insertsize', parse_log, filehandles=True, section='InsertSizeMetrics').items():
+        self.picard_insertSize_data.update(parsed['rows'])
+        self.picard_insertSize_samplestats[s_name] = parsed['samplestats']
+        if len(parsed['histogram']) > 0:
+            self.picard_insertSize_histogram[s_name] = parsed['histogram']
+        else:
+            log.debug("Ignoring '{}' histogram as no data parsed".format(s_name))
 
     # Calculate summed mean values for all read orientations
     for s_name, v in self.picard_insertSize_samplestats.items():
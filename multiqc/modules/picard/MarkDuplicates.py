@@ -16,11 +16,9 @@ log = logging.getLogger(__name__)
 def parse_reports(self):
     """ Find Picard MarkDuplicates reports and parse their data """
 
-    # Set up vars
-    self.picard_dupMetrics_data = dict()
-
     # Go through logs and find Metrics
-    for f in self.find_log_files('picard/markdups', filehandles=True):
+    def parse_log(f):
+        parsed_data = dict()
         s_name = None
         for l in f['f']:
             # New log starting
@@ -35,29 +33,30 @@ def parse_reports(self):
 
             if s_name is not None:
                 if 'picard.sam.DuplicationMetrics' in l and '## METRICS CLASS' in l:
-                    if s_name in self.picard_dupMetrics_data:
+                    if s_name in parsed_data:
                         log.debug("Duplicate sample name found in {}! Overwriting: {}".format(f['fn'], s_name))
-                    self.add_data_source(f, s_name, section='DuplicationMetrics')
-                    self.picard_dupMetrics_data[s_name] = dict()
+                    parsed_data[s_name] = dict()
                     keys = f['f'].readline().rstrip("\n").split("\t")
                     vals = f['f'].readline().rstrip("\n").split("\t")
                     for i, k in enumerate(keys):
                         try:
-                            self.picard_dupMetrics_data[s_name][k] = float(vals[i])
+                            parsed_data[s_name][k] = float(vals[i])
                         except ValueError:
-                            self.picard_dupMetrics_data[s_name][k] = vals[i]
+                            parsed_data[s_name][k] = vals[i]
                     # Check that this sample had some reads
-                    if self.picard_dupMetrics_data[s_name].get('READ_PAIRS_EXAMINED', 0) == 0 and \
-                       self.picard_dupMetrics_data[s_name].get('UNPAIRED_READS_EXAMINED', 0) == 0:
-                        self.picard_dupMetrics_data.pop(s_name, None)
+                    if parsed_data[s_name].get('READ_PAIRS_EXAMINED', 0) == 0 and \
+                       parsed_data[s_name].get('UNPAIRED_READS_EXAMINED', 0) == 0:
+                        parsed_data.pop(s_name, None)
                         log.warn("Skipping MarkDuplicates sample '{}' as log contained no reads".format(s_name))
                     s_name = None
 
-        for s_name in list(self.picard_dupMetrics_data.keys()):
-            if len(self.picard_dupMetrics_data[s_name]) == 0:
-                self.picard_dupMetrics_data.pop(s_name, None)
+        for s_name in list(parsed_data.keys()):
+            if len(parsed_data[s_name]) == 0:
+                parsed_data.pop(s_name, None)
                 log.debug("Removing {} as no data parsed".format(s_name))
+        return parsed_data
 
+    self.picard_dupMetrics_data = self.map_log_files('picard/markdups', parse_log, filehandles=True, section='DuplicationMetrics')
 
     # Filter to strip out ignored sample names
     self.picard_dupMetrics_data = self.ignore_samples(self.picard_dupMetrics_data)
@@ -29,28 +29,44 @@ def parse_reports(self):
     self.covs = covs
 
     # General stats - genome_results.txt
-    self.qualimap_bamqc_genome_results = dict()
-    for f in self.find_log_files('qualimap/bamqc/genome_results'):
-        parse_genome_results(self, f)
+    self.qualimap_bamqc_genome_results = self.map_log_files('qualimap/bamqc/genome_results',
+        lambda f: parse_genome_results(self, f), section='genome_results')
+    for s_name, d in self.qualimap_bamqc_genome_results.items():
+        # Add to general stats table
+        try:
+            self.general_stats_data[s_name]['total_reads'] = d['total_reads']
+            self.general_stats_data[s_name]['mapped_reads'] = d['mapped_reads']
+            self.general_stats_data[s_name]['percentage_aligned'] = d['percentage_aligned']
+        except KeyError:
+            pass
     self.qualimap_bamqc_genome_results = self.ignore_samples(self.qualimap_bamqc_genome_results)
 
     # Coverage - coverage_histogram.txt
     self.qualimap_bamqc_coverage_hist = dict()
-    for f in self.find_log_files('qualimap/bamqc/coverage', filehandles=True):
-        parse_coverage(self, f)
+    for s_name, d in self.map_log_files('qualimap/bamqc/coverage', lambda f: parse_coverage(self, f),
+                                        filehandles=True, section='coverage_histogram').items():
+        self.general_stats_data[s_name]['median_coverage'] = d['median_coverage']
+        self.qualimap_bamqc_coverage_hist[s_name] = d['hist']
     self.qualimap_bamqc_coverage_hist = self.ignore_samples(self.qualimap_bamqc_coverage_hist)
 
     # Insert size - insert_size_histogram.txt
     self.qualimap_bamqc_insert_size_hist = dict()
-    for f in self.find_log_files('qualimap/bamqc/insert_size', filehandles=True):
-        parse_insert_size(self, f)
+    for s_name, d in self.map_log_files('qualimap/bamqc/insert_size', lambda f: parse_insert_size(self, f),
+                                        filehandles=True, section='insert_size_histogram').items():
+        self.general_stats_data[s_name]['median_insert_size'] = d['median_insert_size']
+        self.qualimap_bamqc_insert_size_hist[s_name] = d['hist']
     self.qualimap_bamqc_insert_size_hist = self.ignore_samples(self.qualimap_bamqc_insert_size_hist)
 
     # GC distribution - mapped_reads_gc-content_distribution.txt
     self.qualimap_bamqc_gc_content_dist = dict()
     self.qualimap_bamqc_gc_by_species = dict()  # {'HUMAN': data_dict, 'MOUSE': data_dict}
-    for f in self.find_log_files('qualimap/bamqc/gc_dist', filehandles=True):
-        parse_gc_dist(self, f)
+    for s_name, d in self.map_log_files('qualimap/bamqc/gc_dist', lambda f: parse_gc_dist(self, f),
+                                        filehandles=True, section='mapped_gc_distribution').items():
+        self.general_stats_data[s_name]['avg_gc'] = d['avg_gc']
+        self.qualimap_bamqc_gc_content_dist[s_name] = d['gc_dist']
+        species = d['reference_species']
+        if species and species not in self.qualimap_bamqc_gc_by_species:
+            self.qualimap_bamqc_gc_by_species[species] = d['reference_gc_dist']
     self.qualimap_bamqc_gc_by_species = self.ignore_samples(self.qualimap_bamqc_gc_by_species)
 
     # Make the plots for the report
@@ -91,20 +107,13 @@ def parse_genome_results(self, f):
     # Get a nice sample name
     s_name = self.clean_s_name(d['bam_file'], f['root'])
 
-    # Add to general stats table & calculate a nice % aligned
+    # Calculate a nice % aligned
     try:
-        self.general_stats_data[s_name]['total_reads'] = d['total_reads']
-        self.general_stats_data[s_name]['mapped_reads'] = d['mapped_reads']
         d['percentage_aligned'] = (d['mapped_reads'] / d['total_reads'])*100
-        self.general_stats_data[s_name]['percentage_aligned'] = d['percentage_aligned']
     except KeyError:
         pass
 
-    # Save results
-    if s_name in self.qualimap_bamqc_genome_results:
-        log.debug("Duplicate genome results sample name found! Overwriting: {}".format(s_name))
-    self.qualimap_bamqc_genome_results[s_name] = d
-    self.add_data_source(f, s_name=s_name, section='genome_results')
+    return {s_name: d}
 
 
 def parse_coverage(self, f):
@@ -135,13 +144,8 @@ def parse_coverage(self, f):
         if cum_counts >= num_counts/2:
             median_coverage = thiscov
             break
-    self.general_stats_data[s_name]['median_coverage'] = median_coverage
 
-    # Save results
-    if s_name in self.qualimap_bamqc_coverage_hist:
-        log.debug("Duplicate coverage histogram sample name found! Overwriting: {}".format(s_name))
-    self.qualimap_bamqc_coverage_hist[s_name] = d
-    self.add_data_source(f, s_name=s_name, section='coverage_histogram')
+    return {s_name: {'hist': d, 'median_coverage': median_coverage}}
 
 def parse_insert_size(self, f):
     """ Parse the contents of the Qualimap BamQC Insert Size Histogram file """
@@ -171,14 +175,8 @@ def parse_insert_size(self, f):
         if cum_counts >= num_counts/2:
             median_insert_size = thisins
             break
-    # Add the median insert size to the general stats table
-    self.general_stats_data[s_name]['median_insert_size'] = median_insert_size
 
-    # Save results
-    if s_name in self.qualimap_bamqc_insert_size_hist:
-        log.debug("Duplicate insert size histogram sample name found! Overwriting: {}".format(s_name))
-    self.qualimap_bamqc_insert_size_hist[s_name] = d
-    self.add_data_source(f, s_name=s_name, section='insert_size_histogram')
+    return {s_name: {'hist': d, 'median_insert_size': median_insert_size}}
 
 def parse_gc_dist(self, f):
     """ Parse the contents of the Qualimap BamQC Mapped Reads GC content distribution file """
@@ -205,16 +203,12 @@ def parse_gc_dist(self, f):
             reference_content = float(sections[2])
             reference_d[gc] = reference_content
 
-    # Add average GC to the general stats table
-    self.general_stats_data[s_name]['avg_gc'] = avg_gc
-
-    # Save results
-    if s_name in self.qualimap_bamqc_gc_content_dist:
-        log.debug("Duplicate Mapped Reads GC content distribution sample name found! Overwriting: {}".format(s_name))
-    self.qualimap_bamqc_gc_content_dist[s_name] = d
-    if reference_species and reference_species not in self.qualimap_bamqc_gc_by_species:
-        self.qualimap_bamqc_gc_by_species[reference_species] = reference_d
-    self.add_data_source(f, s_name=s_name, section='mapped_gc_distribution')
+    return {s_name: {
+        'gc_dist': d,
+        'avg_gc': avg_gc,
+        'reference_species': reference_species,
+        'reference_gc_dist': reference_d,
+    }}
 
 
 def report_sections(self):
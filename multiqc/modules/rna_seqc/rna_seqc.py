@@ -8,6 +8,7 @@ import logging
 
 from multiqc import config
 from multiqc.modules.base_module import BaseMultiqcModule
+from multiqc.utils import search
 from multiqc.plots import bargraph, linegraph, heatmap
 
 # Initialise the logger
@@ -153,11 +154,12 @@ class MultiqcModule(BaseMultiqcModule):
                 for i, v in enumerate(s):
                     data[s_names[i]][j] = float(v)
                 j += 1
-        if f['fn'] == 'meanCoverageNorm_high.txt':
+        fn = search.strip_compression_ext(f['fn'])
+        if fn == 'meanCoverageNorm_high.txt':
             self.rna_seqc_norm_high_cov.update(data)
-        elif f['fn'] == 'meanCoverageNorm_medium.txt':
+        elif fn == 'meanCoverageNorm_medium.txt':
             self.rna_seqc_norm_medium_cov.update(data)
-        elif f['fn'] == 'meanCoverageNorm_low.txt':
+        elif fn == 'meanCoverageNorm_low.txt':
             self.rna_seqc_norm_low_cov.update(data)
 
     def coverage_lineplot (self):
@@ -197,9 +199,10 @@ class MultiqcModule(BaseMultiqcModule):
                 s_names = [ x for x in s if x != '' ]
             else:
                 data.append(s[1:])
-        if f['fn'] == 'corrMatrixPearson.txt':
+        fn = search.strip_compression_ext(f['fn'])
+        if fn == 'corrMatrixPearson.txt':
             self.rna_seqc_pearson = (s_names, data)
-        elif f['fn'] == 'corrMatrixSpearman.txt':
+        elif fn == 'corrMatrixSpearman.txt':
             self.rna_seqc_spearman = (s_names, data)
 
 
@@ -18,14 +18,7 @@ class FlagstatReportMixin():
     def parse_samtools_flagstats(self):
         """ Find Samtools flagstat logs and parse their data """
 
-        self.samtools_flagstat = dict()
-        for f in self.find_log_files('samtools/flagstat'):
-            parsed_data = parse_single_report(f['f'])
-            if len(parsed_data) > 0:
-                if f['s_name'] in self.samtools_flagstat:
-                    log.debug("Duplicate sample name found! Overwriting: {}".format(f['s_name']))
-                self.add_data_source(f, section='flagstat')
-                self.samtools_flagstat[f['s_name']] = parsed_data
+        self.samtools_flagstat = self.map_log_files('samtools/flagstat', parse_flagstat_file, section='flagstat')
 
         # Filter to strip out ignored sample names
         self.samtools_flagstat = self.ignore_samples(self.samtools_flagstat)
@@ -108,6 +101,12 @@ flagstat_regexes = {
     'with mate mapped to a different chr (mapQ >= 5)': r"(\d+) \+ (\d+) with mate mapped to a different chr \(mapQ>=5\)",
 }
 
+def parse_flagstat_file(f):
+    """ Parse a flagstat log found by the file search, for map_log_files() """
+    parsed_data = parse_single_report(f['f'])
+    if len(parsed_data) > 0:
+        return { f['s_name']: parsed_data }
+
 def parse_single_report(file_obj):
     """
     Take a filename, parse the data assuming it's a flagstat file
@@ -16,14 +16,7 @@ class IdxstatsReportMixin():
     def parse_samtools_idxstats(self):
         """ Find Samtools idxstats logs and parse their data """
 
-        self.samtools_idxstats = dict()
-        for f in self.find_log_files('samtools/idxstats'):
-            parsed_data = parse_single_report(f['f'])
-            if len(parsed_data) > 0:
-                if f['s_name'] in self.samtools_idxstats:
-                    log.debug("Duplicate sample name found! Overwriting: {}".format(f['s_name']))
-                self.add_data_source(f, section='idxstats')
-                self.samtools_idxstats[f['s_name']] = parsed_data
+        self.samtools_idxstats = self.map_log_files('samtools/idxstats', parse_idxstats_file, section='idxstats')
 
         # Filter to strip out ignored sample names
         self.samtools_idxstats = self.ignore_samples(self.samtools_idxstats)
@@ -151,6 +144,12 @@ class IdxstatsReportMixin():
 # idxstats has four columns: chr, length, mapped, unmapped
 # http://www.htslib.org/doc/samtools.html
 
+def parse_idxstats_file(f):
+    """ Parse an idxstats log found by the file search, for map_log_files() """
+    parsed_data = parse_single_report(f['f'])
+    if len(parsed_data) > 0:
+        return { f['s_name']: parsed_data }
+
 def parse_single_report(f):
     """ Parse a samtools idxstats idxstats """
 
@@ -25,34 +25,17 @@ class MultiqcModule(BaseMultiqcModule):
         info="is an ultrafast universal RNA-seq aligner.")
 
         # Find and load any STAR reports
-        self.star_data = dict()
-        for f in self.find_log_files('star'):
-            parsed_data = self.parse_star_report(f['f'])
-            if parsed_data is not None:
-                s_name = f['s_name']
-                if s_name == '' or s_name == 'Log.final.out':
-                    s_name = self.clean_s_name(os.path.basename(f['root']), os.path.dirname(f['root']))
-                if s_name in self.star_data:
-                    log.debug("Duplicate sample name found! Overwriting: {}".format(s_name))
-                self.add_data_source(f, section='SummaryLog')
-                self.star_data[s_name] = parsed_data
+        self.star_data = self.map_log_files('star', self.parse_star_log, section='SummaryLog')
 
         # Find and load any STAR gene count tables
         self.star_genecounts_unstranded = dict()
         self.star_genecounts_first_strand = dict()
         self.star_genecounts_second_strand = dict()
-        for f in self.find_log_files('star_genecounts', filehandles=True):
-            parsed_data = self.parse_star_genecount_report(f)
-            if parsed_data is not None:
-                s_name = f['s_name']
-                if s_name == '' or s_name == 'ReadsPerGene.out.tab':
-                    s_name = self.clean_s_name(os.path.basename(f['root']), os.path.dirname(f['root']))
-                if s_name in self.star_data:
-                    log.debug("Duplicate ReadsPerGene sample name found! Overwriting: {}".format(s_name))
-                self.add_data_source(f, section='ReadsPerGene')
-                self.star_genecounts_unstranded[s_name] = parsed_data['unstranded']
-                self.star_genecounts_first_strand[s_name] = parsed_data['first_strand']
-                self.star_genecounts_second_strand[s_name] = parsed_data['second_strand']
+        genecounts = self.map_log_files('star_genecounts', self.parse_star_genecount_log, filehandles=True, section='ReadsPerGene')
+        for s_name, parsed_data in genecounts.items():
+            self.star_genecounts_unstranded[s_name] = parsed_data['unstranded']
+            self.star_genecounts_first_strand[s_name] = parsed_data['first_strand']
+            self.star_genecounts_second_strand[s_name] = parsed_data['second_strand']
 
         # Filter to strip out ignored sample names
         self.star_data = self.ignore_samples(self.star_data)
@@ -98,6 +81,24 @@ class MultiqcModule(BaseMultiqcModule):
             )
 
 
+    def star_s_name(self, f, default_fn):
+        """ Sample name for a STAR output file, from its directory if the file has the default name """
+        if f['s_name'] == '' or f['s_name'] == default_fn:
+            return self.clean_s_name(os.path.basename(f['root']), os.path.dirname(f['root']))
+        return f['s_name']
+
+    def parse_star_log(self, f):
+        """ Parse a final STAR log found by the file search, for map_log_files() """
+        parsed_data = self.parse_star_report(f['f'])
+        if parsed_data is not None:
+            return { self.star_s_name(f, 'Log.final.out'): parsed_data }
+
+    def parse_star_genecount_log(self, f):
+        """ Parse a STAR gene counts file found by the file search, for map_log_files() """
+        parsed_data = self.parse_star_genecount_report(f)
+        if parsed_data is not None:
+            return { self.star_s_name(f, 'ReadsPerGene.out.tab'): parsed_data }
+
     def parse_star_report (self, raw_data):
         """ Parse the final STAR log file. """
 
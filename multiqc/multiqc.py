@@ -0,0 +1,809 @@
+#!/usr/bin/env python
+
+""" MultiQC: A modular tool to aggregate results from bioinformatics analyses across many samples into a single report.
+Run from the command line with run_cli(), or from Python with multiqc.run() or a MultiQCSession.
+"""
+
+from __future__ import print_function, absolute_import
+
+import click
+import inspect
+import io
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import traceback
+
+try:
+    from urllib.request import urlopen #py3
+except ImportError:
+    from urllib import urlopen #py2
+
+from multiqc import __version__
+from multiqc.plots import table
+from multiqc.utils import report, plugin_hooks, config, log, parallel, profiler, template_loader
+logger = config.logger
+
+# Size of the write buffer for the report file. Rendered template chunks are small, so
+# gather them up before writing.
+REPORT_WRITE_BUFFER = 1024 * 1024
+
+def parse_version(v):
+    """ Version number as a list of integers, for comparing versions """
+    return [ int(n) for n in re.match(r'[0-9.]*', v).group(0).split('.') if n ]
+
+def run_result(sys_exit_code):
+    """ What run() returns. The report and config modules are reset by the next run. """
+    return {'sys_exit_code': sys_exit_code, 'report': report, 'config': config}
+
+def is_merge(analysis_dir):
+    """ 'multiqc merge <shard report>..' combines the results of --shard runs """
+    return len(analysis_dir) > 1 and analysis_dir[0] == 'merge' and not os.path.exists('merge')
+
+def check_analysis_dirs(ctx, param, value):
+    paths = value[1:] if is_merge(value) else value
+    for path in paths:
+        if not os.path.exists(path):
+            raise click.BadParameter('Path "{}" does not exist.'.format(path))
+    return value
+
+def check_shard(ctx, param, value):
+    if value is None:
+        return None
+    try:
+        shard, num_shards = [ int(n) for n in value.split('/') ]
+    except ValueError:
+        raise click.BadParameter('Should be the shard number and number of shards, eg. 1/4')
+    if not 1 <= shard <= num_shards:
+        raise click.BadParameter('Shard number should be between 1 and {}'.format(num_shards))
+    return shard, num_shards
+
+@click.command(
+    context_settings = dict( help_option_names = ['-h', '--help'] )
+)
+@click.argument('analysis_dir',
+                    type = click.Path(),
+                    nargs = -1,
+                    required = True,
+                    metavar = "<analysis directory>",
+                    callback = check_analysis_dirs
+)
+@click.option('-f', '--force',
+                    is_flag = True,
+                    help = "Overwrite any existing reports"
+)
+@click.option('-d', '--dirs',
+                    is_flag = True,
+                    help = "Prepend directory to sample names"
+)
+@click.option('-dd', '--dirs-depth', 'dirs_depth',
+                    type = int,
+                    help = "Prepend [INT] directories to sample names. Negative number to take from start of path."
+)
+@click.option('-s', '--fullnames', 'no_clean_sname',
+                    is_flag = True,
+                    help = "Do not clean the sample names (leave as full file name)"
+)
+@click.option('-i', '--title',
+                    type = str,
+                    help = "Report title. Printed as page header, used for filename if not otherwise specified."
+)
+@click.option('-b', '--comment', 'report_comment',
+                    type = str,
+                    help = "Custom comment, will be printed at the top of the report."
+)
+@click.option('-n', '--filename',
+                    type = str,
+                    help = "Report filename. Use 'stdout' to print to standard out."
+)
+@click.option('-o', '--outdir',
+                    type = str,
+                    help = "Create report in the specified output directory."
+)
+@click.option('-t', '--template',
+                    type = click.Choice(config.avail_templates),
+                    help = "Report template to use."
+)
+@click.option('-x', '--ignore',
+                    type = str,
+                    multiple = True,
+                    help = "Ignore analysis files (glob expression)"
+)
+@click.option('--ignore-samples', 'ignore_samples',
+                    type = str,
+                    multiple = True,
+                    help = "Ignore sample names (glob expression)"
+)
+@click.option('-l', '--file-list',
+                    is_flag = True,
+                    help = "Supply a file containing a list of file paths to be searched, one per row"
+)
+@click.option('--search-cache', 'search_cache',
+                    type = click.Path(dir_okay=False),
+                    help = "Cache file search results in this file, to speed up repeated runs."
+)
+@click.option('--search-threads', 'search_threads',
+                    type = int,
+                    help = "Number of threads used to list directories and search files. Default: {}".format(config.search_threads)
+)
+@click.option('--search-stream', 'search_stream',
+                    is_flag = True,
+                    help = "Start running modules while the file search is still going."
+)
+@click.option('--search-archives', 'search_archives',
+                    is_flag = True,
+                    help = "Search for logs inside tar and zip archives."
+)
+@click.option('--update', 'update_data_dir',
+                    type = click.Path(exists=True, file_okay=False),
+                    help = "Update the report made with this data directory, only parsing new log files. "
+                           "Only some modules reuse their saved data (see the docs), the rest parse their old log files again."
+)
+@click.option('--shard', 'shard',
+                    metavar = 'i/N',
+                    callback = check_shard,
+                    help = "Only parse a share of the log files found, for use with 'multiqc merge'."
+)
+@click.option('--parse-cache', 'parse_cache',
+                    type = click.Path(file_okay=False),
+                    help = "Cache parsed log file data in this directory, to speed up repeated runs."
+)
+@click.option('--processes', 'processes',
+                    type = int,
+                    help = "Number of worker processes used to run modules. Default: {}".format(config.processes)
+)
+@click.option('--profile', 'profile',
+                    is_flag = True,
+                    help = "Record the time and memory used by each module and step of the run."
+)
+@click.option('--trace', 'trace',
+                    is_flag = True,
+                    help = "Save a timeline of the run, to view in Chrome or Perfetto."
+)
+@click.option('-e', '--exclude', metavar='[module name]',
+                    type = click.Choice(['general_stats']+list(config.avail_modules.keys())),
+                    multiple = True,
+                    help = "Do not use this module. Can specify multiple times."
+)
+@click.option('-m', '--module', metavar='[module name]',
+                    type = click.Choice(config.avail_modules),
+                    multiple = True,
+                    help = "Use only this module. Can specify multiple times."
+)
+@click.option('--data-dir', 'make_data_dir',
+                    is_flag = True,
+                    help = "Force the parsed data directory to be created."
+)
+@click.option('--no-data-dir', 'no_data_dir',
+                    is_flag = True,
+                    help = "Prevent the parsed data directory from being created."
+)
+@click.option('-k', '--data-format', 'data_format',
+                    type = click.Choice(config.data_format_extensions.keys()),
+                    help = "Output parsed data in a different format. Default: {}".format(config.data_format)
+)
+@click.option('-z', '--zip-data-dir', 'zip_data_dir',
+                    is_flag = True,
+                    help = "Compress the data directory."
+)
+@click.option('-p', '--export', 'export_plots',
+                    is_flag = True,
+                    help = "Export plots as static images in addition to the report"
+)
+@click.option('-fp', '--flat', 'plots_flat',
+                    is_flag = True,
+                    help = "Use only flat plots (static images)"
+)
+@click.option('-ip', '--interactive', 'plots_interactive',
+                    is_flag = True,
+                    help = "Use only interactive plots (HighCharts Javascript)"
+)
+@click.option('--pdf', 'make_pdf',
+                    is_flag = True,
+                    help = "Creates PDF report with 'simple' template. Requires Pandoc to be installed."
+)
+@click.option('-c', '--config', 'config_file',
+                    type = click.Path(exists=True, readable=True),
+                    help = "Specific config file to load, after those in MultiQC dir / home dir / working dir."
+)
+@click.option('-v', '--verbose',
+                    count = True,
+                    default = 0,
+                    help = "Increase output verbosity."
+)
+@click.option('-q', '--quiet',
+                    is_flag = True,
+                    help = "Only show log warnings"
+)
+@click.version_option(__version__)
+
+def run_cli(**kwargs):
+    """MultiQC aggregates results from bioinformatics analyses across many samples into a single report.
+
+        It searches a given directory for analysis logs and compiles a HTML report.
+        It's a general use tool, perfect for summarising the output from numerous
+        bioinformatics tools.
+
+        To run, supply with one or more directory to scan for analysis results.
+        To run here, use 'multiqc .'
+
+        To combine the results of runs made with --shard, use
+        'multiqc merge <shard report directory>..'
+        Only some modules can reuse their saved data (see the docs). The rest
+        parse their log files again when merging or using --update, so these
+        files must still exist.
+
+        See http://multiqc.info for more details.
+
+        Author: Phil Ewels (http://phil.ewels.co.uk)
+    """
+    result = run(**kwargs)
+    sys.exit(result['sys_exit_code'])
+
+def run(analysis_dir, dirs=False, dirs_depth=None, no_clean_sname=False, title=None, report_comment=None,
+template=None, module=(), exclude=(), outdir=None, ignore=(), ignore_samples=(), file_list=False, search_cache=None,
+search_threads=None, search_stream=False, search_archives=False, update_data_dir=None, shard=None, parse_cache=None,
+processes=None, profile=False, trace=False, filename=None, make_data_dir=False, no_data_dir=False, data_format=None, zip_data_dir=False, force=False,
+export_plots=False, plots_flat=False, plots_interactive=False, make_pdf=False, config_file=None, verbose=0, quiet=False,
+extra_config=None, **kwargs):
+    """
+    Run MultiQC. Takes the same options as the command line, named as in run_cli().
+    Only one run can use the report and config modules at a time, so to run
+    MultiQC more than once in the same Python process use multiqc.run() or a
+    MultiQCSession, which reset them first.
+    :param analysis_dir: Directory to search, or a list of them
+    :param extra_config: Dict of config settings, set after loading the config files
+    :param kwargs: Extra command line options from plugins, saved as config.kwargs
+    :return: Dict with the exit code (sys_exit_code) and the report and config modules
+    """
+    if not isinstance(analysis_dir, (list, tuple)):
+        analysis_dir = [analysis_dir]
+
+    # Set up logging level
+    loglevel = log.LEVELS.get(min(verbose,1), "INFO")
+    if quiet:
+        loglevel = 'WARNING'
+    log.init_log(logger, loglevel=loglevel)
+
+    # Load config files
+    config.mqc_load_userconfig(config_file)
+    if extra_config is not None:
+        for c, v in extra_config.items():
+            logger.debug("Config setting '{}': {}".format(c, v))
+            setattr(config, c, v)
+    plugin_hooks.mqc_trigger('config_loaded')
+
+    # Log the command used to launch MultiQC
+    report.multiqc_command = " ".join(sys.argv)
+    logger.debug("Command used: {}".format(report.multiqc_command))
+
+    # Check that we're running the latest version of MultiQC
+    if config.no_version_check is not True:
+        try:
+            response = urlopen('http://multiqc.info/version.php?v={}'.format(__version__), timeout=5)
+            remote_version = response.read().decode('utf-8').strip()
+            if parse_version(remote_version) > parse_version(__version__):
+                logger.warn('MultiQC Version {} now available!'.format(remote_version))
+        except:
+            logger.debug('Could not connect to multiqc.info for version check')
+
+    # Set up key variables (overwrite config vars from command line)
+    if template is not None:
+        config.template = template
+    if title is not None:
+        config.title = title
+    if report_comment is not None:
+        config.report_comment = report_comment
+    config.prepend_dirs = dirs
+    if dirs_depth is not None:
+        config.prepend_dirs_depth = dirs_depth
+    config.analysis_dir = analysis_dir
+    merge_data_dirs = list()
+    if is_merge(analysis_dir):
+        # Combine the results of --shard runs instead of searching for files
+        config.analysis_dir = []
+        for path in analysis_dir[1:]:
+            data_dir = report.find_data_dir(path)
+            if data_dir is None:
+                logger.error("No MultiQC data directory with a '{}' file found in '{}'".format(report.PARSED_DATA_FN, path))
+                return run_result(1)
+            merge_data_dirs.append(data_dir)
+    if outdir is not None:
+        config.output_dir = outdir
+    if no_clean_sname:
+        config.fn_clean_sample_names = False
+        logger.info("Not cleaning sample names")
+    if make_data_dir:
+        config.make_data_dir = True
+    if no_data_dir:
+        config.make_data_dir = False
+    if force:
+        config.force = True
+    if zip_data_dir:
+        config.zip_data_dir = True
+    if data_format is not None:
+        config.data_format = data_format
+    if export_plots:
+        config.export_plots = True
+    if plots_flat:
+        config.plots_force_flat = True
+    if plots_interactive:
+        config.plots_force_interactive = True
+    if make_pdf:
+        config.template = 'simple'
+    config.kwargs = kwargs # Plugin command line options
+    if profile:
+        config.profile = True
+    if trace:
+        config.trace = True
+    profiler.init(config.profile, config.trace)
+
+    plugin_hooks.mqc_trigger('execution_start')
+
+    logger.info("This is MultiQC v{}".format(__version__))
+    logger.debug("Command     : {}".format(' '.join(sys.argv)))
+    logger.debug("Working dir : {}".format(os.getcwd()))
+    if make_pdf:
+        logger.info('--pdf specified. Using non-interactive HTML template.')
+    logger.info("Template    : {}".format(config.template))
+
+    # Add files if --file-list option is given
+    if file_list:
+        if len(analysis_dir) > 1:
+            raise ValueError("If --file-list is giving, analysis_dir should have only one plain text file.")
+        config.analysis_dir = []
+        with (open(analysis_dir[0])) as in_handle:
+            for line in in_handle:
+                if os.path.exists(line.strip()):
+                    path = os.path.abspath(line.strip())
+                    report.searchfiles.append([os.path.basename(path), os.path.dirname(path)])
+        if len(report.searchfiles) == 0:
+            logger.error("No files were added from {} using --file-list option.".format(analysis_dir[0]))
+            logger.error("Please, check that {} contains correct file paths.".format(analysis_dir[0]))
+            raise ValueError("Any files to be searched.")
+
+    if search_cache is not None:
+        config.search_cache = search_cache
+    if search_threads is not None:
+        config.search_threads = search_threads
+    if search_stream:
+        config.search_stream = True
+    if search_archives:
+        config.search_archives = True
+    if update_data_dir is not None:
+        config.update_data_dir = update_data_dir
+    if shard is not None:
+        config.shard = shard
+    if parse_cache is not None:
+        config.parse_cache = parse_cache
+    if processes is not None:
+        config.processes = processes
+
+    if len(ignore) > 0:
+        logger.debug("Ignoring files, directories and paths that match: {}".format(", ".join(ignore)))
+        config.fn_ignore_files.extend(ignore)
+        config.fn_ignore_dirs.extend(ignore)
+        config.fn_ignore_paths.extend(ignore)
+    if len(ignore_samples) > 0:
+        logger.debug("Ignoring sample names that match: {}".format(", ".join(ignore_samples)))
+        config.sample_names_ignore.extend(ignore_samples)
+    if filename == 'stdout':
+        config.output_fn = sys.stdout
+        logger.info("Printing report to stdout")
+    else:
+        if title is not None and filename == config.output_fn_name:
+            filename = re.sub('[^\w\.-]', '', re.sub('[-\s]+', '-', title) ).strip()
+            filename += '_multiqc_report'
+        if filename is not None:
+            if filename.endswith('.html'):
+                filename = filename[:-5]
+            config.output_fn_name = filename
+            config.data_dir_name = '{}_data'.format(filename)
+        if not config.output_fn_name.endswith('.html'):
+            config.output_fn_name = '{}.html'.format(config.output_fn_name)
+
+        # Check that we're not going to overwrite anything before we run
+        config.output_fn = os.path.join(config.output_dir, config.output_fn_name)
+        config.data_dir = os.path.join(config.output_dir, config.data_dir_name)
+        if not config.force:
+            if os.path.exists(config.output_fn):
+                logger.error("MultiQC Report '{}' already exists.".format(os.path.relpath(config.output_fn)))
+                logger.info("Use -f or --force to overwrite existing reports")
+                return run_result(1)
+            if config.make_data_dir == True and os.path.exists(config.data_dir):
+                logger.error("Output directory '{}' already exists.".format(os.path.relpath(config.data_dir)))
+                logger.info("Use -f or --force to overwrite existing reports")
+                return run_result(1)
+            if config.export_plots == True and os.path.exists(config.plots_dir_name):
+                logger.error("Plots directory '{}' already exists.".format(os.path.relpath(config.plots_dir_name)))
+                logger.info("Use -f or --force to overwrite existing reports")
+                return run_result(1)
+        else:
+            logger.debug('Running in --force mode, will overwrite any existing reports.')
+
+
+    # Print some status updates
+    if config.title is not None:
+        logger.info("Report title: {}".format(config.title))
+    if dirs:
+        logger.info("Prepending directory to sample names")
+    for d in config.analysis_dir:
+        logger.info("Searching '{}'".format(d))
+    for d in merge_data_dirs:
+        logger.info("Merging '{}'".format(d))
+    if config.shard is not None:
+        logger.info("Only parsing shard {} of {}".format(*config.shard))
+
+    # Get the list of modules we want to run, in the order that we want them
+    run_modules = [ m for m in config.top_modules if m in config.avail_modules.keys() ]
+    run_modules.extend( [ m for m in config.avail_modules.keys() if m not in config.module_order and m not in run_modules ] )
+    run_modules.extend( [ m for m in config.module_order if m in config.avail_modules.keys() and m not in run_modules ] )
+
+    if module:
+        run_modules = [m for m in run_modules if m in module]
+        logger.info('Only using modules {}'.format(', '.join(module)))
+    elif exclude:
+        logger.info("Excluding modules '{}'".format("', '".join(exclude)))
+        if 'general_stats' in exclude:
+            config.skip_generalstats = True
+            exclude = tuple(x for x in exclude if x != 'general_stats')
+        run_modules = [m for m in run_modules if m not in exclude]
+    if len(run_modules) == 0:
+        logger.critical('No analysis modules specified!')
+        return run_result(1)
+    logger.debug("Analysing modules: {}".format(', '.join(run_modules)))
+
+    # Create the temporary working directories
+    tmp_dir = tempfile.mkdtemp()
+    logger.debug('Using temporary directory for creating report: {}'.format(tmp_dir))
+    config.data_tmp_dir = os.path.join(tmp_dir, 'multiqc_data')
+    if filename != 'stdout' and config.make_data_dir == True:
+        config.data_dir = config.data_tmp_dir
+        os.makedirs(config.data_dir)
+    else:
+        config.data_dir = None
+    config.plots_tmp_dir = os.path.join(tmp_dir, 'multiqc_plots')
+    if filename != 'stdout' and config.export_plots == True:
+        config.plots_dir = config.plots_tmp_dir
+        os.makedirs(config.plots_dir)
+
+    # Load the template
+    template_mod = config.avail_templates[config.template].load()
+
+    # Add an output subdirectory if specified by template
+    try:
+        config.output_dir = os.path.join(config.output_dir, template_mod.output_subdir)
+    except AttributeError:
+        pass # No subdirectory variable given
+
+
+    # Load the parsed data from a previous report that we're updating, or from shards to merge
+    previous_data_dirs = list(merge_data_dirs)
+    if config.update_data_dir is not None:
+        previous_data_dirs.insert(0, config.update_data_dir)
+    if len(previous_data_dirs) > 0:
+        with profiler.phase('load_previous_data'):
+            loaded = report.load_previous_data(previous_data_dirs)
+        if not loaded:
+            shutil.rmtree(tmp_dir)
+            return run_result(1)
+
+    # Get the list of files to search
+    report.get_filelist(run_modules, stream=config.search_stream)
+
+    # Run the modules!
+    plugin_hooks.mqc_trigger('before_modules')
+    report.modules_output = list()
+    sys_exit_code = 0
+    if config.processes > 1 and parallel.fork_context() is None:
+        logger.warning("Can't start worker processes on this platform, running modules one at a time")
+        config.processes = 1
+    if config.processes > 1 and len(run_modules) > 1:
+        module_runs = parallel.run_modules(run_modules, config.processes)
+    else:
+        module_runs = ((m, None) for m in run_modules)
+    for this_module, result in module_runs:
+        # Don't import modules that have no log files to parse
+        if result is None and not report.module_has_files(this_module):
+            logger.debug("No log files found for module '{}'".format(this_module))
+            continue
+        try:
+            if result is not None:
+                output = result.get()
+            else:
+                output = parallel.run_module(this_module)
+            for m in output:
+                report.modules_output.append(m)
+
+            # Copy over css & js files if requested by the theme
+            try:
+                for to, path in report.modules_output[-1].css.items():
+                    copy_to = os.path.join(tmp_dir, to)
+                    os.makedirs(os.path.dirname(copy_to))
+                    shutil.copyfile(path, copy_to)
+            except AttributeError:
+                pass
+            try:
+                for to, path in report.modules_output[-1].js.items():
+                    copy_to = os.path.join(tmp_dir, to)
+                    os.makedirs(os.path.dirname(copy_to))
+                    shutil.copyfile(path, copy_to)
+            except AttributeError:
+                pass
+
+        except UserWarning:
+            pass # No samples found
+        except KeyboardInterrupt:
+            shutil.rmtree(tmp_dir)
+            logger.critical(
+                    "User Cancelled Execution!\n{eq}\n{tb}{eq}\n"
+                    .format(eq=('='*60), tb=traceback.format_exc())+
+                    "User Cancelled Execution!\nExiting MultiQC...")
+            return run_result(1)
+        except:
+            # Flag the error, but carry on
+            if isinstance(sys.exc_info()[1], parallel.ModuleError):
+                tb = str(sys.exc_info()[1])
+            else:
+                tb = traceback.format_exc()
+            logger.error("Oops! The '{}' MultiQC module broke... \n".format(this_module) + \
+                      (' '*20)+"Please copy the following traceback and report it at " + \
+                      "https://github.com/ewels/MultiQC/issues \n" + \
+                      (' '*20)+"(if possible, include a log file that triggers the error) \n" + \
+                      ('='*60)+"\nModule {} raised an exception: {}".format(
+                          this_module, tb) + ('='*60))
+            sys_exit_code = 1
+
+    # Make sure that a streamed file search has finished
+    report.wait_for_search()
+    report.close_archives()
+
+    # Did we find anything?
+    if len(report.modules_output) == 0:
+        logger.warn("No analysis results found. Cleaning up..")
+        shutil.rmtree(tmp_dir)
+        logger.info("MultiQC complete")
+        # Exit with an error code if a module broke
+        return run_result(sys_exit_code)
+
+    plugin_hooks.mqc_trigger('after_modules')
+
+    # Remove empty data sections from the General Stats table
+    empty_keys = [i for i, d in enumerate(report.general_stats_data[:]) if len(d) == 0]
+    empty_keys.sort(reverse=True)
+    for i in empty_keys:
+        del report.general_stats_data[i]
+        del report.general_stats_headers[i]
+    # Generate the General Statistics HTML & write to file
+    if len(report.general_stats_data) > 0:
+        pconfig = {
+            'id': 'general_stats_table',
+            'table_title': 'General Statistics',
+            'save_file': True,
+            'raw_data_fn':'multiqc_general_stats'
+        }
+        with profiler.phase('general_stats'):
+            report.general_stats_html = table.plot(report.general_stats_data, report.general_stats_headers, pconfig)
+    else:
+        config.skip_generalstats = True
+
+    # Write the report sources to disk
+    if config.data_dir is not None:
+        with profiler.phase('write_data'):
+            report.data_sources_tofile()
+            report.parsed_data_tofile()
+
+    # Show the directories that previous runs searched as report analysis paths too (--update, multiqc merge)
+    if len(previous_data_dirs) > 0:
+        new_dirs = [ d for d in config.analysis_dir if os.path.realpath(d) not in report.previous_analysis_dir ]
+        config.analysis_dir = (report.previous_analysis_dir + new_dirs) or list(analysis_dir[1:])
+
+    plugin_hooks.mqc_trigger('before_report_generation')
+
+    # Make the final report path & data directories
+    if filename != 'stdout':
+        # Check for existing reports and remove if -f was specified
+        # We repeat this check in case the output name has been altered since launch
+        config.output_fn = os.path.join(config.output_dir, config.output_fn_name)
+        if os.path.exists(config.output_fn):
+            if config.force:
+                logger.warning("Deleting    : {}   (-f was specified)".format(os.path.relpath(config.output_fn)))
+                os.remove(config.output_fn)
+            else:
+                logger.error("MultiQC Report {} already exists.".format(config.output_fn))
+                logger.info("Use -f or --force to overwrite existing reports")
+                shutil.rmtree(tmp_dir)
+                return run_result(1)
+        # Make directories for report if not already existing
+        if not os.path.exists(os.path.dirname(config.output_fn)):
+            os.makedirs(os.path.dirname(config.output_fn))
+        logger.info("Report      : {}".format(os.path.relpath(config.output_fn)))
+
+        # Now do the same for the data directory
+        if config.make_data_dir == False:
+            logger.info("Data        : None")
+        else:
+            config.data_dir = os.path.join(config.output_dir, config.data_dir_name)
+            if os.path.exists(config.data_dir):
+                if config.force:
+                    logger.warning("Deleting    : {}   (-f was specified)".format(os.path.relpath(config.data_dir)))
+                    shutil.rmtree(config.data_dir)
+                else:
+                    logger.error("Output directory {} already exists.".format(config.data_dir))
+                    logger.info("Use -f or --force to overwrite existing reports")
+                    shutil.rmtree(tmp_dir)
+                    return run_result(1)
+            os.makedirs(config.data_dir)
+            logger.info("Data        : {}".format(os.path.relpath(config.data_dir)))
+
+            # Modules have run, so data directory should be complete by now. Move its contents.
+            for f in os.listdir(config.data_tmp_dir):
+                fn = os.path.join(config.data_tmp_dir, f)
+                logger.debug("Moving data file from '{}' to '{}'".format(fn, config.data_dir))
+                shutil.move(fn, config.data_dir)
+
+        # Finally, copy across the plots
+        if config.export_plots:
+            config.plots_dir = os.path.join(config.output_dir, config.plots_dir_name)
+            if os.path.exists(config.plots_dir):
+                if config.force:
+                    logger.warning("Deleting    : {}   (-f was specified)".format(os.path.relpath(config.plots_dir)))
+                    shutil.rmtree(config.plots_dir)
+                else:
+                    logger.error("Output directory {} already exists.".format(config.plots_dir))
+                    logger.info("Use -f or --force to overwrite existing reports")
+                    shutil.rmtree(tmp_dir)
+                    return run_result(1)
+            os.makedirs(config.plots_dir)
+            logger.info("Plots       : {}".format(os.path.relpath(config.plots_dir)))
+
+            # Modules have run, so plots directory should be complete by now. Move its contents.
+            for f in os.listdir(config.plots_tmp_dir):
+                fn = os.path.join(config.plots_tmp_dir, f)
+                logger.debug("Moving plots directory from '{}' to '{}'".format(fn, config.plots_dir))
+                shutil.move(fn, config.plots_dir)
+
+    plugin_hooks.mqc_trigger('before_template')
+
+    # Load the report template, and its parent template if a child theme
+    try:
+        j_template = template_loader.get_template(template_mod)
+    except:
+        raise IOError ("Could not load {} template file '{}'".format(config.template, template_mod.base_fn))
+
+    # Use jinja2 to render the template, streaming it straight to the report file
+    # so that the whole report never has to be held in memory as one string
+    config.analysis_dir = [os.path.realpath(d) for d in config.analysis_dir]
+    with profiler.phase('render'):
+        report_stream = j_template.stream(report=report, config=config)
+        if filename == 'stdout':
+            stdout = getattr(sys.stdout, 'buffer', sys.stdout)
+            report_stream.dump(stdout, encoding='utf-8')
+            stdout.write(b'\n')
+            stdout.flush()
+        else:
+            try:
+                with io.open (config.output_fn, "w", encoding='utf-8', buffering=REPORT_WRITE_BUFFER) as f:
+                    report_stream.dump(f)
+                    f.write(u'\n')
+            except IOError as e:
+                raise IOError ("Could not print report to '{}' - {}".format(config.output_fn, IOError(e)))
+
+    if filename != 'stdout':
+        # Copy over files if requested by the theme, along with any module css & js
+        template_loader.copy_files(template_mod, os.path.dirname(config.output_fn), tmp_dir)
+
+    # Clean up temporary directory
+    shutil.rmtree(tmp_dir)
+
+    # Log where the time went and save it to the data directory (--profile, --trace)
+    profiler.finish()
+
+    # Zip the data directory if requested
+    if config.zip_data_dir and config.data_dir is not None:
+        shutil.make_archive(config.data_dir, 'zip', config.data_dir)
+        shutil.rmtree(config.data_dir)
+
+    # Try to create a PDF if requestted
+    if make_pdf:
+        try:
+            pdf_fn_name = config.output_fn_name.replace('.html', '.pdf')
+            pandoc_call = [
+                'pandoc',
+                '--standalone',
+                config.output_fn,
+                '--output', pdf_fn_name,
+                '--latex-engine=xelatex',
+                '-V', 'documentclass=article',
+                '-V', 'geometry=margin=1in',
+                '-V', 'title='
+            ]
+            if config.pandoc_template is not None:
+                pandoc_call.append('--template={}'.format(config.pandoc_template))
+            logger.debug("Attempting Pandoc conversion to PDF with following command:\n{}".format(' '.join(pandoc_call)))
+            pdf_exit_code = subprocess.call(pandoc_call)
+            if pdf_exit_code != 0:
+                logger.error("Error creating PDF! Pandoc returned a non-zero exit code.")
+            else:
+                logger.info("PDF Report  : {}".format(pdf_fn_name))
+        except OSError as e:
+            if e.errno == os.errno.ENOENT:
+                logger.error('Error creating PDF - pandoc not found. Is it installed? http://pandoc.org/')
+            else:
+                logger.error("Error creating PDF! Something went wrong when creating the PDF\n"+
+                    ('='*60)+"\n{}\n".format(traceback.format_exc()) + ('='*60))
+
+    plugin_hooks.mqc_trigger('execution_finish')
+
+    logger.info("MultiQC complete")
+
+    # Move the log file into the data directory
+    log.move_tmp_log(logger)
+
+    # Exit with an error code if a module broke
+    return run_result(sys_exit_code)
+
+# Keyword arguments of run() that aren't config settings
+try:
+    RUN_OPTIONS = inspect.getfullargspec(run).args
+except AttributeError:
+    RUN_OPTIONS = inspect.getargspec(run).args # Python 2
+
+class MultiQCSession(object):
+    """
+    Runs MultiQC many times in the same Python process, eg. in a long-running
+    service, without paying for Python and MultiQC to start up every time.
+    Modules keep their results in the report and config modules, so the session
+    saves the config settings when it is created and puts them back, with a new
+    empty report, before each run. Runs happen one at a time.
+    """
+
+    def __init__(self):
+        self.settings = config.get_settings()
+        self.lock = threading.Lock()
+        self.version_checked = False
+
+    def run(self, analysis_dir, **kwargs):
+        """
+        Run MultiQC and make a report.
+        :param analysis_dir: Directory to search, or a list of them
+        :param kwargs: Options taken by run() (eg. title, force, module), or
+                       config settings (eg. plots_force_flat), which are
+                       set after loading the config files
+        :return: Dict with the exit code (sys_exit_code) and the report and
+                 config modules. These are reset by the next run.
+        """
+        options = dict()
+        extra_config = dict(kwargs.pop('extra_config', None) or {})
+        for k, v in kwargs.items():
+            if k in RUN_OPTIONS:
+                options[k] = v
+            else:
+                extra_config[k] = v
+        with self.lock:
+            # Only check for a new MultiQC version once
+            if self.version_checked:
+                extra_config.setdefault('no_version_check', True)
+            self.version_checked = True
+            self.reset()
+            return run(analysis_dir, extra_config=extra_config, **options)
+
+    def reset(self):
+        """ Clear the config and results from the last run """
+        config.reset(self.settings)
+        report.init()
+
+# Session used by multiqc.run()
+default_session = None
+default_session_lock = threading.Lock()
+
+def get_default_session():
+    global default_session
+    with default_session_lock:
+        if default_session is None:
+            default_session = MultiQCSession()
+        return default_session
@@ -11,34 +11,21 @@ import logging
 import math
 import os
 import random
-import sys
 
-from multiqc.utils import config, report, util_functions
+from multiqc.utils import config, profiler, report, util_functions
 logger = logging.getLogger(__name__)
 
-try:
-    # Import matplot lib but avoid default X environment
-    import matplotlib
-    matplotlib.use('Agg')
-    import matplotlib.pyplot as plt
-except Exception as e:
-    # MatPlotLib can break in a variety of ways. Fake an error message and continue without it if so.
-    # The lack of the library will be handled when plots are attempted
-    print("##### ERROR! MatPlotLib library could not be loaded!    #####", file=sys.stderr)
-    print("##### Flat plots will instead be plotted as interactive #####", file=sys.stderr)
-    logger.exception(e)
-
 letters = 'abcdefghijklmnopqrstuvwxyz'
 
 # Load the template so that we can access its configuration
 # Do this lazily to mitigate import-spaghetti when running unit tests
-_template_mod = None
+_template_mods = dict()
 def get_template_mod():
-    global _template_mod
-    if not _template_mod:
-        _template_mod = config.avail_templates[config.template].load()
-    return _template_mod
+    if config.template not in _template_mods:
+        _template_mods[config.template] = config.avail_templates[config.template].load()
+    return _template_mods[config.template]
 
+@profiler.plot_function
 def plot (data, cats=None, pconfig=None):
     """ Plot a horizontal bar graph. Expects a 2D dict of sample
     data. Also can take info about categories. There are quite a
@@ -239,6 +226,7 @@ def matplotlib_bargraph (plotdata, plotsamples, pconfig=None):
     encoded image within HTML or writes the plot and links to it. Should be called by
     plot_bargraph, which properly formats the input data.
     """
+    plt = util_functions.import_pyplot()
 
     if pconfig is None:
         pconfig = {}
@@ -437,12 +425,14 @@ def matplotlib_bargraph (plotdata, plotsamples, pconfig=None):
                         os.makedirs(plot_dir)
                     # Save the plot
                     plot_fn = os.path.join(plot_dir, '{}.{}'.format(pid, fformat))
-                    fig.savefig(plot_fn, format=fformat, bbox_extra_artists=(lgd,), bbox_inches='tight')
+                    with profiler.span('savefig', 'plot', format=fformat):
+                        fig.savefig(plot_fn, format=fformat, bbox_extra_artists=(lgd,), bbox_inches='tight')
 
             # Output the figure to a base64 encoded string
             if getattr(get_template_mod(), 'base64_plots', True) is True:
                 img_buffer = io.BytesIO()
-                fig.savefig(img_buffer, format='png', bbox_inches='tight')
+                with profiler.span('savefig', 'plot', format='png'):
+                    fig.savefig(img_buffer, format='png', bbox_inches='tight')
                 b64_img = base64.b64encode(img_buffer.getvalue()).decode('utf8')
                 img_buffer.close()
                 html += '<div class="mqc_mplplot" id="{}"{}><img src="data:image/png;base64,{}" /></div>'.format(pid, hidediv, b64_img)
@@ -7,13 +7,14 @@ import logging
 import os
 import random
 
-from multiqc.utils import config, report
+from multiqc.utils import config, profiler, report
 from multiqc.plots import table_object
 
 logger = logging.getLogger(__name__)
 
 letters = 'abcdefghijklmnopqrstuvwxyz'
 
+@profiler.plot_function
 def plot (data, headers=None, pconfig=None):
     """ Helper HTML for a beeswarm plot.
     :param data: A list of data dicts
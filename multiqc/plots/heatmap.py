@@ -7,12 +7,13 @@ import json
 import logging
 import random
 
-from multiqc.utils import report
+from multiqc.utils import profiler, report
 
 logger = logging.getLogger(__name__)
 
 letters = 'abcdefghijklmnopqrstuvwxyz'
 
+@profiler.plot_function
 def plot (data, xcats, ycats=None, pconfig=None):
     """ Plot a 2D heatmap.
     :param data: List of lists, each a representing a row of values.
@@ -6,12 +6,13 @@ import json
 import logging
 import random
 
-from multiqc.utils import report
+from multiqc.utils import profiler, report
 
 logger = logging.getLogger(__name__)
 
 letters = 'abcdefghijklmnopqrstuvwxyz'
 
+@profiler.plot_function
 def plot (data, pconfig=None):
     """ Plot a scatter plot with X,Y data.
     :param data: 2D dict, first keys as sample names, then x:y data pairs
@@ -7,12 +7,13 @@ import logging
 import random
 import re
 
-from multiqc.utils import config, report, util_functions, mqc_colour
+from multiqc.utils import config, profiler, report, util_functions, mqc_colour
 from multiqc.plots import table_object, beeswarm
 logger = logging.getLogger(__name__)
 
 letters = 'abcdefghijklmnopqrstuvwxyz'
 
+@profiler.plot_function
 def plot (data, headers=None, pconfig=None):
     """ Return HTML for a MultiQC table.
     :param data: 2D dict, first keys as sample names, then x:y data pairs
@@ -4,64 +4,98 @@
 config variables to be used across all other modules """
 
 from __future__ import print_function
+import copy
 from datetime import datetime
 import inspect
 import os
-import pkg_resources
 import random
 import subprocess
 import sys
 import yaml
 
 import multiqc
+from multiqc.utils import entry_points
 
 # Default logger will be replaced by caller
 import logging
 logger = logging.getLogger(__name__)
 
+# Use the fast C YAML parser if PyYAML was built with it
+yaml_loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# Constants
+MULTIQC_DIR = os.path.dirname(os.path.realpath(inspect.getfile(multiqc)))
+
+def get_git_hash(repo_dir):
+    """
+    Get the commit that MultiQC is running from, if it is running from a git
+    clone. Reads the files in .git directly where possible, so that git is only
+    started for unusual repositories and never for an installed copy of MultiQC.
+    """
+    git_dir = os.path.join(repo_dir, '.git')
+    if not os.path.exists(git_dir):
+        return None
+    try:
+        with open(os.path.join(git_dir, 'HEAD')) as f:
+            head = f.read().strip()
+        if not head.startswith('ref: '):
+            return head
+        ref = head[5:]
+        if os.path.isfile(os.path.join(git_dir, ref)):
+            with open(os.path.join(git_dir, ref)) as f:
+                return f.read().strip()
+        with open(os.path.join(git_dir, 'packed-refs')) as f:
+            for line in f:
+                if line.rstrip().endswith(' {}'.format(ref)):
+                    return line.split()[0]
+    except (IOError, OSError):
+        pass # Eg. a .git file in a worktree or submodule
+    try:
+        return subprocess.check_output( ['git', 'rev-parse', 'HEAD'],
+                                        cwd=repo_dir,
+                                        stderr=subprocess.STDOUT,
+                                        universal_newlines=True ).strip()
+    except:
+        return None
+
 # Get the MultiQC version
-version = pkg_resources.get_distribution("multiqc").version
+version = entry_points.version
 script_path = os.path.dirname(os.path.realpath(__file__))
-git_hash = None
+git_hash = get_git_hash(os.path.dirname(MULTIQC_DIR))
 git_hash_short = None
-try:
-    git_hash = subprocess.check_output( ['git', 'rev-parse', 'HEAD'],
-                                        cwd=script_path,
-                                        stderr=subprocess.STDOUT,
-                                        universal_newlines=True )
+if git_hash is not None:
     git_hash_short = git_hash[:7]
     version = '{} ({})'.format(version, git_hash_short)
-except:
-    pass
-
-# Constants
-MULTIQC_DIR = os.path.dirname(os.path.realpath(inspect.getfile(multiqc)))
 
 ##### MultiQC Defaults
 # Default MultiQC config
 searchp_fn = os.path.join( MULTIQC_DIR, 'utils', 'config_defaults.yaml')
 with open(searchp_fn) as f:
-    configs = yaml.load(f)
+    configs = yaml.load(f, Loader=yaml_loader)
     for c, v in configs.items():
         globals()[c] = v
 # Module filename search patterns
 searchp_fn = os.path.join( MULTIQC_DIR, 'utils', 'search_patterns.yaml')
 with open(searchp_fn) as f:
-    sp = yaml.load(f)
+    sp = yaml.load(f, Loader=yaml_loader)
 
 # Other defaults that can't be set in YAML
 modules_dir = os.path.join(MULTIQC_DIR, 'modules')
-creation_date = datetime.now().strftime("%Y-%m-%d, %H:%m")
-working_dir = os.getcwd()
-analysis_dir = [os.getcwd()]
-output_dir = os.path.realpath(os.getcwd())
-report_id = 'mqc_report_{}'.format(''.join(random.sample('abcdefghijklmnopqrstuvwxyz0123456789', 20)))
+def set_run_defaults():
+    """ Defaults that are different for every MultiQC run """
+    global creation_date, working_dir, analysis_dir, output_dir, report_id
+    creation_date = datetime.now().strftime("%Y-%m-%d, %H:%m")
+    working_dir = os.getcwd()
+    analysis_dir = [os.getcwd()]
+    output_dir = os.path.realpath(os.getcwd())
+    report_id = 'mqc_report_{}'.format(''.join(random.sample('abcdefghijklmnopqrstuvwxyz0123456789', 20)))
+set_run_defaults()
 
 ##### Available modules
 # Modules must be listed in setup.py under entry_points['multiqc.modules.v1']
 # Get all modules, including those from other extension packages
 avail_modules = dict()
-for entry_point in pkg_resources.iter_entry_points('multiqc.modules.v1'):
+for entry_point in entry_points.iter_entry_points('multiqc.modules.v1'):
     nicename = str(entry_point).split('=')[0].strip()
     avail_modules[nicename] = entry_point
 
@@ -69,7 +103,7 @@ for entry_point in pkg_resources.iter_entry_points('multiqc.modules.v1'):
 # Templates must be listed in setup.py under entry_points['multiqc.templates.v1']
 # Get all templates, including those from other extension packages
 avail_templates = {}
-for entry_point in pkg_resources.iter_entry_points('multiqc.templates.v1'):
+for entry_point in entry_points.iter_entry_points('multiqc.templates.v1'):
     nicename = str(entry_point).split('=')[0].strip()
     avail_templates[nicename] = entry_point
 
@@ -115,13 +149,17 @@ def mqc_load_config(yaml_config):
     if os.path.isfile(yaml_config):
         try:
             with open(yaml_config) as f:
-                new_config = yaml.load(f)
+                new_config = yaml.load(f, Loader=yaml_loader)
                 logger.debug("Loading config settings from: {}".format(yaml_config))
                 for c, v in new_config.items():
                     if c == 'sp':
                         # Merge filename patterns instead of replacing
                         sp.update(v)
                         logger.debug("Added to filename patterns: {}".format(v))
+                    elif c == 'module_search_keys':
+                        # Merge module search keys instead of replacing
+                        module_search_keys.update(v)
+                        logger.debug("Added to module search keys: {}".format(v))
                     elif c == 'extra_fn_clean_exts':
                         # Prepend to filename cleaning patterns instead of replacing
                         fn_clean_exts[0:0] = v
@@ -141,3 +179,34 @@ def mqc_load_config(yaml_config):
     else:
         logger.debug("No MultiQC config found: {}".format(yaml_config))
 
+
+# Functions to run MultiQC more than once in the same Python process. Used by MultiQCSession.
+def is_setting(name, value):
+    """ Check whether a global variable in this module is a config setting """
+    return not name.startswith('_') and name != 'logger' and not inspect.ismodule(value) and not callable(value)
+
+def copy_settings(settings):
+    copied = dict()
+    for name, value in settings.items():
+        try:
+            copied[name] = copy.deepcopy(value)
+        except Exception:
+            copied[name] = value # Eg. a file handle
+    return copied
+
+def get_settings():
+    """
+    Copy the current config settings, so that they can be
+    put back with reset() before another MultiQC run.
+    """
+    return copy_settings(dict([ (n, v) for n, v in globals().items() if is_setting(n, v) ]))
+
+def reset(settings):
+    """
+    Put the config back to settings copied with get_settings(), removing any
+    settings that were added since. The new run gets its own report ID.
+    """
+    for name in [ n for n, v in globals().items() if is_setting(n, v) and n not in settings ]:
+        del globals()[name]
+    globals().update(copy_settings(settings))
+    set_run_defaults()
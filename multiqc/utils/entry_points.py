@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+
+""" MultiQC entry point registry. Finds the modules, templates and plugins that
+are installed and caches them, so that pkg_resources doesn't need to be imported
+every time that MultiQC starts. """
+
+from __future__ import print_function
+import hashlib
+import importlib
+import io
+import json
+import os
+import sys
+import tempfile
+
+# Bump to throw away all previously cached entry points
+ENTRY_POINT_CACHE_VERSION = 1
+
+# Entry point groups that are cached. Others are looked up with pkg_resources.
+GROUPS = ['multiqc.modules.v1', 'multiqc.templates.v1', 'multiqc.hooks.v1', 'multiqc.cli_options.v1']
+
+# Package metadata that holds entry points
+METADATA_EXTS = ('.egg-info', '.dist-info', '.egg', '.egg-link', '.pth')
+
+class EntryPoint(object):
+    """ Entry point from the cache. Loaded in the same way as a pkg_resources.EntryPoint """
+
+    def __init__(self, name, module_name, attrs=()):
+        self.name = name
+        self.module_name = module_name
+        self.attrs = tuple(attrs)
+
+    def load(self):
+        obj = importlib.import_module(self.module_name)
+        for attr in self.attrs:
+            obj = getattr(obj, attr)
+        return obj
+
+    def __str__(self):
+        s = '{} = {}'.format(self.name, self.module_name)
+        if self.attrs:
+            s += ':{}'.format('.'.join(self.attrs))
+        return s
+
+def cache_dir():
+    """ MultiQC directory in the user cache directory """
+    return os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')), 'multiqc')
+
+def cache_path():
+    """ Cache file for this Python, in the user cache directory """
+    python_id = hashlib.sha1(json.dumps([sys.executable, sys.version]).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(cache_dir(), 'entry_points_{}.json'.format(python_id))
+
+def path_fingerprint():
+    """
+    Describe the installed packages, so that the cache is thrown away when
+    packages are installed, removed or updated. Uses the modification times
+    of the directories on sys.path and of each package's metadata.
+    The working directory is skipped, as it can hold a lot of files.
+    """
+    fingerprint = list()
+    for path in sys.path:
+        if not os.path.isabs(path):
+            continue
+        try:
+            fingerprint.append([path, os.stat(path).st_mtime])
+            names = sorted(os.listdir(path))
+        except OSError:
+            fingerprint.append([path, None])
+            continue
+        for fn in names:
+            if fn.endswith(METADATA_EXTS):
+                for meta_fn in [fn, os.path.join(fn, 'entry_points.txt'), os.path.join(fn, 'EGG-INFO', 'entry_points.txt')]:
+                    try:
+                        fingerprint.append([meta_fn, os.stat(os.path.join(path, meta_fn)).st_mtime])
+                    except OSError:
+                        pass
+    return [ENTRY_POINT_CACHE_VERSION, sys.path, fingerprint]
+
+def load_cache(path, fingerprint):
+    """ Returns the cached entry points, or None if the cache is missing or out of date """
+    try:
+        with io.open(path, 'r', encoding='utf-8') as fh:
+            cached = json.load(fh)
+    except (IOError, OSError, ValueError):
+        return None
+    if cached.get('fingerprint') != json.loads(json.dumps(fingerprint)):
+        return None
+    return cached
+
+def save_cache(path, cached):
+    """ Save the entry points. Written to a temporary file first, so that
+    MultiQC runs starting at the same time never read half a cache file. """
+    try:
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'w') as fh:
+            json.dump(cached, fh)
+        os.rename(tmp_path, path)
+    except Exception:
+        # Eg. a read-only home directory. Look up the entry points every time.
+        try:
+            os.remove(tmp_path)
+        except (NameError, OSError):
+            pass
+
+def find_entry_points():
+    """
+    Get the MultiQC version and the installed entry points, from the
+    cache if nothing has been installed since it was written.
+    :return: Dict with 'version' and 'entry_points': {group: [[name, module, attrs], ..]}
+    """
+    fingerprint = path_fingerprint()
+    path = cache_path()
+    cached = load_cache(path, fingerprint)
+    if cached is None:
+        import pkg_resources
+        cached = {
+            'fingerprint': fingerprint,
+            'version': pkg_resources.get_distribution('multiqc').version,
+            'entry_points': dict([ (group, [ [ep.name, ep.module_name, list(ep.attrs)] for ep in pkg_resources.iter_entry_points(group) ]) for group in GROUPS ])
+        }
+        save_cache(path, cached)
+    return cached
+
+registry = find_entry_points()
+version = registry['version']
+
+def iter_entry_points(group):
+    """ Returns the entry points for a group, like pkg_resources.iter_entry_points() """
+    if group not in registry['entry_points']:
+        import pkg_resources
+        return list(pkg_resources.iter_entry_points(group))
+    return [ EntryPoint(*ep) for ep in registry['entry_points'][group] ]
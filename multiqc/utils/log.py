@@ -14,6 +14,7 @@ from multiqc.utils import config, util_functions
 LEVELS = {0: 'INFO', 1: 'DEBUG'}
 log_tmp_dir = None
 log_tmp_fn = '/dev/null'
+log_handlers = list()
 
 def init_log(logger, loglevel=0):
     """
@@ -27,6 +28,7 @@ def init_log(logger, loglevel=0):
     """
     # File for logging
     global log_tmp_dir, log_tmp_fn
+    remove_handlers(logger)
     log_tmp_dir = tempfile.mkdtemp()
     log_tmp_fn = os.path.join(log_tmp_dir, 'multiqc.log')
 
@@ -45,12 +47,22 @@ def init_log(logger, loglevel=0):
     else:
         console.setFormatter(logging.Formatter(info_template))
     logger.addHandler(console)
+    log_handlers.append(console)
 
     # Now set up the file logging stream if we have a data directory
     file_handler = logging.FileHandler(log_tmp_fn, encoding='utf-8')
     file_handler.setLevel(getattr(logging, 'DEBUG')) # always DEBUG for the file
     file_handler.setFormatter(logging.Formatter(debug_template))
     logger.addHandler(file_handler)
+    log_handlers.append(file_handler)
+
+def remove_handlers(logger):
+    """ Remove the handlers added by init_log(), eg. from a
+    previous MultiQC run in the same Python process. """
+    for handler in log_handlers:
+        handler.close()
+        logger.removeHandler(handler)
+    del log_handlers[:]
 
 def move_tmp_log(logger):
     """ Move the temporary log file to the MultiQC data directory
@@ -58,7 +70,11 @@ def move_tmp_log(logger):
 
     try:
         # https://stackoverflow.com/questions/15435652/python-does-not-release-filehandles-to-logfile
-        logging.shutdown()
+        # Only close our own log file, as MultiQC could be running inside another program
+        for handler in [ h for h in log_handlers if isinstance(h, logging.FileHandler) ]:
+            handler.close()
+            logger.removeHandler(handler)
+            log_handlers.remove(handler)
         shutil.move(log_tmp_fn, os.path.join(config.data_dir, 'multiqc.log'))
         util_functions.robust_rmtree(log_tmp_dir)
     except (AttributeError, TypeError, IOError):
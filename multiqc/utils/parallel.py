@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+
+""" MultiQC functions to run modules in parallel worker processes """
+
+from __future__ import print_function
+import multiprocessing
+from multiprocessing.pool import MaybeEncodingError, ThreadPool
+import os
+import signal
+import time
+import traceback
+
+from multiqc import config
+from multiqc.utils import profiler, report
+logger = config.logger
+
+class ModuleError(Exception):
+    """ A module raised an exception in a worker process. Holds the traceback text. """
+    pass
+
+class ModuleResult(object):
+    """ What a module sends back from a worker process """
+
+    def __init__(self, mod_name, fetch):
+        self.mod_name = mod_name
+        self.fetch = fetch
+
+    def get(self):
+        """
+        Wait for the module to finish, add its results to the report and return
+        its outputs. Raises the same exceptions as running the module directly.
+        """
+        try:
+            status, value, state, profile = self.fetch()
+        except MaybeEncodingError:
+            # Module results that can't be pickled. Run the module again here, so that its output isn't lost.
+            logger.debug("Couldn't send back the results of module '{}' from a worker process, running it again".format(self.mod_name))
+            return run_module(self.mod_name)
+        except Exception:
+            # Eg. module output that couldn't be sent back from the worker
+            raise ModuleError(traceback.format_exc())
+        profiler.add_worker_results(profile)
+        if status == 'none':
+            raise UserWarning
+        if status == 'error':
+            raise ModuleError(value)
+        report.merge_module_state(state)
+        return value
+
+def run_module(mod_name):
+    """ Load and run a module, returning a list of its outputs """
+    with profiler.phase(mod_name, 'module') as p:
+        start = time.time()
+        mod = config.avail_modules[mod_name].load()
+        p.record['import_time'] = round(time.time() - start, 4)
+        output = mod()
+    if type(output) != list:
+        output = [output]
+    return output
+
+def fork_context():
+    """
+    Get the multiprocessing context to start workers with. Workers are
+    forked, so that they share the config and file search results.
+    Returns None if this platform can't fork.
+    """
+    if not hasattr(os, 'fork'):
+        return None
+    try:
+        return multiprocessing.get_context('fork')
+    except AttributeError:
+        return multiprocessing # Python 2 always forks on POSIX
+    except ValueError:
+        return None
+
+def init_worker():
+    # Leave the parent process to deal with Ctrl-C
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def module_worker(mod_name):
+    """ Run a single module in a worker process """
+    report.reset_module_state()
+    profiler.take_worker_results()
+    try:
+        output = run_module(mod_name)
+    except UserWarning:
+        return 'none', None, None, profiler.take_worker_results()
+    except Exception:
+        return 'error', traceback.format_exc(), None, profiler.take_worker_results()
+    return 'ok', output, report.get_module_state(), profiler.take_worker_results()
+
+def run_modules(mod_names, processes):
+    """
+    Run modules in a pool of worker processes. Check fork_context() first.
+    :param mod_names: List of module names
+    :param processes: Number of worker processes
+    :return: Yields (module name, ModuleResult) in the same order as mod_names,
+             skipping modules that didn't find any log files.
+             ModuleResult.get() must be called before moving on to the next module.
+    """
+    # Workers need the complete list of files, so can't start during a streamed search
+    if report.search_running():
+        logger.debug("Waiting for the file search to finish before starting worker processes")
+        report.wait_for_search()
+    mod_names = [ m for m in mod_names if report.module_has_files(m) ]
+    # Import the modules before forking, so that each worker doesn't import them again
+    for mod_name in mod_names:
+        try:
+            config.avail_modules[mod_name].load()
+        except Exception:
+            pass # Reported when the worker tries to load it
+    logger.debug("Running {} modules in {} worker processes".format(len(mod_names), processes))
+    pool = fork_context().Pool(processes, init_worker)
+    try:
+        results = pool.imap(module_worker, mod_names)
+        for mod_name in mod_names:
+            yield mod_name, ModuleResult(mod_name, lambda: next(results))
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+# Function run by map_files() workers. Set before the workers start,
+# so that forked worker processes inherit it and it doesn't need pickling.
+map_function = None
+
+def map_worker(item):
+    return map_function(item)
+
+def traced_map_worker(item):
+    """ map_worker() that also sends back its trace events (--trace) """
+    profiler.take_worker_results()
+    result = traced_function(map_function)(item)
+    return result, profiler.take_worker_results()
+
+def traced_function(function):
+    """ Wrap a map_files() function to add a trace event for each file """
+    def traced(f):
+        with profiler.span(f.get('fn', 'file'), 'log_file'):
+            return function(f)
+    return traced
+
+def map_files(function, files, workers):
+    """
+    Run a function on each of a list of files, using a pool of worker processes.
+    Falls back to threads if processes can't be used, eg. inside a module
+    that is already running in a --processes worker.
+    :param function: Function called with each file dict, returning something that can be pickled
+    :param files: Iterable of file dicts, eg. from find_log_files(filecontents=False)
+    :param workers: Number of worker processes or threads
+    :return: List of function results, in the same order as files
+    """
+    global map_function
+    traced = traced_function(function) if profiler.tracing else function
+    if workers <= 1:
+        return [ traced(f) for f in files ]
+    ctx = fork_context()
+    # Worker processes send back their trace events with each result
+    send_trace = False
+    if ctx is None or multiprocessing.current_process().daemon:
+        pool = ThreadPool(workers)
+        results = pool.imap(traced, files)
+    else:
+        map_function = function
+        send_trace = profiler.tracing
+        pool = ctx.Pool(workers, init_worker)
+        results = pool.imap(traced_map_worker if send_trace else map_worker, files, chunksize=4)
+    try:
+        results = list(results)
+        if send_trace:
+            for result, worker_results in results:
+                profiler.add_worker_results(worker_results)
+            results = [ result for result, worker_results in results ]
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+        map_function = None
+    return results
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+""" MultiQC cache of parsed log file data, shared between runs """
+
+from __future__ import print_function
+import hashlib
+import io
+import json
+import os
+import pickle
+import tempfile
+
+from multiqc import config
+logger = config.logger
+
+# Bump to throw away all previously cached results
+PARSE_CACHE_VERSION = 1
+
+# Config options that change the sample names given to parsed data
+S_NAME_CONFIG = ['prepend_dirs', 'prepend_dirs_sep', 'prepend_dirs_depth',
+                 'fn_clean_sample_names', 'fn_clean_exts', 'fn_clean_trim']
+
+class ParseCache(object):
+    """ On-disk cache of parsed data, stored as one pickle file per log file in a
+    directory. Files are remembered by their real path, size and modification
+    time, together with the MultiQC version, the module and parser function and
+    the sample name cleaning config. Cache files are named by a hash of all
+    of these, so a changed log file or setting never gives old results. """
+
+    def __init__(self, path, module, sp_key, parser):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        parser_name = '{}.{}'.format(getattr(parser, '__module__', ''), getattr(parser, '__qualname__', getattr(parser, '__name__', '')))
+        settings = [ getattr(config, k, None) for k in S_NAME_CONFIG ]
+        self.prefix = json.dumps([PARSE_CACHE_VERSION, config.version, module, sp_key, parser_name, settings], sort_keys=True, default=str)
+
+    def file_key(self, f):
+        """ Returns the cache key for a file dict from the file search """
+        path = os.path.realpath(os.path.join(f['root'], f['fn']))
+        if 'filesize' in f and 'mtime' in f:
+            size, mtime = f['filesize'], f['mtime']
+        else:
+            st = os.stat(path)
+            size, mtime = st.st_size, st.st_mtime
+        key = json.dumps([self.prefix, path, size, repr(mtime)])
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def cache_path(self, key):
+        return os.path.join(self.path, key[:2], '{}.pickle'.format(key))
+
+    def get(self, key):
+        """ Look up the parsed data for a file.
+        :param key: Key from file_key()
+        :return: Tuple of (True, parsed data) if found, else (False, None)
+        """
+        try:
+            with io.open(self.cache_path(key), 'rb') as fh:
+                parsed = pickle.load(fh)
+        except (IOError, OSError, EOFError, ValueError, pickle.UnpicklingError):
+            self.misses += 1
+            return False, None
+        except Exception as e:
+            # Eg. a class that no longer exists
+            logger.debug("Couldn't load cached parsed data '{}': {}".format(key, e))
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        return True, parsed
+
+    def set(self, key, parsed):
+        """ Save the parsed data for a file. Written to a temporary
+        file first, so that a crash never leaves half a cache file. """
+        cache_path = self.cache_path(key)
+        try:
+            if not os.path.isdir(os.path.dirname(cache_path)):
+                os.makedirs(os.path.dirname(cache_path))
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as fh:
+                pickle.dump(parsed, fh, 2)
+            os.rename(tmp_path, cache_path)
+        except Exception as e:
+            logger.debug("Couldn't save parsed data to the cache: {}".format(e))
+            try:
+                os.remove(tmp_path)
+            except (NameError, OSError):
+                pass
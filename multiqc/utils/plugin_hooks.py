@@ -4,11 +4,11 @@
 to run their own custom subroutines at predefined
 trigger points during MultiQC execution. """
 
-import pkg_resources
+from multiqc.utils import entry_points, profiler
 
 # Load the hooks
 hook_functions = {}
-for entry_point in pkg_resources.iter_entry_points('multiqc.hooks.v1'):
+for entry_point in entry_points.iter_entry_points('multiqc.hooks.v1'):
   nicename = str(entry_point).split('=')[0].strip()
   try:
     hook_functions[nicename].append(entry_point.load())
@@ -17,5 +17,7 @@ for entry_point in pkg_resources.iter_entry_points('multiqc.hooks.v1'):
 
 # Function to run the hooks
 def mqc_trigger (trigger):
+  profiler.mark(trigger, 'hook')
   for hook in hook_functions.get(trigger, []):
-    hook()
+    with profiler.span('{}: {}'.format(trigger, getattr(hook, '__name__', 'hook')), 'hook'):
+      hook()
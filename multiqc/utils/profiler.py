@@ -0,0 +1,354 @@
+#!/usr/bin/env python
+
+""" MultiQC run profiling. Records the time, CPU time, memory and file reading
+of each phase of a run and of each module, to show where the time goes
+(--profile). Can also save a timeline of the run in the Chrome trace event
+format (--trace), which can be viewed with chrome://tracing or Perfetto. """
+
+from __future__ import print_function
+import functools
+import io
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None # Windows
+
+from multiqc import config
+logger = config.logger
+
+PROFILE_FN = 'multiqc_profile.json'
+TRACE_FN = 'multiqc_trace.json'
+
+# Number of searched files in each trace event of the file search
+SEARCH_BATCH_FILES = 100
+
+enabled = False
+tracing = False
+# Finished phases, in the order that they finished
+phases = list()
+# Time spent searching the files that matched each search key
+search_keys = dict()
+# Trace events, and the search batch that is open in each thread
+trace_events = list()
+search_batches = dict()
+run_start = None
+lock = threading.Lock()
+# Phases that are running in each thread, innermost last
+running = threading.local()
+
+def init(enable, trace=False):
+    """ Get ready for a new MultiQC run, profiling it if enable is True
+    and recording trace events if trace is True """
+    global enabled, tracing, run_start
+    enabled = bool(enable)
+    tracing = bool(trace)
+    del phases[:]
+    search_keys.clear()
+    del trace_events[:]
+    search_batches.clear()
+    running.stack = list()
+    run_start = usage() if enabled or tracing else None
+
+def max_rss():
+    """ Peak resident memory of this process so far, in bytes, or None if not known """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux gives kilobytes, macOS gives bytes
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+def bytes_read():
+    """
+    Bytes read by this process and the child processes that have finished,
+    from /proc/self/io. Returns None if not available (eg. not Linux).
+    """
+    try:
+        with io.open('/proc/self/io') as fh:
+            for line in fh:
+                if line.startswith('rchar:'):
+                    return int(line.split()[1])
+    except (IOError, OSError, ValueError):
+        pass
+    return None
+
+def usage():
+    """ Resources used so far. CPU time includes finished worker processes. """
+    t = os.times()
+    return {
+        'wall_time': time.time(),
+        'cpu_time': t[0] + t[1] + t[2] + t[3],
+        'max_rss': max_rss(),
+        'bytes_read': bytes_read()
+    }
+
+def usage_since(start):
+    """ Resources used since start, which came from usage() """
+    end = usage()
+    used = dict()
+    for k, name in [('wall_time', 'wall_time'), ('cpu_time', 'cpu_time'), ('max_rss', 'peak_rss_increase'), ('bytes_read', 'bytes_read')]:
+        if start[k] is None or end[k] is None:
+            used[name] = None
+        elif k in ['wall_time', 'cpu_time']:
+            used[name] = round(end[k] - start[k], 4)
+        else:
+            used[name] = end[k] - start[k]
+    return used
+
+class Phase(object):
+    """
+    Context manager that profiles part of a run. Log files given to
+    modules and time spent in plot functions are added to the
+    innermost phase running in the same thread.
+    """
+
+    def __init__(self, name, kind):
+        self.record = {'name': name, 'type': kind, 'files': 0, 'file_bytes': 0, 'plot_time': 0.0}
+
+    def __enter__(self):
+        self.start = usage()
+        get_stack().append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        get_stack().remove(self)
+        self.record.update(usage_since(self.start))
+        self.record['plot_time'] = round(self.record['plot_time'], 4)
+        if tracing:
+            add_event(self.record['name'], self.record['type'], self.start['wall_time'], time.time())
+        if enabled:
+            with lock:
+                phases.append(self.record)
+
+class Span(object):
+    """ Context manager that adds a trace event covering its block """
+
+    def __init__(self, name, cat, args):
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        add_event(self.name, self.cat, self.start, time.time(), self.args)
+
+class NoPhase(object):
+    """ Stands in for Phase and Span when not profiling """
+    def __init__(self):
+        self.record = dict()
+    def __enter__(self):
+        return self
+    def __exit__(self, exc_type, exc_value, tb):
+        pass
+
+def get_stack():
+    if not hasattr(running, 'stack'):
+        running.stack = list()
+    return running.stack
+
+def phase(name, kind='phase'):
+    """
+    Profile part of a run, eg. `with profiler.phase('render'):`
+    Does nothing unless profiling is enabled.
+    """
+    if not enabled and not tracing:
+        return NoPhase()
+    return Phase(name, kind)
+
+def span(name, cat, **args):
+    """
+    Add a trace event for a block of code, eg. `with profiler.span('savefig', 'plot'):`
+    Does nothing unless tracing is enabled.
+    """
+    if not tracing:
+        return NoPhase()
+    return Span(name, cat, args)
+
+def add_event(name, cat, start, end=None, args=None, thread=None):
+    """
+    Add a trace event. Times are from time.time(). Events without an end time
+    are instant events, shown as a line across the whole process.
+    :param thread: (ident, name) of the thread that the event happened in. Default: this thread.
+    """
+    if thread is None:
+        thread = (threading.current_thread().ident, threading.current_thread().name)
+    event = {
+        'name': name,
+        'cat': cat,
+        'ts': round((start - run_start['wall_time']) * 1000000, 1),
+        'pid': os.getpid(),
+        'tid': thread[0],
+        # Used for the thread name metadata events
+        'thread_name': thread[1]
+    }
+    if end is None:
+        event.update({'ph': 'i', 's': 'p'})
+    else:
+        event.update({'ph': 'X', 'dur': round((end - start) * 1000000, 1)})
+    if args:
+        event['args'] = args
+    with lock:
+        trace_events.append(event)
+
+def mark(name, cat, **args):
+    """ Add an instant trace event, eg. a plugin hook trigger """
+    if tracing:
+        add_event(name, cat, time.time(), args=args)
+
+def current():
+    """ Innermost phase running in this thread, or None """
+    stack = get_stack()
+    return stack[-1] if len(stack) > 0 else None
+
+def add_file(f):
+    """ Count a log file given to a module """
+    p = current() if enabled else None
+    if p is not None:
+        p.record['files'] += 1
+        p.record['file_bytes'] += f.get('filesize', 0)
+
+def add_search(f, keys, start, end):
+    """
+    Add the time taken to search a file to the search keys that it matched.
+    For the trace, searched files are grouped into batches in each thread.
+    """
+    with lock:
+        if enabled:
+            for key in keys or ['(no match)']:
+                k = search_keys.setdefault(key, {'files': 0, 'file_bytes': 0, 'search_time': 0.0})
+                k['files'] += 1
+                k['file_bytes'] += f.get('filesize', 0)
+                k['search_time'] += (end - start) / max(len(keys), 1)
+        if tracing:
+            thread = (threading.current_thread().ident, threading.current_thread().name)
+            batch = search_batches.setdefault(thread[0], {'start': start, 'files': 0, 'matched': 0, 'thread': thread})
+            batch['end'] = end
+            batch['files'] += 1
+            batch['matched'] += 1 if keys else 0
+    if tracing and batch['files'] >= SEARCH_BATCH_FILES:
+        end_search_batches(threading.current_thread().ident)
+
+def end_search_batches(tid=None):
+    """ Add trace events for searched files that aren't in one yet,
+    for one thread or for all threads if tid is None """
+    with lock:
+        ended = [ (t, search_batches.pop(t)) for t in list(search_batches) if tid is None or t == tid ]
+    for t, batch in ended:
+        add_event('search {} files'.format(batch['files']), 'search', batch['start'], batch['end'], {'matched': batch['matched']}, batch['thread'])
+
+def plot_function(func):
+    """ Decorator for plot functions, to split the time spent plotting from the
+    rest of a module. Plots made by other plots are only counted once. """
+    name = '{}.{}'.format(func.__module__.split('.')[-1], func.__name__)
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        p = current() if enabled else None
+        outer = p is not None and not getattr(running, 'plotting', False)
+        if outer:
+            running.plotting = True
+        with span(name, 'plot'):
+            start = time.time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                if outer:
+                    running.plotting = False
+                    p.record['plot_time'] += time.time() - start
+    return wrapper
+
+def take_worker_results():
+    """ Remove and return the finished phases and trace events, to send them back from a worker process """
+    with lock:
+        taken = {'phases': list(phases), 'trace_events': list(trace_events)}
+        del phases[:]
+        del trace_events[:]
+    return taken
+
+def add_worker_results(results):
+    """ Add phases and trace events from a worker process """
+    with lock:
+        phases.extend(results['phases'])
+        trace_events.extend(results['trace_events'])
+
+def results():
+    """ Everything that has been profiled, as a dict that can be saved as JSON """
+    modules = [ p for p in phases if p['type'] == 'module' ]
+    for p in modules:
+        p['parse_time'] = round(max(p['wall_time'] - p['plot_time'] - p.get('import_time', 0), 0), 4)
+    return {
+        'multiqc_version': config.version,
+        'total': usage_since(run_start),
+        'phases': phases,
+        'search_keys': dict([ (k, dict(v, search_time=round(v['search_time'], 4))) for k, v in search_keys.items() ])
+    }
+
+def mb(num_bytes):
+    return '' if num_bytes is None else '{:.1f}'.format(num_bytes / 1048576.0)
+
+def log_summary(profile):
+    """ Print a table of where the time went to the log """
+    row = "{:<24} {:>9} {:>9} {:>9} {:>9} {:>9} {:>7} {:>10}"
+    lines = [
+        row.format('Phase', 'Wall (s)', 'CPU (s)', 'Parse (s)', 'Plot (s)', 'RSS +MB', 'Files', 'Read (MB)'),
+        row.format(*['-'*24] + ['-'*9]*5 + ['-'*7, '-'*10])
+    ]
+    for p in profile['phases'] + [dict(profile['total'], name='Total')]:
+        lines.append(row.format(
+            p['name'][:24],
+            '{:.2f}'.format(p['wall_time']),
+            '{:.2f}'.format(p['cpu_time']),
+            '{:.2f}'.format(p['parse_time']) if 'parse_time' in p else '',
+            '{:.2f}'.format(p['plot_time']) if p.get('plot_time') else '',
+            mb(p['peak_rss_increase']),
+            p.get('files') or '',
+            mb(p['bytes_read'])
+        ))
+    logger.info("Profile of this run:\n" + "\n".join(lines))
+    slowest = sorted(profile['search_keys'].items(), key=lambda k: k[1]['search_time'], reverse=True)[:10]
+    if len(slowest) > 0:
+        logger.info("Slowest search keys:\n" + "\n".join([
+            "{:<40} {:>9.2f} s {:>7} files {:>9} MB".format(k, v['search_time'], v['files'], mb(v['file_bytes'])) for k, v in slowest ]))
+
+def trace():
+    """ The trace events in the Chrome trace event format, with names for each process and thread """
+    events = list()
+    thread_names = dict()
+    for e in sorted(trace_events, key=lambda e: e['ts']):
+        e = dict(e)
+        thread_names[(e['pid'], e['tid'])] = e.pop('thread_name')
+        events.append(e)
+    for (pid, tid), name in thread_names.items():
+        events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}})
+    for pid in set([ pid for pid, tid in thread_names ]):
+        name = 'MultiQC' if pid == os.getpid() else 'MultiQC worker {}'.format(pid)
+        events.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': name}})
+    return {'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': {'multiqc_version': config.version}}
+
+def save_json(data, fn, label):
+    """ Save profiling results to the data directory """
+    if config.data_dir is not None and os.path.isdir(config.data_dir):
+        path = os.path.join(config.data_dir, fn)
+        with io.open(path, 'w', encoding='utf-8') as fh:
+            jsonstr = json.dumps(data, indent=4, ensure_ascii=False)
+            print( jsonstr.encode('utf-8', 'ignore').decode('utf-8'), file=fh)
+        logger.info("{:<12}: {}".format(label, os.path.relpath(path)))
+    else:
+        logger.warning("No data directory, so the {} hasn't been saved".format(label.lower()))
+
+def finish():
+    """ Log the profile and save it and the trace to the data directory """
+    if enabled:
+        profile = results()
+        log_summary(profile)
+        save_json(profile, PROFILE_FN, 'Profile')
+    if tracing:
+        end_search_batches()
+        save_json(trace(), TRACE_FN, 'Trace')
@@ -10,12 +10,17 @@ import click
 import fnmatch
 import io
 import json
-import mimetypes
+from multiprocessing.pool import ThreadPool
 import os
-import re
+import pickle
+import stat
+import threading
+import time
+import traceback
 import yaml
 
 from multiqc import config
+from multiqc.utils import profiler, search
 logger = config.logger
 
 # Treat defaultdict and OrderedDict as normal dicts for YAML output
@@ -27,191 +32,690 @@ try:
 except NameError:
     pass # Python 3
 
-# Set up global variables shared across modules
-general_stats_data = list()
-general_stats_headers = list()
-general_stats_html = ''
-data_sources = defaultdict(lambda:defaultdict(lambda:defaultdict()))
-num_hc_plots = 0
-num_mpl_plots = 0
-saved_raw_data = dict()
+# Parsed data for each log file, used by --update
+PARSED_DATA_FN = 'multiqc_parsed_data.json'
 
-# Make a dict of discovered files for each seach key
-searchfiles = list()
-files = dict()
-def get_filelist():
+# Bump when the layout of the parsed data file changes
+PARSED_DATA_FORMAT = 1
+
+try:
+    STRING_TYPES = (str, unicode)
+except NameError:
+    STRING_TYPES = (str,) # Python 3
+
+def init():
+    """
+    Set up the global variables shared across modules, ready for a new
+    MultiQC run. Called when this module is first imported, and by
+    MultiQCSession before each run in a long-running Python process.
+    """
+    global general_stats_data, general_stats_headers, general_stats_html, data_sources
+    global num_hc_plots, num_mpl_plots, saved_raw_data, parsed_log_files, modules_output, multiqc_command
+    global previous_parsed_log_files, previous_found_files, previous_files, previous_analysis_dir, file_index, archive_files
+    global searchfiles, files, files_cond, archive_readers, search_order, search_thread, search_complete
+
+    # Set up global variables shared across modules
+    general_stats_data = list()
+    general_stats_headers = list()
+    general_stats_html = ''
+    data_sources = defaultdict(lambda:defaultdict(lambda:defaultdict()))
+    num_hc_plots = 0
+    num_mpl_plots = 0
+    saved_raw_data = dict()
+    parsed_log_files = dict()
+    modules_output = list()
+    multiqc_command = ''
+
+    # Parsed data loaded from a previous run with --update
+    previous_parsed_log_files = dict()
+    previous_found_files = dict()
+    previous_files = list()
+    previous_analysis_dir = list()
+    # Position of each log file in the file search, see get_file_index()
+    file_index = dict()
+    # Archive that each log file found inside an archive came from
+    archive_files = dict()
+
+    # Make a dict of discovered files for each seach key
+    searchfiles = list()
+    files = dict()
+    files_cond = threading.Condition()
+    # Readers for archives with log files in them: {(process id, archive path): ArchiveReader}
+    archive_readers = dict()
+    search_order = dict()
+    search_thread = None
+    search_complete = threading.Event()
+
+init()
+
+def get_search_keys(run_modules=None):
+    """
+    Work out which search pattern keys are needed to run a set of modules.
+    Keys that don't belong to any module in config.module_search_keys
+    (eg. plugins or custom content patterns) are always kept.
+    :param run_modules: List of module names. None for all modules.
+    :return: List of search pattern keys, in config.sp order
+    """
+    if run_modules is None:
+        return list(config.sp.keys())
+    needed = set()
+    unneeded = set()
+    for mod, keys in config.module_search_keys.items():
+        if mod in run_modules:
+            needed.update(keys)
+        else:
+            unneeded.update(keys)
+    return [k for k in config.sp if k in needed or k not in unneeded]
+
+def get_filelist(run_modules=None, stream=False):
     """
     Go through all supplied search directories and assembly a master
     list of files to search. Then fire search functions for each file.
+    :param run_modules: Only search for files used by these modules.
+                        None to use every search pattern.
+    :param stream: Run the search in a background thread and return straight
+                   away. Files are added to `files` as they are found, use
+                   iter_files() to wait for results.
     """
+    global search_thread
     # Prep search patterns
-    spatterns = [{},{},{},{},{},{},{}]
-    for key, sps in config.sp.items():
+    for key in config.sp:
         files[key] = list()
-        if not isinstance(sps, list):
-            sps = [sps]
-        # Split search patterns according to speed of execution.
-        if any([x for x in sps if 'contents_re' in x]):
-            if any([x for x in sps if 'num_lines' in x]):
-                spatterns[4][key] = sps
-            elif any([x for x in sps if 'max_filesize' in x]):
-                spatterns[5][key] = sps
-            else:
-                spatterns[6][key] = sps
-        elif any([x for x in sps if 'contents' in x]):
-            if any([x for x in sps if 'num_lines' in x]):
-                spatterns[1][key] = sps
-            elif any([x for x in sps if 'max_filesize' in x]):
-                spatterns[2][key] = sps
-            else:
-                spatterns[3][key] = sps
+    search_keys = get_search_keys(run_modules)
+    if len(search_keys) < len(config.sp):
+        logger.debug("Using {} of {} search patterns for the selected modules".format(len(search_keys), len(config.sp)))
+    active_sp = OrderedDict([(k, config.sp[k]) for k in search_keys])
+    spatterns = search.SearchPatterns(active_sp)
+
+    # Load previous search results if we have a cache
+    cache = None
+    if config.search_cache is not None:
+        if search.sqlite3 is None:
+            logger.warning("Python sqlite3 module not available, not using the search cache")
         else:
-            spatterns[0][key] = sps
+            try:
+                cache = search.SearchCache(config.search_cache, active_sp)
+            except search.sqlite3.Error as e:
+                logger.warning("Could not open search cache '{}': {}".format(config.search_cache, e))
 
-    def add_file(fn, root):
+    def check_file(sf):
         """
         Function applied to each file found when walking the analysis
-        directories. Runs through all search patterns and returns True
-        if a match is found.
+        directories. Checks that the file should be searched and
+        returns the file dict with its stat result, or None.
         """
+        fn, root = sf[0], sf[1]
+        entry = sf[2] if len(sf) > 2 else None
         f = {'fn': fn, 'root': root}
 
-        # Check that this is a file and not a pipe or anything weird
-        if not os.path.isfile(os.path.join(root, fn)):
-            return None
-
         # Check that we don't want to ignore this file
         i_matches = [n for n in config.fn_ignore_files if fnmatch.fnmatch(fn, n)]
-        if len(i_matches) > 0:
+        if len(i_matches) > 0 and not spatterns.asks_for(fn):
             logger.debug("Ignoring file as matched an ignore pattern: {}".format(fn))
             return None
 
-        # Limit search to small files, to avoid 30GB FastQ files etc.
+        # Check that this is a file and not a pipe or anything weird.
+        # Directory entries from the search cache carry their stat results.
         try:
-            f['filesize'] = os.path.getsize(os.path.join(root,fn))
+            if entry is not None:
+                st = entry.stat()
+            else:
+                st = os.stat(os.path.join(root, fn))
         except (IOError, OSError, ValueError, UnicodeDecodeError):
             logger.debug("Couldn't read file when checking filesize: {}".format(fn))
-        else:
-            if f['filesize'] > config.log_filesize_limit:
-                return False
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+        f['filesize'] = st.st_size
+        f['mtime'] = st.st_mtime
 
-        # Test file for each search pattern
-        for patterns in spatterns:
-            for key, sps in patterns.items():
-                for sp in sps:
-                    if search_file (sp, f):
-                        # Looks good! Remember this file
-                        files[key].append(f)
-                        # Don't keep searching this file for other modules
-                        if not sp.get('shared', False):
-                            return
-                        # Don't look at other patterns for this module
-                        else:
-                            break
-
-    # Go through the analysis directories and get file list
-    for path in config.analysis_dir:
-        if os.path.isfile(path):
-            searchfiles.append([os.path.basename(path), os.path.dirname(path)])
-        elif os.path.isdir(path):
-            for root, dirnames, filenames in os.walk(path, followlinks=True, topdown=True):
-                bname = os.path.basename(root)
-
-                # Skip any sub-directories matching ignore params
-                orig_dirnames = dirnames[:]
-                for n in config.fn_ignore_dirs:
-                    dirnames[:] = [d for d in dirnames if not fnmatch.fnmatch(d, n.rstrip(os.sep))]
-                    if len(orig_dirnames) != len(dirnames):
-                        removed_dirs = [os.path.join(root, d) for d in set(orig_dirnames).symmetric_difference(set(dirnames))]
-                        logger.debug("Ignoring directory as matched fn_ignore_dirs: {}".format(", ".join(removed_dirs)))
-                        orig_dirnames = dirnames[:]
-                for n in config.fn_ignore_paths:
-                    dirnames[:] = [d for d in dirnames if not fnmatch.fnmatch(os.path.join(root, d), n.rstrip(os.sep))]
-                    if len(orig_dirnames) != len(dirnames):
-                        removed_dirs = [os.path.join(root, d) for d in set(orig_dirnames).symmetric_difference(set(dirnames))]
-                        logger.debug("Ignoring directory as matched fn_ignore_paths: {}".format(", ".join(removed_dirs)))
-
-                # Skip *this* directory if matches ignore params
-                d_matches = [n for n in config.fn_ignore_dirs if fnmatch.fnmatch(bname, n.rstrip(os.sep))]
-                if len(d_matches) > 0:
-                    logger.debug("Ignoring directory as matched fn_ignore_dirs: {}".format(bname))
+        # Limit search to small files, to avoid 30GB FastQ files etc.
+        if f['filesize'] > config.log_filesize_limit:
+            return None
+
+        return f, st, entry
+
+    def add_archive(f):
+        """
+        Runs each file in an archive through the search patterns, reading
+        the archive once. Matching files remember their archive member name,
+        so that modules can read them from the archive later.
+        Returns a list of (file dict, search keys) tuples.
+        """
+        archive_path = os.path.join(f['root'], f['fn'])
+        found = list()
+        try:
+            for name, size, mtime, read in search.iter_archive(archive_path):
+                mf = {
+                    'fn': os.path.basename(name),
+                    'root': os.path.normpath(os.path.join(archive_path, os.path.dirname(name))),
+                    'filesize': size,
+                    'mtime': mtime,
+                    'archive': archive_path,
+                    'archive_member': name
+                }
+                if size > config.log_filesize_limit:
                     continue
-                p_matches = [n for n in config.fn_ignore_paths if fnmatch.fnmatch(root, n.rstrip(os.sep))]
-                if len(p_matches) > 0:
-                    logger.debug("Ignoring directory as matched fn_ignore_paths: {}".format(root))
+                if any(fnmatch.fnmatch(mf['fn'], n) for n in config.fn_ignore_files) and not spatterns.asks_for(mf['fn']):
                     continue
-                # Search filenames in this directory
-                for fn in filenames:
-                    searchfiles.append([fn, root])
-    # Search through collected files
-    with click.progressbar(searchfiles, label="Searching {} files..".format(len(searchfiles))) as sfiles:
-        for sf in sfiles:
-            add_file(sf[0], sf[1])
+                contents = list()
+                def read_contents():
+                    # Tar members can only be read once, so hang on to the contents
+                    if len(contents) == 0:
+                        contents.append(read())
+                    return contents[0]
+                keys = match_keys(mf, read_contents)
+                if len(keys) > 0:
+                    found.append((mf, keys))
+        except search.READ_ERRORS as e:
+            logger.warning("Couldn't read archive '{}': {}".format(archive_path, e))
+        return found
+
+    def add_file(checked):
+        """
+        Runs a file through all search patterns and returns a list of
+        file dicts along with the search keys that they matched. Archives
+        which don't match anything themselves are searched file by file.
+        """
+        found = search_file_keys(checked)
+        f, keys = found
+        if len(keys) == 0 and config.search_archives and search.is_archive(f['fn']):
+            return add_archive(f)
+        return [found]
+
+    def search_file_keys(checked):
+        """
+        Runs a file through all search patterns and returns the
+        file dict along with a list of the search keys that matched.
+        """
+        f, st, entry = checked
+
+        # Test file for each search pattern, unless unchanged since the last run
+        if cache is not None:
+            try:
+                fid = cache.file_id(f, st, entry.is_symlink() if entry is not None else None)
+            except (IOError, OSError):
+                return f, []
+            keys = cache.get(fid)
+            if keys is None:
+                keys = match_keys(f)
+                cache.set(fid, keys)
+            elif profiler.enabled or profiler.tracing:
+                now = time.time()
+                profiler.add_search(f, keys, now, now)
+        else:
+            keys = match_keys(f)
+        return f, keys
+
+    def match_keys(f, read_contents=None):
+        """ Run a file through the search patterns, timing it with --profile or --trace """
+        if not profiler.enabled and not profiler.tracing:
+            return spatterns.search(f, read_contents)
+        start = time.time()
+        keys = spatterns.search(f, read_contents)
+        profiler.add_search(f, keys, start, time.time())
+        return keys
+
+    def run_search():
+        # Directory listing and file searching can be shared across threads
+        pool = None
+        if config.search_threads > 1:
+            pool = ThreadPool(config.search_threads)
+
+        # Files from a previous run (--update) which need parsing again. These
+        # go first, as a single run would have found them before the new files.
+        searchfiles.extend([ [os.path.basename(path), os.path.dirname(path)] for path in previous_files ])
+        previous_paths = set(previous_files)
+
+        # Go through the analysis directories and get file list
+        visited = search.Visited()
+        for path in config.analysis_dir:
+            if os.path.isfile(path):
+                searchfiles.append([os.path.basename(path), os.path.dirname(path)])
+            elif os.path.isdir(path):
+                with profiler.span('walk {}'.format(path), 'search'):
+                    searchfiles.extend(search.walk(path, pool, visited))
+
+        # Check the collected files, skipping any that we have already seen via another path
+        if pool is not None:
+            checked = pool.imap(check_file, searchfiles, chunksize=16)
+        else:
+            checked = (check_file(sf) for sf in searchfiles)
+        def unique_files():
+            for c in checked:
+                if c is not None and visited.first_file_visit(search.inode_key(c[1]), os.path.join(c[0]['root'], c[0]['fn'])):
+                    # Only keep this run's share of the files (--shard). Files from
+                    # the previous run are already part of the report, so always kept.
+                    path = os.path.join(c[0]['root'], c[0]['fn'])
+                    if config.shard is None or path in previous_paths or search.in_shard(path, *config.shard):
+                        yield c
+
+        # Search through collected files
+        if pool is not None:
+            results = pool.imap(add_file, unique_files(), chunksize=16)
+        else:
+            results = (add_file(c) for c in unique_files())
+        if stream:
+            logger.debug("Searching {} files in the background".format(len(searchfiles)))
+            add_results(results)
+        else:
+            with click.progressbar(results, length=len(searchfiles), label="Searching {} files..".format(len(searchfiles))) as sfiles:
+                add_results(sfiles)
+        if pool is not None:
+            pool.close()
+            pool.join()
+        if visited.skipped_dirs > 0 or visited.skipped_files > 0:
+            logger.debug("Skipped {} directories and {} files already found via another path".format(visited.skipped_dirs, visited.skipped_files))
+        if cache is not None:
+            cache.close()
+
+    def add_results(results):
+        for found in results:
+            for f, keys in found:
+                if len(keys) > 0:
+                    with files_cond:
+                        search_order.setdefault(os.path.join(f['root'], f['fn']), (len(search_order), f.get('archive')))
+                        for key in keys:
+                            # Looks good! Remember this file
+                            files[key].append(f)
+                        files_cond.notify_all()
+
+    def profiled_search():
+        with profiler.phase('search', 'search') as p:
+            run_search()
+            p.record['files'] = len(searchfiles)
+            profiler.end_search_batches()
+
+    def run_search_thread():
+        try:
+            profiled_search()
+        except Exception:
+            logger.error("File search failed:\n{}".format(traceback.format_exc()))
+        finally:
+            with files_cond:
+                search_complete.set()
+                files_cond.notify_all()
+
+    if stream:
+        search_complete.clear()
+        search_thread = threading.Thread(target=run_search_thread, name='multiqc-search')
+        search_thread.daemon = True
+        search_thread.start()
+    else:
+        profiled_search()
+
+def search_running():
+    """ Returns True while a streamed file search is still going """
+    return search_thread is not None and not search_complete.is_set()
+
+def wait_for_search():
+    """ Block until a streamed file search has finished """
+    if search_thread is not None:
+        while search_thread.is_alive():
+            search_thread.join(1)
+
+def module_has_files(mod_name):
+    """
+    Check whether a module has any log files to parse, so that modules without
+    any don't need to be imported. If the file search is being streamed, waits
+    until a file is found for the module or the search finishes.
+    Modules not listed in config.module_search_keys always return True.
+    """
+    # Custom content can also come from the config, without any files
+    if mod_name == 'custom_content' or mod_name not in config.module_search_keys:
+        return True
+    # Data parsed by a previous run (--update, multiqc merge). This is stored under
+    # the module's display name, so match it on the module's search keys instead.
+    if any([ sp_key in config.module_search_keys[mod_name] for name, sp_key in previous_parsed_log_files ]):
+        return True
+    keys = [ k for k in config.module_search_keys[mod_name] if k in files ]
+    with files_cond:
+        while True:
+            if any([ len(files[k]) > 0 for k in keys ]):
+                return True
+            if not search_running():
+                return False
+            files_cond.wait(1)
+
+def iter_files(sp_key):
+    """
+    Yields the files found for a search key, in the order that they were found.
+    If the file search is being streamed, waits for new files until it finishes.
+    """
+    i = 0
+    while True:
+        with files_cond:
+            while i >= len(files[sp_key]) and search_running():
+                files_cond.wait(1)
+            if i >= len(files[sp_key]):
+                return
+            f = files[sp_key][i]
+        i += 1
+        profiler.add_file(f)
+        yield f
+
+def open_found_file(f):
+    """
+    Open a file found by the search to read as bytes. Files from
+    inside archives are read from the archive again.
+    :param f: File dict from `files`
+    :return: Binary file handle
+    """
+    path = os.path.join(f['root'], f['fn'])
+    if 'archive' in f:
+        # Worker processes can't share open archives with their parent
+        key = (os.getpid(), f['archive'])
+        with files_cond:
+            if key not in archive_readers:
+                archive_readers[key] = search.ArchiveReader(f['archive'])
+        return search.open_file(path, archive_readers[key].read(f['archive_member']))
+    return search.open_file(path)
+
+def close_archives():
+    """ Close the archives opened to read log files, once every module has run """
+    with files_cond:
+        for reader in archive_readers.values():
+            reader.close()
+        archive_readers.clear()
+
+def reset_module_state():
+    """
+    Clear the results that modules add to the report, so that
+    a worker process only collects the output of its own module.
+    """
+    global general_stats_data, general_stats_headers, data_sources
+    global num_hc_plots, num_mpl_plots, saved_raw_data, parsed_log_files
+    general_stats_data = list()
+    general_stats_headers = list()
+    data_sources = defaultdict(lambda:defaultdict(lambda:defaultdict()))
+    num_hc_plots = 0
+    num_mpl_plots = 0
+    saved_raw_data = dict()
+    parsed_log_files = dict()
+
+class ModifiedValues(object):
+    """
+    Stand-in for a General Stats header 'modify' function that can't be
+    pickled (eg. a lambda). Holds the function result for every value in
+    the column, so that the header can be sent back from a worker process.
+    """
+    def __init__(self, modify, values):
+        self.results = dict()
+        for val in values:
+            try:
+                self.results[val] = modify(val)
+                self.results.setdefault(float(val), modify(float(val)))
+            except (TypeError, ValueError):
+                pass
+
+    def __call__(self, val):
+        return self.results.get(val, val)
+
+def picklable_headers(data, headers):
+    """ Replace 'modify' functions that can't be pickled with ModifiedValues """
+    for k, h in headers.items():
+        if callable(h.get('modify')):
+            try:
+                pickle.dumps(h['modify'], pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                values = [ samp[k] for samp in data.values() if k in samp ]
+                headers[k] = dict(h, modify=ModifiedValues(h['modify'], values))
+    return headers
+
+def plain_data(data):
+    """
+    Copy data with any defaultdicts turned into OrderedDicts, as a
+    defaultdict can't be pickled if its default is made by a lambda.
+    """
+    if isinstance(data, defaultdict) or isinstance(data, OrderedDict):
+        return OrderedDict([ (k, plain_data(v)) for k, v in data.items() ])
+    if isinstance(data, dict):
+        return dict([ (k, plain_data(v)) for k, v in data.items() ])
+    if isinstance(data, list):
+        return [ plain_data(v) for v in data ]
+    return data
+
+def get_module_state():
+    """
+    Collect the results that modules have added to the report,
+    as plain data that can be sent back from a worker process.
+    """
+    return {
+        'general_stats_data': [ plain_data(d) for d in general_stats_data ],
+        'general_stats_headers': [ picklable_headers(d, h) for d, h in zip(general_stats_data, general_stats_headers) ],
+        'data_sources': dict([ (mod, dict([ (sec, dict(d)) for sec, d in secs.items() ])) for mod, secs in data_sources.items() ]),
+        'num_hc_plots': num_hc_plots,
+        'num_mpl_plots': num_mpl_plots,
+        'saved_raw_data': plain_data(saved_raw_data),
+        'parsed_log_files': parsed_log_files
+    }
+
+def merge_module_state(state):
+    """
+    Add results collected by get_module_state() to the report. Merging in
+    module order gives the same report as running the modules one by one.
+    """
+    global num_hc_plots, num_mpl_plots
+    general_stats_data.extend(state['general_stats_data'])
+    general_stats_headers.extend(state['general_stats_headers'])
+    for mod, secs in state['data_sources'].items():
+        for sec, d in secs.items():
+            data_sources[mod][sec].update(d)
+    num_hc_plots += state['num_hc_plots']
+    num_mpl_plots += state['num_mpl_plots']
+    saved_raw_data.update(state['saved_raw_data'])
+    for key, parsed in state['parsed_log_files'].items():
+        parsed_log_files.setdefault(key, OrderedDict()).update(parsed)
 
 def search_file (pattern, f):
     """
     Function to searach a single file for a single search pattern.
     """
+    return len(search.SearchPatterns({'_': pattern}).search(f)) > 0
 
-    fn_matched = False
-    contents_matched = False
+def to_json_data(data):
+    """
+    Convert parsed data to plain JSON types without losing anything. Tuples and
+    dicts with keys that aren't strings are tagged, so that from_json_data()
+    can turn them back. Raises TypeError for anything else that JSON can't hold.
+    """
+    if isinstance(data, dict):
+        if all([ isinstance(k, STRING_TYPES) for k in data ]):
+            return OrderedDict([ (k, to_json_data(v)) for k, v in data.items() ])
+        return {'__multiqc_dict__': [ [to_json_data(k), to_json_data(v)] for k, v in data.items() ]}
+    if isinstance(data, tuple):
+        return {'__multiqc_tuple__': [ to_json_data(v) for v in data ]}
+    if isinstance(data, list):
+        return [ to_json_data(v) for v in data ]
+    if data is None or isinstance(data, (bool, int, float) + STRING_TYPES):
+        return data
+    try:
+        if isinstance(data, long):
+            return data
+    except NameError:
+        pass # Python 3
+    raise TypeError("Can't save {} as JSON".format(type(data).__name__))
 
-    # Use mimetypes to exclude binary files where possible
-    (ftype, encoding) = mimetypes.guess_type(os.path.join(f['root'], f['fn']))
-    if encoding is not None:
-        return False
-    if ftype is not None and ftype.startswith('image'):
-        return False
+def from_json_data(data):
+    """ Turn data converted by to_json_data() back into what the module parsed """
+    if isinstance(data, dict):
+        if list(data.keys()) == ['__multiqc_dict__']:
+            return OrderedDict([ (from_json_data(k), from_json_data(v)) for k, v in data['__multiqc_dict__'] ])
+        if list(data.keys()) == ['__multiqc_tuple__']:
+            return tuple([ from_json_data(v) for v in data['__multiqc_tuple__'] ])
+        return OrderedDict([ (k, from_json_data(v)) for k, v in data.items() ])
+    if isinstance(data, list):
+        return [ from_json_data(v) for v in data ]
+    return data
 
-    # Search pattern specific filesize limit
-    if pattern.get('max_filesize') is not None and 'filesize' in f:
-        if f['filesize'] > pattern.get('max_filesize'):
-            return False
+def add_parsed_log_file(mod_name, sp_key, path, parsed=None, json_data=None):
+    """
+    Remember the data parsed from a log file, so that it can be
+    written to the data directory and used by a later --update run.
+    The data is converted for JSON straight away, as modules often change it later.
+    Pass json_data instead of parsed for data that has already been converted.
+    """
+    if config.data_dir is None:
+        return
+    if json_data is None:
+        try:
+            json_data = to_json_data(parsed)
+        except TypeError as e:
+            logger.debug("Not saving the data parsed from {} for --update: {}".format(path, e))
+            return
+    parsed_log_files.setdefault((mod_name, sp_key), OrderedDict())[path] = json_data
 
-    # Search by file name (glob)
-    if pattern.get('fn') is not None:
-        if fnmatch.fnmatch(f['fn'], pattern['fn']):
-            fn_matched = True
-            if pattern.get('contents') is None and pattern.get('contents_re') is None:
-                return True
+def get_found_files():
+    """ Get the absolute paths of the files found for each search key """
+    found = dict([ (sp_key, list(paths)) for sp_key, paths in previous_found_files.items() ])
+    for sp_key, fs in files.items():
+        paths = found.setdefault(sp_key, [])
+        seen = set(paths)
+        for f in fs:
+            path = os.path.abspath(os.path.join(f['root'], f['fn']))
+            if path not in seen:
+                seen.add(path)
+                paths.append(path)
+    return dict([ (sp_key, paths) for sp_key, paths in found.items() if len(paths) > 0 ])
 
-    # Search by file name (regex)
-    if pattern.get('fn_re') is not None:
-        if re.match( pattern['fn_re'], f['fn']):
-            fn_matched = True
-            if pattern.get('contents') is None and pattern.get('contents_re') is None:
-                return True
+def parsed_data_tofile ():
+    """
+    Write the data parsed from each log file, the data sources and the files found
+    to the data directory as JSON. Read by load_previous_data() to update the report later.
+    """
+    parsed = OrderedDict()
+    for (mod_name, sp_key), d in parsed_log_files.items():
+        parsed.setdefault(mod_name, OrderedDict())[sp_key] = d
+    with io.open (os.path.join(config.data_dir, PARSED_DATA_FN), 'w', encoding='utf-8') as f:
+        jsonstr = json.dumps(OrderedDict([
+            ('format_version', PARSED_DATA_FORMAT),
+            ('multiqc_version', config.version),
+            ('parsed_log_files', parsed),
+            ('found_files', get_found_files()),
+            ('data_sources', get_module_state()['data_sources']),
+            ('file_index', get_file_index()),
+            ('analysis_dir', previous_analysis_dir + [ os.path.realpath(d) for d in config.analysis_dir if os.path.realpath(d) not in previous_analysis_dir ]),
+            ('archive_files', get_archive_files())
+        ]), ensure_ascii=False)
+        print( jsonstr.encode('utf-8', 'ignore').decode('utf-8'), file=f)
+
+def get_file_index():
+    """
+    Get the position of each log file in the file search, so that log files
+    from separate runs (--shard, --update) can be put back in the same order.
+    Every shard walks all of the analysis directories, so positions
+    in the list of searched files are the same for every shard.
+    :return: Dict of absolute path: (search position, order found)
+    """
+    index = dict(file_index)
+    offset = 0
+    if len(file_index) > 0:
+        offset = max(file_index.values())[0] + 1
+    positions = dict([ (os.path.join(sf[1], sf[0]), i) for i, sf in enumerate(searchfiles) ])
+    for path, (found, archive) in search_order.items():
+        # Files in an archive are found in the order that they are stored
+        pos = positions.get(archive or path, len(searchfiles))
+        index.setdefault(os.path.abspath(path), (offset + pos, found))
+        if archive is not None:
+            index.setdefault(os.path.abspath(archive), (offset + pos, found))
+    return index
+
+def get_archive_files():
+    """ Get a dict of absolute path: archive path for log files found inside archives """
+    archives = dict(archive_files)
+    for path, (found, archive) in search_order.items():
+        if archive is not None:
+            archives[os.path.abspath(path)] = os.path.abspath(archive)
+    return archives
 
-    # Search by file contents
-    if pattern.get('contents') is not None or pattern.get('contents_re') is not None:
+def file_order(path):
+    """ Sort key to put log files from previous runs back in search order """
+    return file_index.get(path, (float('inf'), 0)), path
+
+def load_previous_data(data_dirs):
+    """
+    Load parsed data from the data directories of previous runs, for --update
+    and for merging --shard runs. Log files parsed with map_log_files() are
+    not parsed again. Other source files from the previous runs are added
+    to the file search. Log files are kept in the order of the file search.
+    :param data_dirs: Path to a previous MultiQC data directory, or a list of paths
+    :return: True if the previous data was loaded
+    """
+    global previous_files
+    if not isinstance(data_dirs, list):
+        data_dirs = [data_dirs]
+    source_paths = set()
+    reparse_paths = defaultdict(set)
+    for data_dir in data_dirs:
         try:
-            with io.open (os.path.join(f['root'],f['fn']), "r", encoding='utf-8') as f:
-                l = 1
-                for line in f:
-                    # Search by file contents (string)
-                    if pattern.get('contents') is not None:
-                        if pattern['contents'] in line:
-                            contents_matched = True
-                            if pattern.get('fn') is None and pattern.get('fn_re') is None:
-                                return True
-                            break
-                    # Search by file contents (regex)
-                    elif pattern.get('contents_re') is not None:
-                        if re.match( pattern['contents_re'], line):
-                            contents_matched = True
-                            if pattern.get('fn') is None and pattern.get('fn_re') is None:
-                                return True
-                            break
-                    # Break if we've searched enough lines for this pattern
-                    if pattern.get('num_lines') and l >= pattern.get('num_lines'):
-                        break
-                    l += 1
-        except (IOError, OSError, ValueError, UnicodeDecodeError):
-            if config.report_readerrors:
-                logger.debug("Couldn't read file when looking for output: {}".format(f['fn']))
-                return False
+            with io.open (os.path.join(data_dir, PARSED_DATA_FN), 'r', encoding='utf-8') as f:
+                previous = json.load(f, object_pairs_hook=OrderedDict)
+        except (IOError, OSError, ValueError) as e:
+            logger.error("Couldn't load previous MultiQC data from '{}': {}".format(data_dir, e))
+            return False
+        if previous.get('format_version') != PARSED_DATA_FORMAT:
+            logger.error("Can't load previous MultiQC data from '{}': it was saved by an incompatible version of MultiQC ({})".format(data_dir, previous.get('multiqc_version')))
+            return False
+        parsed_paths = set()
+        parsed_keys = set()
+        if previous['multiqc_version'] == config.version:
+            for mod_name, keys in previous['parsed_log_files'].items():
+                for sp_key, parsed in keys.items():
+                    previous_parsed_log_files.setdefault((mod_name, sp_key), OrderedDict()).update(parsed)
+                    parsed_paths.update([ (mod_name, path) for path in parsed ])
+                    parsed_keys.update([ (sp_key, path) for path in parsed ])
+        else:
+            logger.warning("Previous data in '{}' was made with MultiQC {} - all of its log files will be parsed again".format(data_dir, previous['multiqc_version']))
+        file_index.update([ (path, tuple(pos)) for path, pos in previous['file_index'].items() ])
+        archive_files.update(previous['archive_files'])
+        previous_analysis_dir.extend([ d for d in previous['analysis_dir'] if d not in previous_analysis_dir ])
+        for mod, secs in previous['data_sources'].items():
+            for sec, d in secs.items():
+                source_paths.update([ path for path in d.values() if (mod, path) not in parsed_paths ])
+        # Log files of modules that don't add data sources, eg. custom content
+        for sp_key, paths in previous['found_files'].items():
+            unparsed = [ path for path in paths if (sp_key, path) not in parsed_keys ]
+            source_paths.update(unparsed)
+            reparse_paths[sp_key.split('/')[0]].update(unparsed)
+            seen = set(previous_found_files.setdefault(sp_key, []))
+            previous_found_files[sp_key].extend([ path for path in paths if path not in seen ])
+    for key, parsed in previous_parsed_log_files.items():
+        previous_parsed_log_files[key] = OrderedDict(sorted(parsed.items(), key=lambda p: file_order(p[0])))
+    num_parsed = sum([ len(parsed) for parsed in previous_parsed_log_files.values() ])
+    found_paths = set()
+    num_missing = 0
+    for path in source_paths:
+        if os.path.isfile(path):
+            found_paths.add(path)
+        elif path in archive_files and os.path.isfile(archive_files[path]):
+            # Log files from inside archives are found by searching the archive again
+            found_paths.add(archive_files[path])
+            config.search_archives = True
+        else:
+            num_missing += 1
+    previous_files = sorted(found_paths, key=file_order)
+    if num_missing > 0:
+        logger.warning("Couldn't find {} log files from the previous run, their samples will be missing".format(num_missing))
+    reparse_paths = [ (name, len(paths)) for name, paths in sorted(reparse_paths.items()) if len(paths) > 0 ]
+    if len(reparse_paths) > 0:
+        logger.warning("Previous data can't be reused for some modules, so their original log files must be parsed again: {}".format(
+            ", ".join([ "{} ({} files)".format(name, n) for name, n in reparse_paths ])))
+    logger.info("Loaded previous data: {} log files already parsed, {} to parse again".format(num_parsed, len(previous_files)))
+    return True
 
-    return fn_matched and contents_matched
+def find_data_dir(path):
+    """
+    Find the MultiQC data directory in a report directory, eg. for
+    'multiqc merge'. Returns the path itself if it is a data directory,
+    or None if there isn't one.
+    """
+    if os.path.isfile(os.path.join(path, PARSED_DATA_FN)):
+        return path
+    if os.path.isdir(path):
+        for d in sorted(os.listdir(path)):
+            if os.path.isfile(os.path.join(path, d, PARSED_DATA_FN)):
+                return os.path.join(path, d)
+    return None
 
 def data_sources_tofile ():
     fn = 'multiqc_sources.{}'.format(config.data_format_extensions[config.data_format])
@@ -0,0 +1,881 @@
+#!/usr/bin/env python
+
+""" MultiQC file search engine. Compiles the search patterns in
+config.sp once per run and matches files against all of them,
+reading the contents of each file at most once. """
+
+from __future__ import print_function
+import fnmatch
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import tarfile
+import threading
+import time
+import zipfile
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir # Python 2 backport
+    except ImportError:
+        scandir = None
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
+import gzip
+import zlib
+try:
+    import bz2
+except ImportError:
+    bz2 = None
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma # Python 2 backport
+    except ImportError:
+        lzma = None
+
+from multiqc import config
+
+logger = logging.getLogger(__name__)
+
+# Backreferences can't survive being merged into a single alternation
+BACKREF_RE = re.compile(r'\\[1-9]|\(\?P=')
+NAMED_GROUP_RE = re.compile(r'\(\?P<')
+GLOB_CHARS_RE = re.compile(r'[*?[]')
+
+# Part of the search cache key. Increase whenever a change to the search
+# can give different results for the same files and patterns (eg. what file
+# contents are read or how they are matched), so that results cached by an
+# older version are not reused. Development versions share config.version,
+# so this is the only thing that tells their caches apart.
+SEARCH_VERSION = 4
+
+# File contents are searched as bytes, in chunks of this size
+HEAD_BYTES = 65536
+CHUNK_BYTES = 1048576
+# Magic numbers for compressed files and images: gzip, bzip2, xz, zip, png, jpeg, gif
+MAGIC_BYTES = 10
+# Compressed files that can be searched and parsed without unpacking them.
+# Magic bytes, function to open a path and function to decompress bytes.
+COMPRESSION_FORMATS = [(b'\x1f\x8b', gzip.open, lambda data: gzip.GzipFile(fileobj=io.BytesIO(data)).read())]
+if bz2 is not None:
+    COMPRESSION_FORMATS.append((b'BZh', bz2.BZ2File, bz2.decompress))
+if lzma is not None:
+    COMPRESSION_FORMATS.append((b'\xfd7zXZ\x00', lzma.LZMAFile, lzma.decompress))
+COMPRESSION_EXTS = ('.gz', '.bz2', '.xz')
+# Archives whose members can be searched as if they had been unpacked
+ARCHIVE_EXTS = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz', '.zip')
+# Errors that mean that we couldn't read a file (or decompress it)
+READ_ERRORS = (IOError, OSError, ValueError, EOFError, zlib.error, tarfile.TarError, zipfile.BadZipfile)
+if lzma is not None:
+    READ_ERRORS += (lzma.LZMAError,)
+# Regex features that only work when matching one line at a time
+LINE_ONLY_RE = re.compile(br'\\[AZ]|\(\?<|\(\?!')
+BINARY_MAGIC_RE = re.compile(b'\x1f\x8b|BZh[1-9]1AY&SY|\xfd7zXZ\x00|PK\x03\x04|\x89PNG|\xff\xd8\xff|GIF8[79]a')
+
+def to_bytes(s):
+    """ Encode a search string as UTF-8, if it isn't already bytes """
+    return s if isinstance(s, bytes) else s.encode('utf-8')
+
+def is_ascii(s):
+    """ Check whether a search string only has ASCII characters """
+    try:
+        to_bytes(s).decode('ascii')
+    except UnicodeError:
+        return False
+    return True
+
+class SearchPattern(object):
+    """ A single compiled search pattern from config.sp """
+
+    def __init__(self, key, sp, pid):
+        self.key = key
+        self.id = pid
+        self.fn = sp.get('fn')
+        self.fn_re = re.compile(sp['fn_re']) if sp.get('fn_re') is not None else None
+        self.contents = sp.get('contents')
+        self.contents_re = re.compile(sp['contents_re']) if sp.get('contents_re') is not None else None
+        # Encode once so that file contents can be searched without decoding
+        self.contents_b = to_bytes(self.contents) if self.contents is not None else None
+        self.contents_re_b = None
+        if self.contents_re is not None and is_ascii(sp['contents_re']):
+            try:
+                self.contents_re_b = re.compile(to_bytes(sp['contents_re']))
+            except re.error:
+                pass
+        self.num_lines = sp.get('num_lines')
+        self.tail_bytes = sp.get('contents_tail_bytes')
+        self.max_filesize = sp.get('max_filesize')
+        self.shared = sp.get('shared', False)
+        self.has_fn = self.fn is not None or self.fn_re is not None
+        self.has_contents = self.contents is not None or self.contents_re is not None
+
+    def match(self, line):
+        """ Check a line of file contents (bytes) against the contents criteria """
+        if self.contents is not None:
+            return self.contents_b in line
+        if self.contents_re_b is not None:
+            return self.contents_re_b.match(line) is not None
+        # Regexes with non-ASCII characters need the decoded line
+        return self.contents_re.match(line.decode('utf-8', 'replace')) is not None
+
+    def size_ok(self, f):
+        """ Check the pattern specific filesize limit """
+        if self.max_filesize is not None and 'filesize' in f:
+            if f['filesize'] > self.max_filesize:
+                return False
+        return True
+
+
+class FilenameIndex(object):
+    """ Index of all `fn` and `fn_re` criteria, so that each filename can
+    be checked against every pattern with a couple of dict lookups and
+    a single regex match, instead of one fnmatch call per pattern.
+    Globs are sorted into three groups:
+      * Exact filenames (no wildcards) - looked up in a dict
+      * Suffix globs (eg. `*_fastqc.zip`) - dict keyed by file extension
+      * Everything else - merged into one regex with a named group per pattern
+    """
+
+    def __init__(self, patterns):
+        self.exact = dict()
+        self.suffixes = dict()
+        self.fallback = list()
+        globs = list()
+        regexes = list()
+        for p in patterns:
+            if p.fn is not None:
+                fn = os.path.normcase(p.fn)
+                if not GLOB_CHARS_RE.search(fn):
+                    self.exact.setdefault(fn, set()).add(p.id)
+                elif fn.startswith('*') and '.' in fn and not GLOB_CHARS_RE.search(fn[1:]):
+                    ext = fn.rsplit('.', 1)[1]
+                    self.suffixes.setdefault(ext, dict()).setdefault(fn[1:], set()).add(p.id)
+                else:
+                    globs.append((p.id, fnmatch.translate(fn)))
+            if p.fn_re is not None:
+                regexes.append((p.id, p.fn_re.pattern))
+        self.glob_re = self._combine(globs, True)
+        self.regex_re = self._combine(regexes, False)
+
+    def _combine(self, exprs, normcase):
+        """ Merge patterns into one regex. Each pattern sits in its own optional
+        lookahead, so a single match reports every pattern that matched. """
+        unsafe = [(pid, e) for pid, e in exprs if BACKREF_RE.search(e) or NAMED_GROUP_RE.search(e)]
+        exprs = [(pid, e) for pid, e in exprs if (pid, e) not in unsafe]
+        combined = None
+        if len(exprs) > 0:
+            try:
+                combined = re.compile(''.join('(?=(?P<p{}>(?:{})))?'.format(pid, e) for pid, e in exprs))
+            except re.error:
+                unsafe.extend(exprs)
+        # Anything that can't be combined is checked separately
+        self.fallback.extend([(pid, re.compile(e), normcase) for pid, e in unsafe])
+        return combined
+
+    def match(self, fn):
+        """ Find all patterns whose filename criteria match
+        :param fn: The filename (basename) to check
+        :return: Set of matching pattern ids
+        """
+        hits = set()
+        nfn = os.path.normcase(fn)
+        hits.update(self.exact.get(nfn, ()))
+        if '.' in nfn:
+            for suffix, pids in self.suffixes.get(nfn.rsplit('.', 1)[1], {}).items():
+                if nfn.endswith(suffix):
+                    hits.update(pids)
+        for r, name in ((self.glob_re, nfn), (self.regex_re, fn)):
+            if r is not None:
+                hits.update(int(g[1:]) for g, v in r.match(name).groupdict().items() if v is not None)
+        for pid, r, normcase in self.fallback:
+            if r.match(nfn if normcase else fn):
+                hits.add(pid)
+        return hits
+
+
+class ContentScanner(object):
+    """ Matches many `contents` / `contents_re` patterns against a
+    file in a single pass. The file is read as bytes and the patterns
+    are encoded once, so nothing is decoded during the search. Literal
+    strings and regexes are each merged into one alternation which is
+    first run over whole blocks of lines, then used as a per-line
+    prefilter, so that the individual patterns are only tried on lines
+    where at least one of them could possibly match. """
+
+    def __init__(self, patterns):
+        self.patterns = [p for p in patterns if p.has_contents]
+        self.literal_re = self._combine([re.escape(p.contents_b) for p in self.patterns if p.contents is not None])
+        regexes = [p for p in self.patterns if p.contents is None]
+        self.regex_re = None
+        self.regex_block_re = None
+        if all(p.contents_re_b is not None for p in regexes):
+            exprs = [p.contents_re_b.pattern for p in regexes]
+            self.regex_re = self._combine(exprs)
+            # The same alternation, anchored at the start of any line in a block
+            if self.regex_re is not None and not any(LINE_ONLY_RE.search(e) for e in exprs):
+                self.regex_block_re = re.compile(b'(?m)^(?:' + self.regex_re.pattern + b')')
+
+    @staticmethod
+    def _combine(exprs):
+        if len(exprs) == 0:
+            return None
+        if any(BACKREF_RE.search(e.decode('utf-8')) for e in exprs):
+            return None
+        try:
+            return re.compile(b'|'.join(b'(?:' + e + b')' for e in sorted(set(exprs))))
+        except re.error:
+            return None
+
+    def scan(self, path, patterns, read_contents=None):
+        """ Read the file once and check it for every pattern in `patterns`.
+        :param path: Path to the file to search
+        :param patterns: List of SearchPattern objects with contents criteria
+        :param read_contents: Function returning the file contents as bytes,
+                              for files that aren't on disk (eg. archive members)
+        :return: Set of pattern ids which matched the file contents
+        """
+        matched = set()
+        tails = [p for p in patterns if p.tail_bytes]
+        patterns = [p for p in patterns if not p.tail_bytes]
+        literals = [p for p in patterns if p.contents is not None]
+        regexes = [p for p in patterns if p.contents is None]
+        try:
+            with open_file(path, read_contents() if read_contents is not None else None) as fh:
+                fh = limit_size(fh)
+                # One read of the start of the file, shared by all patterns
+                head = fh.read(HEAD_BYTES if patterns else MAGIC_BYTES)
+                if is_binary(head):
+                    return matched
+                l = 0
+                for block in iter_blocks(fh, head if patterns else b''):
+                    # Skip whole blocks of lines where nothing can match
+                    if (not literals or (self.literal_re is not None and not self.literal_re.search(block))) and \
+                       (not regexes or (self.regex_block_re is not None and not self.regex_block_re.search(block))):
+                        l += block.count(b'\n') + (0 if block.endswith(b'\n') else 1)
+                        lines = ()
+                    else:
+                        lines = block.splitlines(True)
+                    for line in lines:
+                        l += 1
+                        if literals and (self.literal_re is None or self.literal_re.search(line)):
+                            for p in literals:
+                                if p.contents_b in line:
+                                    matched.add(p.id)
+                            literals = [p for p in literals if p.id not in matched]
+                        if regexes and (self.regex_re is None or self.regex_re.match(line)):
+                            for p in regexes:
+                                if p.match(line):
+                                    matched.add(p.id)
+                            regexes = [p for p in regexes if p.id not in matched]
+                        # Drop patterns that have searched enough lines
+                        literals = [p for p in literals if not p.num_lines or l < p.num_lines]
+                        regexes = [p for p in regexes if not p.num_lines or l < p.num_lines]
+                        if not literals and not regexes:
+                            break
+                    literals = [p for p in literals if not p.num_lines or l < p.num_lines]
+                    regexes = [p for p in regexes if not p.num_lines or l < p.num_lines]
+                    if not literals and not regexes:
+                        break
+                # Patterns that only look at the end of the file share one tail read
+                if tails:
+                    matched.update(self.scan_tail(fh, tails))
+        except FileTooLarge:
+            logger.debug("Ignoring file as it is over log_filesize_limit once decompressed: {}".format(path))
+            return set()
+        except READ_ERRORS:
+            if config.report_readerrors:
+                logger.debug("Couldn't read file when looking for output: {}".format(path))
+        return matched
+
+    def scan_tail(self, fh, patterns):
+        """ Check the last few lines of a file for patterns with `contents_tail_bytes`
+        :param fh: Binary file handle to search
+        :param patterns: List of SearchPattern objects with a tail_bytes limit
+        :return: Set of pattern ids which matched the end of the file
+        """
+        matched = set()
+        num_bytes = max(p.tail_bytes for p in patterns)
+        data = tail_bytes(fh, num_bytes)
+        if b'\x00' in data:
+            return matched
+        for p in patterns:
+            # Patterns with a smaller limit only see the lines within it
+            pdata = data
+            if p.tail_bytes < len(data):
+                pdata = drop_partial_line(data[-p.tail_bytes - 1:])
+            for line in iter_lines(None, pdata):
+                if p.match(line):
+                    matched.add(p.id)
+                    break
+        return matched
+
+
+def is_binary(head):
+    """ Cheap check for binary files, using the first bytes read from the file.
+    Looks for NUL bytes, which never appear in text logs, and the magic
+    numbers of common compressed and image formats. """
+    return b'\x00' in head or BINARY_MAGIC_RE.match(head) is not None
+
+def iter_blocks(fh, data):
+    """ Read a binary file in blocks of complete lines, starting with data
+    already read from it. Line endings are converted to \\n, as with
+    Python's universal newlines.
+    :param fh: Binary file handle to keep reading from, or None
+    :param data: Bytes already read from the file
+    :return: Yields blocks of lines as bytes
+    """
+    carry = b''
+    while data:
+        data = carry + data
+        end = data.rfind(b'\n') + 1
+        carry = data[end:]
+        block = data[:end]
+        if b'\r' in block:
+            block = block.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+        if block:
+            yield block
+        data = fh.read(CHUNK_BYTES) if fh is not None else b''
+    if carry:
+        yield carry.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+
+def iter_lines(fh, data):
+    """ Split a binary file into lines, as iter_blocks()
+    :return: Yields each line as bytes, including the line ending
+    """
+    for block in iter_blocks(fh, data):
+        for line in block.splitlines(True):
+            yield line
+
+def tail_bytes(fh, num_bytes):
+    """ Read the complete lines within the last num_bytes of a binary file handle """
+    if not isinstance(fh, (io.BufferedReader, io.BytesIO)):
+        # Compressed files can't jump to the end without decompressing
+        # everything first, so read through them once instead
+        fh.seek(0)
+        data = b''
+        for chunk in iter(lambda: fh.read(CHUNK_BYTES), b''):
+            data = (data + chunk)[-num_bytes - 1:]
+        return drop_partial_line(data) if len(data) > num_bytes else data
+    fh.seek(0, os.SEEK_END)
+    start = fh.tell() - num_bytes
+    if start <= 0:
+        fh.seek(0)
+        return fh.read()
+    # Read one extra byte so that we can tell if we started on a new line
+    fh.seek(start - 1)
+    return drop_partial_line(fh.read())
+
+def drop_partial_line(data):
+    """ Drop the partial line that some tail bytes started part way through """
+    end = data.find(b'\n')
+    return data[end + 1:] if end >= 0 else b''
+
+def strip_compression_ext(fn):
+    """ Remove a .gz / .bz2 / .xz extension from a filename, if it has one """
+    fn_base, fn_ext = os.path.splitext(fn)
+    return fn_base if fn_ext.lower() in COMPRESSION_EXTS else fn
+
+def compression_format(head):
+    """ Find how to read a compressed file, from its first bytes
+    :param head: At least the first MAGIC_BYTES bytes of the file
+    :return: Tuple of (magic, open path function, decompress bytes function),
+             or None if the file isn't compressed in a format that we can read
+    """
+    for fmt in COMPRESSION_FORMATS:
+        if head.startswith(fmt[0]):
+            return fmt
+    return None
+
+def open_file(path, data=None):
+    """ Open a file to read as bytes. Files compressed with gzip, bzip2
+    or xz are decompressed as they are read.
+    :param path: Path to the file
+    :param data: Contents of the file as bytes, if it isn't on disk
+    :return: Binary file handle
+    """
+    if data is not None:
+        fmt = compression_format(data[:MAGIC_BYTES])
+        return io.BytesIO(fmt[2](data) if fmt is not None else data)
+    fh = io.open(path, 'rb')
+    fmt = compression_format(fh.peek(MAGIC_BYTES)[:MAGIC_BYTES])
+    if fmt is None:
+        return fh
+    fh.close()
+    return fmt[1](path)
+
+class FileTooLarge(Exception):
+    """ Raised when a compressed file turns out to be bigger than
+    log_filesize_limit once it is decompressed """
+    pass
+
+class LimitedReader(object):
+    """ Binary file handle that raises FileTooLarge once more than
+    max_bytes have been read from it since the last seek """
+
+    def __init__(self, fh, max_bytes):
+        self.fh = fh
+        self.max_bytes = max_bytes
+        self.num_bytes = 0
+
+    def read(self, size=-1):
+        data = self.fh.read(size)
+        self.num_bytes += len(data)
+        if self.num_bytes > self.max_bytes:
+            raise FileTooLarge()
+        return data
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        self.fh.seek(offset, whence)
+        self.num_bytes = self.fh.tell()
+
+def limit_size(fh):
+    """ Apply log_filesize_limit to the decompressed contents of a file from
+    open_file(). The size on disk is already checked for uncompressed files,
+    but a small compressed file can inflate to many gigabytes.
+    :param fh: Binary file handle from open_file()
+    :return: File handle to search
+    """
+    if isinstance(fh, io.BufferedReader):
+        return fh
+    if isinstance(fh, io.BytesIO):
+        # Already in memory, so just check the size
+        if fh.seek(0, os.SEEK_END) > config.log_filesize_limit:
+            raise FileTooLarge()
+        fh.seek(0)
+        return fh
+    return LimitedReader(fh, config.log_filesize_limit)
+
+def open_text(path, data=None):
+    """ Open a file to read as UTF-8 text, decompressing it if needed
+    :param path: Path to the file
+    :param data: Contents of the file as bytes, if it isn't on disk
+    :return: Text file handle
+    """
+    return io.TextIOWrapper(open_file(path, data), encoding='utf-8')
+
+def is_archive(fn):
+    """ Check whether a filename looks like a tar or zip archive """
+    return fn.lower().endswith(ARCHIVE_EXTS)
+
+def iter_archive(path):
+    """ Go through the files in a tar or zip archive, in order. The archive
+    is only read once, and members are only read if their contents are needed.
+    :param path: Path to the archive
+    :return: Yields (member name, size, mtime, read function). The read
+             function returns the member contents as bytes, and can only be
+             called before moving on to the next member.
+    """
+    if path.lower().endswith('.zip'):
+        with zipfile.ZipFile(path) as zf:
+            for info in zf.infolist():
+                if info.filename.endswith('/'):
+                    continue
+                mtime = time.mktime(info.date_time + (0, 0, -1))
+                yield info.filename, info.file_size, mtime, lambda info=info: zf.read(info)
+    else:
+        # Stream through tar files, so that compressed tars aren't decompressed twice
+        with tarfile.open(path, 'r|*') as tf:
+            for info in tf:
+                if not info.isfile():
+                    continue
+                yield info.name, info.size, info.mtime, lambda info=info: tf.extractfile(info).read()
+
+class ArchiveReader(object):
+    """ Reads members of a tar or zip archive by name, for log files found
+    inside it. Members are read from the archive again each time that they
+    are needed, so that their contents aren't kept in memory for the whole run.
+    Tar archives are indexed on the first read. Reading members in archive
+    order (as modules do) only goes through a compressed tar once. """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.archive = None
+        self.members = None
+
+    def read(self, name):
+        """ Read an archive member
+        :param name: Name of the member in the archive
+        :return: Contents of the member as bytes
+        """
+        with self.lock:
+            if self.archive is None:
+                if self.path.lower().endswith('.zip'):
+                    self.archive = zipfile.ZipFile(self.path)
+                else:
+                    self.archive = tarfile.open(self.path, 'r:*')
+                    self.members = dict([ (m.name, m) for m in self.archive.getmembers() if m.isfile() ])
+            if self.members is None:
+                return self.archive.read(name)
+            return self.archive.extractfile(self.members[name]).read()
+
+    def close(self):
+        with self.lock:
+            if self.archive is not None:
+                self.archive.close()
+                self.archive = None
+                self.members = None
+
+
+class SearchPatterns(object):
+    """ Compiled version of config.sp, built once before the file search """
+
+    def __init__(self, sp):
+        # Split search patterns according to speed of execution.
+        buckets = [[],[],[],[],[],[],[]]
+        for key, sps in sp.items():
+            if not isinstance(sps, list):
+                sps = [sps]
+            if any([x for x in sps if 'contents_re' in x]):
+                if any([x for x in sps if 'num_lines' in x or 'contents_tail_bytes' in x]):
+                    buckets[4].append((key, sps))
+                elif any([x for x in sps if 'max_filesize' in x]):
+                    buckets[5].append((key, sps))
+                else:
+                    buckets[6].append((key, sps))
+            elif any([x for x in sps if 'contents' in x]):
+                if any([x for x in sps if 'num_lines' in x or 'contents_tail_bytes' in x]):
+                    buckets[1].append((key, sps))
+                elif any([x for x in sps if 'max_filesize' in x]):
+                    buckets[2].append((key, sps))
+                else:
+                    buckets[3].append((key, sps))
+            else:
+                buckets[0].append((key, sps))
+
+        self.keys = list()
+        self.ordered = list()
+        all_patterns = list()
+        for bucket in buckets:
+            for key, sps in bucket:
+                patterns = list()
+                for s in sps:
+                    p = SearchPattern(key, s, len(all_patterns))
+                    patterns.append(p)
+                    all_patterns.append(p)
+                self.keys.append(key)
+                self.ordered.append((key, patterns))
+        self.patterns = all_patterns
+        self.fn_index = FilenameIndex(all_patterns)
+        self.scanner = ContentScanner(all_patterns)
+        # Filename patterns for compressed files, eg. '*_stats.txt.gz'
+        self.compressed_fns = [p.fn for p in all_patterns if p.fn is not None and p.fn.lower().endswith(COMPRESSION_EXTS)]
+
+    def asks_for(self, fn):
+        """ Check whether a filename pattern names this compressed file
+        explicitly, so that it's searched even if it matches fn_ignore_files """
+        return any(fnmatch.fnmatch(fn, p) for p in self.compressed_fns)
+
+    def search(self, f, read_contents=None):
+        """ Run a file through all search patterns, in order of speed.
+        :param f: Dict with filename (fn), directory (root) and optionally size (filesize)
+        :param read_contents: Function returning the file contents as bytes,
+                              for files that aren't on disk (eg. archive members)
+        :return: List of search keys that the file matched
+        """
+        # Find which patterns could still match once contents are considered
+        fn_hits = self.fn_index.match(f['fn'])
+        # Compressed logs match the same filename patterns as uncompressed ones
+        fn_base = strip_compression_ext(f['fn'])
+        if fn_base != f['fn']:
+            fn_hits.update(self.fn_index.match(fn_base))
+        candidates = [p for p in self.patterns if p.size_ok(f) and (p.id in fn_hits if p.has_fn else p.has_contents)]
+        contents_hits = None
+
+        matched_keys = list()
+        for p in candidates:
+            if p.key in matched_keys:
+                continue
+            if p.has_contents:
+                # Read the file once, for every remaining contents pattern
+                if contents_hits is None:
+                    needs_contents = [c for c in candidates if c.has_contents and c.key not in matched_keys]
+                    contents_hits = self.scanner.scan(os.path.join(f['root'], f['fn']), needs_contents, read_contents)
+                if p.id not in contents_hits:
+                    continue
+            # Looks good! Remember this file
+            matched_keys.append(p.key)
+            # Don't keep searching this file for other modules
+            if not p.shared:
+                break
+        return matched_keys
+
+
+def inode_key(st):
+    """ Identify a physical file or directory from its stat result.
+    Returns None where the filesystem doesn't give us inode numbers. """
+    if not st.st_ino:
+        return None
+    return (st.st_dev, st.st_ino)
+
+
+def in_shard(path, shard, num_shards):
+    """ Check whether a file belongs to a shard of the file search (--shard).
+    Files are split by a hash of their absolute path, so every run over
+    the same directories gives each file to the same shard.
+    :param shard: Number of the shard, from 1 to num_shards """
+    path_hash = zlib.crc32(to_bytes(os.path.abspath(path))) & 0xffffffff
+    return path_hash % num_shards == shard - 1
+
+
+class Visited(object):
+    """ Physical directories and files already seen by the file search,
+    so that symlinked copies are only searched once and symlink loops
+    can't make the search run forever. """
+
+    def __init__(self):
+        self.dirs = set()
+        self.files = set()
+        self.skipped_dirs = 0
+        self.skipped_files = 0
+
+    def first_dir_visit(self, key, path):
+        if key is None:
+            return True
+        if key in self.dirs:
+            logger.debug("Skipping directory, already searched via another path: {}".format(path))
+            self.skipped_dirs += 1
+            return False
+        self.dirs.add(key)
+        return True
+
+    def first_file_visit(self, key, path):
+        if key is None:
+            return True
+        if key in self.files:
+            logger.debug("Skipping file, already found via another path: {}".format(path))
+            self.skipped_files += 1
+            return False
+        self.files.add(key)
+        return True
+
+
+def list_dir(root):
+    """ List a directory for the file search.
+    Uses os.scandir() where available, so that file types come from the
+    directory listing itself and file stats are only fetched once.
+    :param root: Path to the directory
+    :return: Tuple of (sub-directories, files), or None if the directory couldn't
+             be read. Sub-directories are (name, inode key) tuples. Files are
+             (filename, DirEntry) tuples, DirEntry is None without scandir.
+    """
+    try:
+        dirs = list()
+        filenames = list()
+        if scandir is not None:
+            for entry in scandir(root):
+                try:
+                    is_dir = entry.is_dir()
+                    if is_dir:
+                        dirs.append((entry.name, inode_key(entry.stat())))
+                except OSError:
+                    is_dir = False
+                if not is_dir:
+                    filenames.append((entry.name, entry))
+        else:
+            for name in os.listdir(root):
+                path = os.path.join(root, name)
+                if os.path.isdir(path):
+                    dirs.append((name, inode_key(os.stat(path))))
+                else:
+                    filenames.append((name, None))
+    except (IOError, OSError):
+        return None
+    return dirs, filenames
+
+
+def filter_dir(root, dirnames, quiet=False):
+    """ Apply the fn_ignore_dirs and fn_ignore_paths config options to a directory
+    :param root: Path to the directory
+    :param dirnames: List of sub-directory names
+    :param quiet: Don't log ignored directories
+    :return: Tuple of (sub-directories to descend into, whether to search files)
+    """
+    # Skip any sub-directories matching ignore params
+    orig_dirnames = dirnames[:]
+    for n in config.fn_ignore_dirs:
+        dirnames = [d for d in dirnames if not fnmatch.fnmatch(d, n.rstrip(os.sep))]
+        if len(orig_dirnames) != len(dirnames):
+            removed_dirs = [os.path.join(root, d) for d in set(orig_dirnames).symmetric_difference(set(dirnames))]
+            if not quiet:
+                logger.debug("Ignoring directory as matched fn_ignore_dirs: {}".format(", ".join(removed_dirs)))
+            orig_dirnames = dirnames[:]
+    for n in config.fn_ignore_paths:
+        dirnames = [d for d in dirnames if not fnmatch.fnmatch(os.path.join(root, d), n.rstrip(os.sep))]
+        if len(orig_dirnames) != len(dirnames):
+            removed_dirs = [os.path.join(root, d) for d in set(orig_dirnames).symmetric_difference(set(dirnames))]
+            if not quiet:
+                logger.debug("Ignoring directory as matched fn_ignore_paths: {}".format(", ".join(removed_dirs)))
+            orig_dirnames = dirnames[:]
+
+    # Skip files in *this* directory if matches ignore params
+    bname = os.path.basename(root)
+    d_matches = [n for n in config.fn_ignore_dirs if fnmatch.fnmatch(bname, n.rstrip(os.sep))]
+    if len(d_matches) > 0:
+        if not quiet:
+            logger.debug("Ignoring directory as matched fn_ignore_dirs: {}".format(bname))
+        return dirnames, False
+    p_matches = [n for n in config.fn_ignore_paths if fnmatch.fnmatch(root, n.rstrip(os.sep))]
+    if len(p_matches) > 0:
+        if not quiet:
+            logger.debug("Ignoring directory as matched fn_ignore_paths: {}".format(root))
+        return dirnames, False
+
+    return dirnames, True
+
+
+def walk(top, pool=None, visited=None):
+    """ Find all files below a directory, following symlinks.
+    Each physical directory is only searched once, so directories linked
+    from several places (or symlink loops) don't give duplicate results.
+    If a thread pool is given, directories are listed in parallel. Sub-directories
+    are queued as soon as their parent has been listed, which helps a lot on network
+    filesystems where every listing is a round-trip.
+    :param top: Directory to search
+    :param pool: Optional multiprocessing.pool.ThreadPool
+    :param visited: Optional Visited object, shared between searched directories
+    :return: List of [filename, directory, DirEntry] lists, in the same order as os.walk()
+    """
+    if visited is None:
+        visited = Visited()
+    try:
+        top_key = inode_key(os.stat(top))
+    except (IOError, OSError):
+        return []
+
+    # Listings are stored by inode, so that symlinked directories are listed once
+    listings = dict()
+    if pool is not None:
+        lock = threading.Lock()
+        finished = threading.Event()
+        queued = set()
+        pending = [0]
+
+        def queue_dir(root, key):
+            with lock:
+                if key is not None:
+                    if key in queued or key in visited.dirs:
+                        return
+                    queued.add(key)
+                pending[0] += 1
+            pool.apply_async(list_dir_safe, (root, key), callback=dir_listed)
+
+        def list_dir_safe(root, key):
+            try:
+                return root, key, list_dir(root)
+            except Exception as e:
+                logger.debug("Couldn't list directory '{}': {}".format(root, e))
+                return root, key, None
+
+        def dir_listed(result):
+            root, key, listing = result
+            listings[root if key is None else key] = listing
+            if listing is not None:
+                dirnames, search_files = filter_dir(root, [d for d, k in listing[0]], quiet=True)
+                dirnames = set(dirnames)
+                for d, k in listing[0]:
+                    if d in dirnames:
+                        queue_dir(os.path.join(root, d), k)
+            with lock:
+                pending[0] -= 1
+                if pending[0] == 0:
+                    finished.set()
+
+        queue_dir(top, top_key)
+        if pending[0] > 0:
+            finished.wait()
+
+    # Put the results together in the same order as a top-down os.walk()
+    searchfiles = list()
+    stack = [(top, top_key)]
+    while len(stack) > 0:
+        root, key = stack.pop()
+        if not visited.first_dir_visit(key, root):
+            continue
+        listing = listings.pop(root if key is None else key, False)
+        if listing is False:
+            listing = list_dir(root)
+        if listing is None:
+            continue
+        dirs, filenames = listing
+        dirnames, search_files = filter_dir(root, [d for d, k in dirs])
+        dirnames = set(dirnames)
+        if search_files:
+            for fn, entry in filenames:
+                searchfiles.append([fn, root, entry])
+        stack.extend([(os.path.join(root, d), k) for d, k in reversed(dirs) if d in dirnames])
+    return searchfiles
+
+
+class SearchCache(object):
+    """ On-disk cache of search results, stored in an SQLite database.
+    Files are remembered by their real path, size and modification time,
+    together with a hash of the search patterns. Unchanged files can then
+    skip content searching on subsequent runs. Changing any search pattern
+    (in search_patterns.yaml or a user `sp:` config) gives a new hash, so
+    old results are never used with different patterns. """
+
+    def __init__(self, path, sp):
+        self.path = path
+        self.sp_hash = hashlib.sha1(json.dumps([config.version, SEARCH_VERSION, sp], sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        self.hits = 0
+        self.misses = 0
+        self.updates = list()
+        self.realpaths = dict()
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('CREATE TABLE IF NOT EXISTS search_results ('
+                        'path TEXT, sp_hash TEXT, size INTEGER, mtime INTEGER, keys TEXT, '
+                        'PRIMARY KEY (path, sp_hash))')
+
+    def file_id(self, f, st, is_link=None):
+        """ Returns the real path, size and modification time (ns) of a file.
+        Directory real paths are remembered, so that only symlinked files
+        need to be resolved individually. """
+        path = os.path.join(f['root'], f['fn'])
+        if is_link is None:
+            is_link = os.path.islink(path)
+        if is_link:
+            realpath = os.path.realpath(path)
+        else:
+            if f['root'] not in self.realpaths:
+                self.realpaths[f['root']] = os.path.realpath(f['root'])
+            realpath = os.path.join(self.realpaths[f['root']], f['fn'])
+        mtime = getattr(st, 'st_mtime_ns', None)
+        if mtime is None:
+            mtime = int(st.st_mtime * 1e9)
+        return realpath, st.st_size, mtime
+
+    def get(self, fid):
+        """ Look up the search keys previously matched by a file.
+        :param fid: Tuple from file_id()
+        :return: List of search keys, or None if the file is new or changed
+        """
+        with self.lock:
+            row = self.db.execute('SELECT size, mtime, keys FROM search_results WHERE path=? AND sp_hash=?',
+                                  (fid[0], self.sp_hash)).fetchone()
+            if row is not None and row[0] == fid[1] and row[1] == fid[2]:
+                self.hits += 1
+                return json.loads(row[2])
+            self.misses += 1
+            return None
+
+    def set(self, fid, keys):
+        """ Remember the search keys matched by a file. Written on close() """
+        with self.lock:
+            self.updates.append((fid[0], self.sp_hash, fid[1], fid[2], json.dumps(keys)))
+
+    def close(self):
+        """ Save new results to disk """
+        self.db.executemany('INSERT OR REPLACE INTO search_results VALUES (?, ?, ?, ?, ?)', self.updates)
+        self.db.commit()
+        self.db.close()
+        logger.debug("Search cache: {} files unchanged, {} searched ({})".format(self.hits, self.misses, self.path))
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+
+""" MultiQC report templates. Loads a template straight from its package
+directory, with any files that it doesn't have coming from its parent template.
+Compiled templates and the base64 encoded assets that are embedded in reports
+are cached, so that they are only prepared once. """
+
+from __future__ import print_function
+import base64
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+
+import jinja2
+
+from multiqc import config
+from multiqc.utils import entry_points, util_functions
+logger = config.logger
+
+# Bump to throw away all previously cached assets
+ASSET_CACHE_VERSION = 1
+
+# Jinja environments already made in this process: {template directories: environment}
+_environments = dict()
+
+# Files already read by include_file() in this process: {(path, b64): (mtime, size, contents)}
+_included = dict()
+
+def template_dirs(template_mod):
+    """ Directories to load the template files from, the child template before its parent """
+    dirs = [template_mod.template_dir]
+    try:
+        dirs.append(config.avail_templates[template_mod.template_parent].load().template_dir)
+    except AttributeError:
+        pass # Not a child theme
+    return dirs
+
+def cache_dir(name):
+    """ Directory in the MultiQC user cache, or None if it can't be made """
+    path = os.path.join(entry_points.cache_dir(), name)
+    try:
+        os.makedirs(path)
+    except OSError:
+        if not os.path.isdir(path):
+            logger.debug("Can't make cache directory {}, so the report template won't be cached".format(path))
+            return None
+    return path
+
+class BytecodeCache(jinja2.FileSystemBytecodeCache):
+    """ Compiled templates, kept in the user cache. Jinja checks that the
+    template source hasn't changed before using them. """
+
+    def dump_bytecode(self, bucket):
+        try:
+            super(BytecodeCache, self).dump_bytecode(bucket)
+        except (IOError, OSError):
+            pass # Eg. a read-only home directory
+
+def encode_asset(path, assets_dir, st):
+    """
+    Base64 encode a file, using the copy in the asset cache if the file
+    hasn't changed since it was saved there.
+    """
+    header = json.dumps([ASSET_CACHE_VERSION, st.st_mtime, st.st_size])
+    cache_fn = None
+    if assets_dir is not None:
+        cache_fn = os.path.join(assets_dir, '{}.b64'.format(hashlib.sha1(os.path.realpath(path).encode('utf-8')).hexdigest()))
+        try:
+            with io.open(cache_fn, 'r', encoding='utf-8') as fh:
+                if fh.readline().rstrip('\n') == header:
+                    return fh.read()
+        except (IOError, OSError):
+            pass
+    with io.open(path, 'rb') as fh:
+        contents = base64.b64encode(fh.read()).decode('utf-8')
+    if cache_fn is not None:
+        # Written to a temporary file first, so that other runs never read half an asset
+        try:
+            fd, tmp_fn = tempfile.mkstemp(dir=assets_dir, suffix='.tmp')
+            with io.open(fd, 'w', encoding='utf-8') as fh:
+                fh.write(u'{}\n{}'.format(header, contents))
+            os.rename(tmp_fn, cache_fn)
+        except (IOError, OSError):
+            try:
+                os.remove(tmp_fn)
+            except (NameError, OSError):
+                pass
+    return contents
+
+def make_include_file(dirs, assets_dir):
+    """ Function to include file contents in the Jinja template """
+
+    def include_file(name, fdir=dirs, b64=False):
+        if fdir is None:
+            fdir = ['']
+        elif not isinstance(fdir, (list, tuple)):
+            fdir = [fdir]
+        paths = [ os.path.join(d, name) for d in fdir ]
+        path = next(( p for p in paths if os.path.exists(p) ), paths[0])
+        st = os.stat(path)
+        key = (os.path.realpath(path), b64)
+        if key in _included and _included[key][:2] == (st.st_mtime, st.st_size):
+            return _included[key][2]
+        if b64:
+            contents = encode_asset(path, assets_dir, st)
+        else:
+            with io.open (path, "r", encoding='utf-8') as f:
+                contents = f.read()
+        _included[key] = (st.st_mtime, st.st_size, contents)
+        return contents
+
+    return include_file
+
+def get_template(template_mod):
+    """ Load the report template, with its parent template's files underneath it """
+    dirs = tuple(template_dirs(template_mod))
+    if dirs not in _environments:
+        bytecode_dir = cache_dir('jinja_bytecode')
+        env = jinja2.Environment(
+            loader = jinja2.ChoiceLoader([ jinja2.FileSystemLoader(d) for d in dirs ]),
+            bytecode_cache = BytecodeCache(bytecode_dir) if bytecode_dir is not None else None
+        )
+        env.globals['include_file'] = make_include_file(list(dirs), cache_dir(os.path.join('assets', config.template)))
+        _environments[dirs] = env
+    return _environments[dirs].get_template(template_mod.base_fn)
+
+def copy_files(template_mod, dest_dir, extra_dir=None):
+    """ Copy the files that a template asks for to the report directory,
+    from the parent template first so that the child's files overwrite them.
+    Files in extra_dir are copied first of all. """
+    dirs = template_dirs(template_mod)[::-1]
+    if extra_dir is not None:
+        dirs.insert(0, extra_dir)
+    for f in getattr(template_mod, 'copy_files', []):
+        for d in dirs:
+            fn = os.path.join(d, f)
+            if os.path.isdir(fn):
+                util_functions.copy_tree(fn, os.path.join(dest_dir, f))
+            elif os.path.isfile(fn):
+                shutil.copy2(fn, os.path.join(dest_dir, f))
@@ -37,6 +37,50 @@ def robust_rmtree(path, logger=None, max_retries=10):
     shutil.rmtree(path)
 
 
+def copy_tree(src, dst):
+    """Copies a directory tree, adding to any existing destination directory
+    and overwriting files that are already there. Used instead of
+    distutils.dir_util.copy_tree(), as distutils is slow to import.
+    """
+    if not os.path.isdir(dst):
+        os.makedirs(dst)
+    for fn in os.listdir(src):
+        src_fn = os.path.join(src, fn)
+        dst_fn = os.path.join(dst, fn)
+        if os.path.isdir(src_fn):
+            copy_tree(src_fn, dst_fn)
+        else:
+            shutil.copy2(src_fn, dst_fn)
+
+
+# MatPlotLib is slow to import, so it is only loaded when making a flat plot
+_pyplot = None
+_pyplot_error = False
+def import_pyplot():
+    """Imports and returns matplotlib.pyplot, the first time that it is needed.
+    Raises ImportError if MatPlotLib can't be used, so that callers can make
+    interactive plots instead.
+    """
+    global _pyplot, _pyplot_error
+    if _pyplot is None:
+        if _pyplot_error:
+            raise ImportError("MatPlotLib could not be loaded")
+        try:
+            # Import matplot lib but avoid default X environment
+            import matplotlib
+            matplotlib.use('Agg')
+            import matplotlib.pyplot as plt
+            _pyplot = plt
+        except Exception as e:
+            # MatPlotLib can break in a variety of ways. Fake an error message and continue without it if so.
+            print("##### ERROR! MatPlotLib library could not be loaded!    #####", file=sys.stderr)
+            print("##### Flat plots will instead be plotted as interactive #####", file=sys.stderr)
+            config.logger.exception(e)
+            _pyplot_error = True
+            raise ImportError("MatPlotLib could not be loaded")
+    return _pyplot
+
+
 def write_data_file(data, fn, sort_cols=False, data_format=None):
     """ Write a data file to the report directory. Will not do anything
     if config.data_dir is not set.
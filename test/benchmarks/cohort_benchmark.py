@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+
+""" MultiQC large cohort benchmark. Runs MultiQC with --profile on synthetic
+cohorts of different sizes (made with generate_cohort.py) and times file
+discovery, parsing, plotting and rendering, along with the peak memory.
+Cohorts are kept in the data directory, as the large ones take a while to write.
+
+Usage:
+    python test/benchmarks/cohort_benchmark.py
+    python test/benchmarks/cohort_benchmark.py --full --json cohorts.json
+    python test/benchmarks/cohort_benchmark.py -s 5000 --compare cohorts.json
+    python test/benchmarks/cohort_benchmark.py -s 1000 --multiqc-args '--processes 4'
+    python test/benchmarks/cohort_benchmark.py -s 1000 -n 1 --check-merge
+
+Comparing with a baseline:
+    Timings depend on the machine, so no baseline results are kept in the
+    repository. Save a baseline from the commit that you're starting from,
+    then compare your branch with it on the same machine:
+
+        git checkout master
+        python test/benchmarks/cohort_benchmark.py -s 10 -s 1000 --seed 1 --json baseline.json
+        git checkout my-branch
+        python test/benchmarks/cohort_benchmark.py -s 10 -s 1000 --seed 1 --compare baseline.json
+
+    The saved results include the seed, cohort version and MultiQC options
+    that were used, and --compare refuses results made with a different
+    seed or cohort version. Only the cohort sizes in both runs are compared.
+
+Checking merge and --update:
+    --check-merge also runs MultiQC once on each cohort, then on 3 shards
+    joined with 'multiqc merge', then on half of the cohort followed by
+    --update with the other half. The data files of all three must be the same.
+"""
+
+from __future__ import print_function, division
+import click
+import io
+import json
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from generate_cohort import COHORT_VERSION, generate
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+MULTIQC_SCRIPT = os.path.join(REPO_DIR, 'scripts', 'multiqc')
+
+DEFAULT_SIZES = (10, 1000)
+FULL_SIZES = (10, 1000, 10000, 50000)
+
+# Parts of the run that are timed, from the phases in multiqc_profile.json
+METRICS = ['total', 'discovery', 'parsing', 'plotting', 'rendering']
+
+# Timings shorter than this are too noisy to fail a comparison on
+MIN_COMPARE_TIME = 0.5
+
+# Number of --shard runs to merge for --check-merge
+MERGE_SHARDS = 3
+
+# Random plot IDs in the names of flat plot data files
+PLOT_ID_RE = re.compile(r'(hc|mpl)plot_[a-z]{10}')
+
+def run_multiqc(cohort_dir, multiqc_args):
+    """
+    Run MultiQC on a cohort with --profile, in a new process.
+    :return: Dict with the time for each metric in seconds and the peak memory in MB
+    """
+    out_dir = tempfile.mkdtemp()
+    try:
+        cmd = [sys.executable, MULTIQC_SCRIPT, cohort_dir, '-o', out_dir, '--profile', '--quiet'] + multiqc_args
+        with open(os.devnull, 'w') as devnull:
+            start = time.time()
+            proc = subprocess.Popen(cmd, cwd=out_dir, stdout=devnull)
+            peak_rss = None
+            if hasattr(os, 'wait4'):
+                pid, status, rusage = os.wait4(proc.pid, 0)
+                proc.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else 1
+                # Bytes on macOS, kilobytes on Linux
+                peak_rss = rusage.ru_maxrss / (1048576.0 if sys.platform == 'darwin' else 1024.0)
+            else:
+                proc.wait()
+            wall_time = time.time() - start
+        if proc.returncode != 0:
+            raise click.ClickException("MultiQC failed on {}".format(cohort_dir))
+        with io.open(os.path.join(out_dir, 'multiqc_data', 'multiqc_profile.json'), encoding='utf-8') as fh:
+            profile = json.load(fh)
+    finally:
+        shutil.rmtree(out_dir)
+    phases = dict([ (p['name'], p) for p in profile['phases'] ])
+    modules = [ p for p in profile['phases'] if p['type'] == 'module' ]
+    return {
+        'total': wall_time,
+        'discovery': phases['search']['wall_time'] if 'search' in phases else 0,
+        'parsing': sum([ p['parse_time'] + p.get('import_time', 0) for p in modules ]),
+        'plotting': sum([ p['plot_time'] for p in modules ]) + phases.get('general_stats', {}).get('wall_time', 0),
+        'rendering': sum([ phases[name]['wall_time'] for name in ['render', 'write_data'] if name in phases ]),
+        'peak_rss_mb': peak_rss,
+    }
+
+def run_quietly(args, multiqc_args):
+    """ Run MultiQC in a new process, raising a ClickException if it fails """
+    cmd = [sys.executable, MULTIQC_SCRIPT] + args + ['--quiet'] + multiqc_args
+    with open(os.devnull, 'w') as devnull:
+        if subprocess.call(cmd, stdout=devnull) != 0:
+            raise click.ClickException("MultiQC failed: {}".format(' '.join(cmd)))
+
+def split_cohort(cohort_dir):
+    """
+    Split a cohort into two lists of paths, so that searching the first and
+    then the second finds the files in the same order as searching the whole
+    cohort. The file search walks each directory's files before its
+    sub-directories, in the order that they are listed.
+    """
+    top = cohort_dir
+    while True:
+        paths = [ os.path.join(top, fn) for fn in os.listdir(top) ]
+        files = [ p for p in paths if os.path.isfile(p) ]
+        dirs = [ p for p in paths if os.path.isdir(p) ]
+        if len(files) == 0 and len(dirs) == 1:
+            top = dirs[0]
+            continue
+        paths = files + dirs
+        return paths[:len(paths) // 2], paths[len(paths) // 2:]
+
+def read_data_dir(data_dir):
+    """
+    Read the data files in a MultiQC data directory.
+    :return: Dict of {filename: sorted list of file contents}. Flat plot data
+             files are named after random plot IDs, so these are grouped
+             under their name with the ID taken out.
+    """
+    data = dict()
+    for fn in os.listdir(data_dir):
+        if not fn.endswith('.txt'):
+            continue # The log, profile and parsed data are expected to differ
+        with io.open(os.path.join(data_dir, fn), encoding='utf-8') as fh:
+            lines = fh.read().splitlines()
+        # Sources are listed in the order that modules finished parsing them
+        if fn == 'multiqc_sources.txt':
+            lines = sorted(lines)
+        data.setdefault(PLOT_ID_RE.sub('plot', fn), []).append(lines)
+    return dict([ (fn, sorted(contents)) for fn, contents in data.items() ])
+
+def data_differences(data_dir, other_data_dir):
+    """ Names of the data files that differ between two MultiQC data directories """
+    data = read_data_dir(data_dir)
+    other_data = read_data_dir(other_data_dir)
+    return [ fn for fn in sorted(set(data) | set(other_data)) if data.get(fn) != other_data.get(fn) ]
+
+def compare_merged(cohort_dir, multiqc_args):
+    """
+    Check that 'multiqc merge' of shards and --update give the same data
+    as a single run over the whole cohort.
+    :return: Dict of {'merge' / 'update': list of data files that differ}
+    """
+    out_dir = tempfile.mkdtemp()
+    try:
+        full_dir = os.path.join(out_dir, 'full')
+        run_quietly([cohort_dir, '-o', full_dir], multiqc_args)
+        shard_dirs = [ os.path.join(out_dir, 'shard_{}'.format(i)) for i in range(1, MERGE_SHARDS + 1) ]
+        for i, shard_dir in enumerate(shard_dirs, 1):
+            run_quietly([cohort_dir, '--shard', '{}/{}'.format(i, MERGE_SHARDS), '-o', shard_dir], multiqc_args)
+        merged_dir = os.path.join(out_dir, 'merged')
+        run_quietly(['merge'] + shard_dirs + ['-o', merged_dir], multiqc_args)
+        first_paths, other_paths = split_cohort(cohort_dir)
+        first_dir = os.path.join(out_dir, 'first')
+        run_quietly(first_paths + ['-o', first_dir], multiqc_args)
+        updated_dir = os.path.join(out_dir, 'updated')
+        run_quietly(['--update', os.path.join(first_dir, 'multiqc_data')] + other_paths + ['-o', updated_dir], multiqc_args)
+        full_data = os.path.join(full_dir, 'multiqc_data')
+        return {
+            'merge': data_differences(full_data, os.path.join(merged_dir, 'multiqc_data')),
+            'update': data_differences(full_data, os.path.join(updated_dir, 'multiqc_data')),
+        }
+    finally:
+        shutil.rmtree(out_dir)
+
+def run_benchmark(cohort_dir, num_runs, multiqc_args):
+    """ Run MultiQC several times and return the median of each measurement """
+    runs = [ run_multiqc(cohort_dir, multiqc_args) for i in range(num_runs) ]
+    result = dict()
+    for key in runs[0]:
+        values = sorted([ r[key] for r in runs ]) if runs[0][key] is not None else [None]
+        result[key] = None if values[0] is None else round(values[len(values) // 2], 3)
+    return result
+
+@click.command()
+@click.option('-s', '--samples', 'sizes', type=int, multiple=True, help="Cohort size to benchmark. Can be given more than once. Default: {}".format(', '.join(map(str, DEFAULT_SIZES))))
+@click.option('--full', is_flag=True, help="Benchmark cohorts of {} samples. The largest needs around 10 GB of disk".format(', '.join(map(str, FULL_SIZES))))
+@click.option('-n', '--runs', 'num_runs', type=int, default=3, help="Number of runs for each cohort size. Default: 3")
+@click.option('-d', '--data-dir', type=click.Path(file_okay=False), default=os.path.join(tempfile.gettempdir(), 'multiqc_benchmark_cohorts'), help="Where to keep the synthetic cohorts")
+@click.option('--seed', type=int, default=1, help="Random seed for the synthetic data. Default: 1")
+@click.option('--multiqc-args', default='', help="Extra command line options for MultiQC, eg. '--processes 4'")
+@click.option('--json', 'json_fn', type=click.Path(dir_okay=False), help="Save the results to this file")
+@click.option('--compare', 'compare_fn', type=click.Path(exists=True, dir_okay=False), help="Compare with results saved with --json")
+@click.option('--max-slowdown', type=float, default=1.2, help="With --compare, fail if a time or the peak memory is this many times higher. Default: 1.2")
+@click.option('--check-merge', is_flag=True, help="Also check that 'multiqc merge' of {} shards and --update give the same data as a single run".format(MERGE_SHARDS))
+def main(sizes, full, num_runs, data_dir, seed, multiqc_args, json_fn, compare_fn, max_slowdown, check_merge):
+    """ Benchmark MultiQC on large synthetic cohorts """
+    if full:
+        sizes = FULL_SIZES
+    elif len(sizes) == 0:
+        sizes = DEFAULT_SIZES
+    if compare_fn is not None:
+        with io.open(compare_fn) as fh:
+            previous = json.load(fh)
+        if previous.get('seed') != seed or previous.get('cohort_version') != COHORT_VERSION:
+            raise click.ClickException("{} was made with different cohorts (seed {}, cohort version {})".format(
+                compare_fn, previous.get('seed'), previous.get('cohort_version')))
+        previous = previous['results']
+
+    results = dict()
+    merge_differences = dict()
+    print("{:<10} {:>10} {:>10} {:>10} {:>10} {:>10} {:>12}".format('Samples', 'Total (s)', 'Search (s)', 'Parse (s)', 'Plot (s)', 'Render (s)', 'Peak RSS (MB)'))
+    for num_samples in sizes:
+        cohort_dir = os.path.join(data_dir, 'cohort_{}_seed{}_v{}'.format(num_samples, seed, COHORT_VERSION))
+        generate(cohort_dir, num_samples, seed)
+        key = str(num_samples)
+        results[key] = run_benchmark(cohort_dir, num_runs, shlex.split(multiqc_args))
+        r = results[key]
+        print("{:<10} {:>10.2f} {:>10.2f} {:>10.2f} {:>10.2f} {:>10.2f} {:>12}".format(
+            num_samples, r['total'], r['discovery'], r['parsing'], r['plotting'], r['rendering'],
+            '' if r['peak_rss_mb'] is None else '{:.1f}'.format(r['peak_rss_mb'])))
+        if check_merge:
+            merge_differences[key] = compare_merged(cohort_dir, shlex.split(multiqc_args))
+
+    if json_fn is not None:
+        with io.open(json_fn, 'w') as fh:
+            fh.write(json.dumps({'python': sys.version, 'runs': num_runs, 'seed': seed, 'cohort_version': COHORT_VERSION,
+                                 'multiqc_args': multiqc_args, 'results': results}, indent=4, sort_keys=True))
+
+    failed = False
+    for key in sorted(merge_differences, key=int):
+        for check, different in sorted(merge_differences[key].items()):
+            print("{:>7} samples  {:<12} {}".format(key, check, 'differs: ' + ', '.join(different) if different else 'same as a single run'))
+            failed = failed or len(different) > 0
+    if failed:
+        print("Merged or updated reports have different data to a single run!", file=sys.stderr)
+
+    if compare_fn is not None:
+        slower = False
+        for key in sorted(results, key=int):
+            if key not in previous:
+                continue
+            for metric in METRICS + ['peak_rss_mb']:
+                before = previous[key].get(metric)
+                after = results[key][metric]
+                if not before or after is None:
+                    continue
+                ratio = after / before
+                print("{:>7} samples  {:<12} {:>5.2f} x previous".format(key, metric, ratio))
+                if ratio > max_slowdown and (metric == 'peak_rss_mb' or max(before, after) >= MIN_COMPARE_TIME):
+                    slower = True
+        if slower:
+            print("MultiQC is more than {} times slower or bigger than before!".format(max_slowdown), file=sys.stderr)
+            failed = True
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,374 @@
+#!/usr/bin/env python
+
+""" Synthetic cohort generator for MultiQC benchmarks. Writes realistic looking
+output from the main bioinformatics tools for any number of samples, so that
+MultiQC can be timed on large cohorts without downloading any test data.
+The same sample number and seed always give the same files.
+
+For each sample: a FastQC zip, Picard MarkDuplicates, InsertSizeMetrics and
+AlignmentSummaryMetrics, samtools stats, flagstat and idxstats, a Qualimap
+BamQC report, a STAR log, bcftools stats and a custom content line graph.
+Each batch of 100 samples also gets a custom content table.
+
+Usage:
+    python test/benchmarks/generate_cohort.py cohort_dir/ -n 1000
+"""
+
+from __future__ import print_function, division
+import click
+import io
+import os
+import random
+import zipfile
+
+SAMPLES_PER_BATCH = 100
+
+# Increase when the files written for a sample change, so that cohorts
+# written by an older version aren't reused
+COHORT_VERSION = 2
+
+# Chromosomes for samtools idxstats: name and length
+CHROMOSOMES = [ ('chr{}'.format(c), l) for c, l in zip(
+    list(range(1, 23)) + ['X', 'Y', 'M'],
+    [248956422, 242193529, 198295559, 190214555, 181538259, 170805979, 159345973, 145138636, 138394717,
+     133797422, 135086622, 133275309, 114364328, 107043718, 101991189, 90338345, 83257441, 80373285,
+     58617616, 64444167, 46709983, 50818468, 156040895, 57227415, 16569]) ]
+
+def sample_name(i):
+    return 'sample_{:06d}'.format(i)
+
+def fastqc(rnd, s, reads):
+    status = lambda: rnd.choice(['pass', 'pass', 'pass', 'warn', 'fail'])
+    L = ['##FastQC\t0.11.5', '>>Basic Statistics\tpass', '#Measure\tValue',
+         'Filename\t{}_R1.fastq.gz'.format(s), 'File type\tConventional base calls',
+         'Encoding\tSanger / Illumina 1.9', 'Total Sequences\t{}'.format(reads),
+         'Sequences flagged as poor quality\t0', 'Sequence length\t35-151',
+         '%GC\t{}'.format(rnd.randint(38, 55)), '>>END_MODULE']
+    bins = list(range(1, 10)) + [ '{}-{}'.format(b, b + 4) for b in range(10, 150, 5) ]
+    L += ['>>Per base sequence quality\t' + status(),
+          '#Base\tMean\tMedian\tLower Quartile\tUpper Quartile\t10th Percentile\t90th Percentile']
+    q = rnd.uniform(34, 38)
+    for i, b in enumerate(bins):
+        mean = q - i * rnd.uniform(0.05, 0.2)
+        L.append('{}\t{:.3f}\t{:.1f}\t{:.1f}\t{:.1f}\t{:.1f}\t{:.1f}'.format(b, mean, round(mean), mean - 3, mean + 1, mean - 8, mean + 2))
+    L.append('>>END_MODULE')
+    L += ['>>Per tile sequence quality\tpass', '#Tile\tBase\tMean']
+    for tile in range(1101, 1117):
+        for b in bins[::4]:
+            L.append('{}\t{}\t{:.3f}'.format(tile, b, rnd.uniform(-0.5, 0.5)))
+    L.append('>>END_MODULE')
+    L += ['>>Per sequence quality scores\t' + status(), '#Quality\tCount']
+    for qual in range(2, 42):
+        L.append('{}\t{:.1f}'.format(qual, reads * rnd.uniform(0, 0.05) * (qual / 41) ** 4))
+    L.append('>>END_MODULE')
+    L += ['>>Per base sequence content\t' + status(), '#Base\tG\tA\tT\tC']
+    for b in bins:
+        g, a, t = rnd.uniform(20, 30), rnd.uniform(20, 30), rnd.uniform(20, 30)
+        L.append('{}\t{:.3f}\t{:.3f}\t{:.3f}\t{:.3f}'.format(b, g, a, t, 100 - g - a - t))
+    L.append('>>END_MODULE')
+    L += ['>>Per sequence GC content\t' + status(), '#GC Content\tCount']
+    peak = rnd.uniform(40, 55)
+    for gc in range(0, 101):
+        L.append('{}\t{:.1f}'.format(gc, reads / 10.0 / (1 + ((gc - peak) / 6.0) ** 2)))
+    L.append('>>END_MODULE')
+    L += ['>>Per base N content\tpass', '#Base\tN-Count']
+    for b in bins:
+        L.append('{}\t{:.3f}'.format(b, rnd.uniform(0, 0.2)))
+    L.append('>>END_MODULE')
+    L += ['>>Sequence Length Distribution\twarn', '#Length\tCount']
+    for b in bins[-6:]:
+        L.append('{}\t{:.1f}'.format(b, rnd.uniform(1, reads / 5.0)))
+    L.append('>>END_MODULE')
+    L += ['>>Sequence Duplication Levels\t' + status(),
+          '#Total Deduplicated Percentage\t{:.3f}'.format(rnd.uniform(40, 95)),
+          '#Duplication Level\tPercentage of deduplicated\tPercentage of total']
+    for d in ['1', '2', '3', '4', '5', '6', '7', '8', '9', '>10', '>50', '>100', '>500', '>1k', '>5k', '>10k+']:
+        L.append('{}\t{:.3f}\t{:.3f}'.format(d, rnd.uniform(0, 80), rnd.uniform(0, 80)))
+    L.append('>>END_MODULE')
+    if rnd.random() < 0.3:
+        L += ['>>Overrepresented sequences\twarn', '#Sequence\tCount\tPercentage\tPossible Source']
+        for i in range(rnd.randint(1, 5)):
+            L.append('{}\t{}\t{:.3f}\tNo Hit'.format(''.join(rnd.choice('ACGT') for _ in range(50)), rnd.randint(100, 5000), rnd.uniform(0.1, 2)))
+    else:
+        L.append('>>Overrepresented sequences\tpass')
+    L.append('>>END_MODULE')
+    L += ['>>Adapter Content\tpass',
+          '#Position\tIllumina Universal Adapter\tIllumina Small RNA Adapter\tNextera Transposase Sequence\tSOLID Small RNA Adapter']
+    adapter = 0.0
+    for b in bins:
+        adapter += rnd.uniform(0, 0.1)
+        L.append('{}\t{:.4f}\t0.0\t{:.4f}\t0.0'.format(b, adapter, rnd.uniform(0, 0.01)))
+    L.append('>>END_MODULE')
+    return '\n'.join(L) + '\n'
+
+def fastqc_zip(path, rnd, s, reads):
+    """ FastQC zip file, as FastQC writes it """
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('{}_R1_fastqc/'.format(s), '')
+        zf.writestr('{}_R1_fastqc/fastqc_data.txt'.format(s), fastqc(rnd, s, reads))
+        zf.writestr('{}_R1_fastqc/summary.txt'.format(s), 'PASS\tBasic Statistics\t{}_R1.fastq.gz\n'.format(s))
+        zf.writestr('{}_R1_fastqc/fastqc_report.html'.format(s), '<html><body>{}</body></html>\n'.format(s) * 20)
+
+def picard_header(tool, s, extra=''):
+    return ('## htsjdk.samtools.metrics.StringHeader\n'
+            '# picard.{tool} INPUT={s}.bam OUTPUT={s}.txt {extra}VALIDATION_STRINGENCY=SILENT\n'
+            '## htsjdk.samtools.metrics.StringHeader\n'
+            '# Started on: Mon Jan 09 10:00:00 GMT 2017\n\n').format(tool=tool, s=s, extra=extra)
+
+def picard_markdups(rnd, s, reads):
+    pairs = reads // 2
+    dups = int(pairs * rnd.uniform(0.05, 0.4))
+    return picard_header('sam.markduplicates.MarkDuplicates', s, 'METRICS_FILE={}.markdups.txt '.format(s)) + (
+        '## METRICS CLASS\tpicard.sam.DuplicationMetrics\n'
+        'LIBRARY\tUNPAIRED_READS_EXAMINED\tREAD_PAIRS_EXAMINED\tSECONDARY_OR_SUPPLEMENTARY_RDS\tUNMAPPED_READS\t'
+        'UNPAIRED_READ_DUPLICATES\tREAD_PAIR_DUPLICATES\tREAD_PAIR_OPTICAL_DUPLICATES\tPERCENT_DUPLICATION\tESTIMATED_LIBRARY_SIZE\n'
+        '{s}\t{u}\t{p}\t0\t{um}\t{ud}\t{d}\t{o}\t{pct:.6f}\t{lib}\n\n'
+        '## HISTOGRAM\tjava.lang.Double\nBIN\tVALUE\n{hist}\n'
+    ).format(s=s, u=rnd.randint(1000, 50000), p=pairs, um=rnd.randint(0, 5000), ud=rnd.randint(100, 5000), d=dups,
+             o=rnd.randint(0, dups // 10 + 1), pct=dups / pairs, lib=rnd.randint(10 ** 6, 10 ** 8),
+             hist='\n'.join('{:.1f}\t{:.6f}'.format(b, b * rnd.uniform(0.8, 0.99)) for b in range(1, 11)))
+
+def picard_insertsize(rnd, s, reads):
+    mean = rnd.uniform(180, 400)
+    sd = rnd.uniform(30, 90)
+    hist = [ (i, int(reads / 200.0 * 2.718 ** (-((i - mean) / sd) ** 2 / 2))) for i in range(20, 800) ]
+    return picard_header('analysis.CollectInsertSizeMetrics', s, 'HISTOGRAM_FILE={}.pdf '.format(s)) + (
+        '## METRICS CLASS\tpicard.analysis.InsertSizeMetrics\n'
+        'MEDIAN_INSERT_SIZE\tMEDIAN_ABSOLUTE_DEVIATION\tMIN_INSERT_SIZE\tMAX_INSERT_SIZE\tMEAN_INSERT_SIZE\tSTANDARD_DEVIATION\t'
+        'READ_PAIRS\tPAIR_ORIENTATION\tWIDTH_OF_10_PERCENT\tWIDTH_OF_20_PERCENT\tWIDTH_OF_30_PERCENT\tWIDTH_OF_40_PERCENT\t'
+        'WIDTH_OF_50_PERCENT\tWIDTH_OF_60_PERCENT\tWIDTH_OF_70_PERCENT\tWIDTH_OF_80_PERCENT\tWIDTH_OF_90_PERCENT\tWIDTH_OF_99_PERCENT\t'
+        'SAMPLE\tLIBRARY\tREAD_GROUP\n'
+        '{med}\t{mad}\t20\t{mx}\t{mean:.6f}\t{sd:.6f}\t{pairs}\tFR\t{w}\t\t\t\n\n'
+        '## HISTOGRAM\tjava.lang.Integer\ninsert_size\tAll_Reads.fr_count\n{hist}\n\n'
+    ).format(med=int(mean), mad=int(sd * 0.67), mx=rnd.randint(10 ** 4, 10 ** 6), mean=mean, sd=sd, pairs=reads // 2,
+             w='\t'.join(str(int(sd * f)) for f in [0.25, 0.5, 0.77, 1.05, 1.35, 1.7, 2.1, 2.6, 3.3, 6.0]),
+             hist='\n'.join('{}\t{}'.format(i, c) for i, c in hist if c > 0))
+
+def picard_alignment(rnd, s, reads):
+    cols = ['CATEGORY', 'TOTAL_READS', 'PF_READS', 'PCT_PF_READS', 'PF_NOISE_READS', 'PF_READS_ALIGNED', 'PCT_PF_READS_ALIGNED',
+            'PF_ALIGNED_BASES', 'PF_HQ_ALIGNED_READS', 'PF_HQ_ALIGNED_BASES', 'PF_HQ_ALIGNED_Q20_BASES', 'PF_HQ_MEDIAN_MISMATCHES',
+            'PF_MISMATCH_RATE', 'PF_HQ_ERROR_RATE', 'PF_INDEL_RATE', 'MEAN_READ_LENGTH', 'READS_ALIGNED_IN_PAIRS',
+            'PCT_READS_ALIGNED_IN_PAIRS', 'BAD_CYCLES', 'STRAND_BALANCE', 'PCT_CHIMERAS', 'PCT_ADAPTER', 'SAMPLE', 'LIBRARY', 'READ_GROUP']
+    L = ['## METRICS CLASS\tpicard.analysis.AlignmentSummaryMetrics', '\t'.join(cols)]
+    for category, n in [('FIRST_OF_PAIR', reads // 2), ('SECOND_OF_PAIR', reads // 2), ('PAIR', reads)]:
+        aligned = int(n * rnd.uniform(0.8, 0.99))
+        L.append('\t'.join(str(v) for v in [
+            category, n, n, 1, 0, aligned, round(aligned / n, 6), aligned * 148, int(aligned * 0.95), aligned * 140,
+            aligned * 135, 0, round(rnd.uniform(0.002, 0.01), 6), round(rnd.uniform(0.002, 0.01), 6), 0.0002, 148.2,
+            int(aligned * 0.98), 0.98, 0, 0.5, round(rnd.uniform(0.001, 0.02), 6), 0.0001, '', '', '']))
+    return picard_header('analysis.CollectAlignmentSummaryMetrics', s, 'REFERENCE_SEQUENCE=genome.fa ') + '\n'.join(L) + '\n\n'
+
+def samtools_stats(rnd, s, reads):
+    mapped = int(reads * rnd.uniform(0.85, 0.99))
+    fields = [('raw total sequences', reads), ('filtered sequences', 0), ('sequences', reads), ('is sorted', 1),
+              ('1st fragments', reads // 2), ('last fragments', reads // 2), ('reads mapped', mapped),
+              ('reads mapped and paired', int(mapped * 0.97)), ('reads unmapped', reads - mapped),
+              ('reads properly paired', int(mapped * 0.95)), ('reads paired', reads), ('reads duplicated', int(reads * rnd.uniform(0.05, 0.3))),
+              ('reads MQ0', rnd.randint(0, reads // 100)), ('reads QC failed', 0), ('non-primary alignments', rnd.randint(0, reads // 50)),
+              ('total length', reads * 150), ('bases mapped', mapped * 150), ('bases mapped (cigar)', mapped * 148),
+              ('bases trimmed', 0), ('bases duplicated', 0), ('mismatches', mapped), ('error rate', '{:.6e}'.format(rnd.uniform(0.001, 0.01))),
+              ('average length', 150), ('maximum length', 151), ('average quality', round(rnd.uniform(30, 38), 1)),
+              ('insert size average', round(rnd.uniform(180, 400), 1)), ('insert size standard deviation', round(rnd.uniform(30, 90), 1)),
+              ('inward oriented pairs', reads // 3), ('outward oriented pairs', rnd.randint(100, 5000)),
+              ('pairs with other orientation', rnd.randint(10, 500)), ('pairs on different chromosomes', rnd.randint(100, 50000))]
+    L = ['# This file was produced by samtools stats (1.3+htslib-1.3) and can be plotted using plot-bamstats',
+         '# The command line was:  stats {}.bam'.format(s), 'CHK\t1e3f6c8e\t2b5e1c2a\t3c4b1d5e']
+    L += [ 'SN\t{}:\t{}'.format(k, v) for k, v in fields ]
+    for cycle in range(1, 152):
+        L.append('FFQ\t{}\t{}'.format(cycle, '\t'.join(str(rnd.randint(0, 1000)) for _ in range(42))))
+    for gc in range(0, 101):
+        L.append('GCF\t{:.2f}\t{}'.format(gc + 0.25, rnd.randint(0, 100000)))
+    for i in range(1, 500):
+        L.append('IS\t{}\t{}\t{}\t0\t0'.format(i, rnd.randint(0, 10000), rnd.randint(0, 10000)))
+    for cov in range(1, 200):
+        L.append('COV\t[{0}-{0}]\t{0}\t{1}'.format(cov, rnd.randint(0, 10 ** 6)))
+    return '\n'.join(L) + '\n'
+
+def samtools_flagstat(rnd, reads):
+    mapped = int(reads * rnd.uniform(0.85, 0.99))
+    return (
+        '{t} + 0 in total (QC-passed reads + QC-failed reads)\n0 + 0 secondary\n0 + 0 supplementary\n'
+        '{d} + 0 duplicates\n{m} + 0 mapped ({mp:.2f}%:-nan%)\n{t} + 0 paired in sequencing\n{h} + 0 read1\n{h} + 0 read2\n'
+        '{pp} + 0 properly paired ({ppp:.2f}%:-nan%)\n{wm} + 0 with itself and mate mapped\n{si} + 0 singletons ({sip:.2f}%:-nan%)\n'
+        '{dc} + 0 with mate mapped to a different chr\n{dc5} + 0 with mate mapped to a different chr (mapQ>=5)\n'
+    ).format(t=reads, d=int(reads * rnd.uniform(0.05, 0.3)), m=mapped, mp=100.0 * mapped / reads, h=reads // 2,
+             pp=int(mapped * 0.95), ppp=95.0 * mapped / reads, wm=int(mapped * 0.97), si=int(mapped * 0.01),
+             sip=1.0 * mapped / reads, dc=rnd.randint(100, 50000), dc5=rnd.randint(10, 5000))
+
+def samtools_idxstats(rnd, reads):
+    total = sum(l for c, l in CHROMOSOMES)
+    L = [ '{}\t{}\t{}\t{}'.format(c, l, int(reads * l / total * rnd.uniform(0.9, 1.1)), rnd.randint(0, 1000)) for c, l in CHROMOSOMES ]
+    L.append('*\t0\t0\t{}'.format(rnd.randint(1000, 100000)))
+    return '\n'.join(L) + '\n'
+
+def qualimap_genome_results(rnd, s, reads):
+    mapped = int(reads * rnd.uniform(0.85, 0.99))
+    return (
+        'BamQC report\n-----------------------------------\n\n>>>>>>> Input\n\n'
+        '     bam file = {s}.bam\n     outfile = {s}.qc/genome_results.txt\n\n\n>>>>>>> Reference\n\n'
+        '     number of bases = 3,099,734,149 bp\n     number of contigs = 25\n\n\n>>>>>>> Globals\n\n'
+        '     number of windows = 400\n\n     number of reads = {r:,}\n     number of mapped reads = {m:,} ({mp:.2f}%)\n\n'
+        '     number of mapped paired reads (first in pair) = {h:,}\n     number of mapped paired reads (second in pair) = {h:,}\n'
+        '     number of mapped paired reads (both in pair) = {m:,}\n     number of mapped paired reads (singletons) = 0\n\n'
+        '     number of mapped bases = {mb:,} bp\n     number of sequenced bases = {sb:,} bp\n     number of aligned bases = 0 bp\n'
+        '     number of duplicated reads (estimated) = {d:,}\n     duplication rate = {dp:.2f}%\n\n\n>>>>>>> Insert size\n\n'
+        '     mean insert size = {mi:.4f}\n     std insert size = {si:.4f}\n     median insert size = {medi}\n\n\n'
+        '>>>>>>> Mapping quality\n\n     mean mapping quality = {mq:.4f}\n\n\n>>>>>>> ACTG content\n\n'
+        '     GC percentage = {gc:.2f}%\n\n\n>>>>>>> Coverage\n\n     mean coverageData = {cov:.4f}X\n     std coverageData = 12.3X\n'
+    ).format(s=s, r=reads, m=mapped, mp=100.0 * mapped / reads, h=mapped // 2, mb=mapped * 150, sb=mapped * 148,
+             d=int(mapped * 0.1), dp=rnd.uniform(5, 30), mi=rnd.uniform(180, 400), si=rnd.uniform(30, 90),
+             medi=rnd.randint(180, 400), mq=rnd.uniform(30, 60), gc=rnd.uniform(38, 55), cov=rnd.uniform(10, 60))
+
+def qualimap_coverage(rnd):
+    mean = rnd.uniform(10, 60)
+    L = ['#Coverage\tNumber of genomic locations']
+    L += [ '{:.1f}\t{:.1f}'.format(c, int(10 ** 8 * 2.718 ** (-((c - mean) / 10.0) ** 2 / 2))) for c in range(0, 300) ]
+    return '\n'.join(L) + '\n'
+
+def qualimap_insert_size(rnd):
+    mean = rnd.uniform(180, 400)
+    L = ['#Insert size\tOccurrences']
+    L += [ '{:.1f}\t{:.1f}'.format(i, int(10 ** 6 * 2.718 ** (-((i - mean) / 60.0) ** 2 / 2))) for i in range(0, 1000, 2) ]
+    return '\n'.join(L) + '\n'
+
+def qualimap_gc(rnd):
+    peak = rnd.uniform(40, 55)
+    L = ['#GC Content\tSample\tHUMAN (hg19)']
+    L += [ '{:.1f}\t{:.6f}\t{:.6f}'.format(gc, 0.06 / (1 + ((gc - peak) / 6.0) ** 2), 0.06 / (1 + ((gc - 41) / 6.0) ** 2)) for gc in range(0, 101) ]
+    return '\n'.join(L) + '\n'
+
+def star(rnd, reads):
+    unique = int(reads * rnd.uniform(0.7, 0.9))
+    multi = int(reads * rnd.uniform(0.02, 0.08))
+    many = int(reads * 0.001)
+    return (
+        '                                 Started job on |\tJan 09 10:00:00\n'
+        '                             Started mapping on |\tJan 09 10:01:00\n'
+        '                                    Finished on |\tJan 09 10:30:00\n'
+        '       Mapping speed, Million of reads per hour |\t100.00\n\n'
+        '                          Number of input reads |\t{r}\n'
+        '                      Average input read length |\t150\n'
+        '                                    UNIQUE READS:\n'
+        '                   Uniquely mapped reads number |\t{u}\n'
+        '                        Uniquely mapped reads % |\t{up:.2f}%\n'
+        '                          Average mapped length |\t148.50\n'
+        '                       Number of splices: Total |\t{sp}\n'
+        '            Number of splices: Annotated (sjdb) |\t{spa}\n'
+        '                       Number of splices: GT/AG |\t{gt}\n'
+        '                       Number of splices: GC/AG |\t1000\n'
+        '                       Number of splices: AT/AC |\t100\n'
+        '               Number of splices: Non-canonical |\t50\n'
+        '                      Mismatch rate per base, % |\t0.25%\n'
+        '                         Deletion rate per base |\t0.01%\n'
+        '                        Deletion average length |\t1.70\n'
+        '                        Insertion rate per base |\t0.01%\n'
+        '                       Insertion average length |\t1.50\n'
+        '                             MULTI-MAPPING READS:\n'
+        '        Number of reads mapped to multiple loci |\t{mm}\n'
+        '             % of reads mapped to multiple loci |\t{mmp:.2f}%\n'
+        '        Number of reads mapped to too many loci |\t{tm}\n'
+        '             % of reads mapped to too many loci |\t{tmp:.2f}%\n'
+        '                                  UNMAPPED READS:\n'
+        '       % of reads unmapped: too many mismatches |\t0.00%\n'
+        '                 % of reads unmapped: too short |\t{ts:.2f}%\n'
+        '                     % of reads unmapped: other |\t0.50%\n'
+    ).format(r=reads, u=unique, up=100.0 * unique / reads, sp=unique // 3, spa=unique // 4, gt=unique // 3 - 1150,
+             mm=multi, mmp=100.0 * multi / reads, tm=many, tmp=100.0 * many / reads,
+             ts=100.0 * (reads - unique - multi - many) / reads - 0.5)
+
+def bcftools_stats(rnd, s):
+    L = ['# This file was produced by bcftools stats (1.3+htslib-1.3) and can be plotted using plot-vcfstats.',
+         '# The command line was:\tbcftools stats  {}.vcf.gz'.format(s), '# Definition of sets:',
+         'ID\t0\t{}.vcf.gz'.format(s), 'SN\t0\tnumber of samples:\t1',
+         'SN\t0\tnumber of records:\t{}'.format(rnd.randint(10 ** 4, 10 ** 6)), 'SN\t0\tnumber of no-ALTs:\t0',
+         'SN\t0\tnumber of SNPs:\t{}'.format(rnd.randint(10 ** 4, 10 ** 6)), 'SN\t0\tnumber of MNPs:\t0',
+         'SN\t0\tnumber of indels:\t{}'.format(rnd.randint(10 ** 3, 10 ** 5)), 'SN\t0\tnumber of others:\t0',
+         'SN\t0\tnumber of multiallelic sites:\t{}'.format(rnd.randint(10, 1000)),
+         'SN\t0\tnumber of multiallelic SNP sites:\t{}'.format(rnd.randint(10, 1000)),
+         'TSTV\t0\t{}\t{}\t2.05\t{}\t{}\t2.05'.format(*[rnd.randint(10 ** 4, 10 ** 5) for _ in range(4)])]
+    for t in ['A>C', 'A>G', 'A>T', 'C>A', 'C>G', 'C>T', 'G>A', 'G>C', 'G>T', 'T>A', 'T>C', 'T>G']:
+        L.append('ST\t0\t{}\t{}'.format(t, rnd.randint(1000, 90000)))
+    for q in range(0, 100):
+        L.append('QUAL\t0\t{}\t{}\t{}\t{}'.format(q, rnd.randint(0, 9000), rnd.randint(0, 9000), rnd.randint(0, 900)))
+    for l in range(-20, 21):
+        if l != 0:
+            L.append('IDD\t0\t{}\t{}\t0\t.'.format(l, rnd.randint(0, 5000)))
+    L.append('PSC\t0\t{}\t0\t{}\t{}\t0\t0\t30.0\t0\t0\t0'.format(s, rnd.randint(1000, 90000), rnd.randint(1000, 90000)))
+    for d in range(0, 500):
+        L.append('DP\t0\t{}\t0\t0.000000\t{}\t{:.6f}'.format(d, rnd.randint(0, 9000), rnd.uniform(0, 5)))
+    return '\n'.join(L) + '\n'
+
+def custom_linegraph(rnd, s):
+    """ Custom content: per-sample line graph, merged by its section id """
+    L = ["# id: 'gene_body_coverage'", "# section_name: 'Gene body coverage'", "# plot_type: 'linegraph'",
+         "# pconfig:", "#     xlab: 'Gene body percentile'", "#     ylab: 'Coverage'"]
+    bias = rnd.uniform(-0.3, 0.3)
+    L += [ '{}\t{:.4f}'.format(p, 1 + bias * (p - 50) / 50.0 + rnd.uniform(-0.05, 0.05)) for p in range(1, 101) ]
+    return '\n'.join(L) + '\n'
+
+def custom_table(rnd, samples):
+    """ Custom content: table for a batch of samples """
+    L = ["# id: 'library_prep'", "# section_name: 'Library preparation'", "# plot_type: 'table'",
+         'Sample\tConcentration (ng/ul)\tRIN\tFragment size\tPlate\tWell']
+    for s in samples:
+        L.append('{}\t{:.2f}\t{:.1f}\t{}\tplate_{}\t{}{}'.format(s, rnd.uniform(1, 100), rnd.uniform(5, 10), rnd.randint(250, 600),
+                 rnd.randint(1, 20), rnd.choice('ABCDEFGH'), rnd.randint(1, 12)))
+    return '\n'.join(L) + '\n'
+
+def write(path, text):
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with io.open(path, 'w', encoding='utf-8', newline='\n') as fh:
+        fh.write(text if not isinstance(text, bytes) else text.decode('utf-8'))
+
+def write_sample(outdir, i, seed):
+    """ Write all of the tool outputs for sample number i """
+    rnd = random.Random(seed * 1000003 + i)
+    s = sample_name(i)
+    d = os.path.join(outdir, 'batch_{:04d}'.format(i // SAMPLES_PER_BATCH), s)
+    reads = rnd.randint(10 ** 6, 10 ** 8)
+    os.makedirs(os.path.join(d, 'fastqc'))
+    fastqc_zip(os.path.join(d, 'fastqc', '{}_R1_fastqc.zip'.format(s)), rnd, s, reads)
+    write(os.path.join(d, 'picard', '{}.markdups.txt'.format(s)), picard_markdups(rnd, s, reads))
+    write(os.path.join(d, 'picard', '{}.insert_size_metrics.txt'.format(s)), picard_insertsize(rnd, s, reads))
+    write(os.path.join(d, 'picard', '{}.alignment_summary_metrics.txt'.format(s)), picard_alignment(rnd, s, reads))
+    write(os.path.join(d, 'samtools', '{}.stats'.format(s)), samtools_stats(rnd, s, reads))
+    write(os.path.join(d, 'samtools', '{}.flagstat'.format(s)), samtools_flagstat(rnd, reads))
+    write(os.path.join(d, 'samtools', '{}.idxstats'.format(s)), samtools_idxstats(rnd, reads))
+    qm_dir = os.path.join(d, 'qualimap', s)
+    write(os.path.join(qm_dir, 'genome_results.txt'), qualimap_genome_results(rnd, s, reads))
+    write(os.path.join(qm_dir, 'raw_data_qualimapReport', 'coverage_histogram.txt'), qualimap_coverage(rnd))
+    write(os.path.join(qm_dir, 'raw_data_qualimapReport', 'insert_size_histogram.txt'), qualimap_insert_size(rnd))
+    write(os.path.join(qm_dir, 'raw_data_qualimapReport', 'mapped_reads_gc-content_distribution.txt'), qualimap_gc(rnd))
+    write(os.path.join(d, 'star', '{}Log.final.out'.format(s)), star(rnd, reads))
+    write(os.path.join(d, 'star', '{}Log.out'.format(s)), 'STAR log for {}\n'.format(s) * 200)
+    write(os.path.join(d, 'bcftools', '{}.bcftools_stats.txt'.format(s)), bcftools_stats(rnd, s))
+    write(os.path.join(d, 'custom_content', '{}_mqc.txt'.format(s)), custom_linegraph(rnd, s))
+
+def generate(outdir, num_samples, seed=1, progress=False):
+    """
+    Write a synthetic cohort.
+    :param outdir: Directory to write to. Sample directories that already exist are skipped.
+    :param num_samples: Number of samples
+    :param seed: Random seed, the same seed always gives the same files
+    :param progress: Show a progress bar
+    """
+    with click.progressbar(range(num_samples), label="Writing {} samples".format(num_samples), file=None if progress else io.StringIO()) as samples:
+        for i in samples:
+            if not os.path.isdir(os.path.join(outdir, 'batch_{:04d}'.format(i // SAMPLES_PER_BATCH), sample_name(i))):
+                write_sample(outdir, i, seed)
+    for b in range(0, num_samples, SAMPLES_PER_BATCH):
+        rnd = random.Random(seed * 1000003 - b - 1)
+        batch = [ sample_name(i) for i in range(b, min(b + SAMPLES_PER_BATCH, num_samples)) ]
+        write(os.path.join(outdir, 'batch_{:04d}'.format(b // SAMPLES_PER_BATCH), 'library_prep_mqc.tsv'), custom_table(rnd, batch))
+
+@click.command()
+@click.argument('outdir', type=click.Path(file_okay=False))
+@click.option('-n', '--samples', 'num_samples', type=int, default=100, help="Number of samples. Default: 100")
+@click.option('--seed', type=int, default=1, help="Random seed. Default: 1")
+def main(outdir, num_samples, seed):
+    """ Write synthetic tool outputs for a cohort of samples """
+    generate(outdir, num_samples, seed, progress=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+""" MultiQC start-up benchmark. Times how long a fresh Python process takes to
+import MultiQC and to run 'multiqc --version', so that changes which slow down
+start-up can be spotted. Each run uses a new process, as imports are cached.
+
+Usage:
+    python test/benchmarks/import_time.py
+    python test/benchmarks/import_time.py -n 20 --json startup.json
+    python test/benchmarks/import_time.py --compare startup.json
+    python test/benchmarks/import_time.py --importtime
+"""
+
+from __future__ import print_function
+import click
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+MULTIQC_SCRIPT = os.path.join(REPO_DIR, 'scripts', 'multiqc')
+
+BENCHMARKS = [
+    ('import multiqc', [sys.executable, '-c', 'import multiqc']),
+    ('import multiqc modules', [sys.executable, '-c', 'import multiqc; from multiqc.utils import report; from multiqc.plots import bargraph, linegraph, table']),
+    ('multiqc --version', [sys.executable, MULTIQC_SCRIPT, '--version']),
+]
+
+def time_command(cmd, env):
+    """ Run a command and return how long it took, in milliseconds """
+    with open(os.devnull, 'w') as devnull:
+        start = time.time()
+        subprocess.check_call(cmd, env=env, cwd=tempfile.gettempdir(), stdout=devnull)
+        return (time.time() - start) * 1000
+
+def run_benchmark(cmd, num_runs, cold_cache):
+    """
+    Time a command several times. With cold_cache, each run gets an empty
+    cache directory, as on the first run after installing MultiQC.
+    :return: Dict with the min, median and max times in milliseconds
+    """
+    times = list()
+    for i in range(num_runs):
+        env = dict(os.environ)
+        cache_dir = None
+        if cold_cache:
+            cache_dir = tempfile.mkdtemp()
+            env['XDG_CACHE_HOME'] = cache_dir
+        try:
+            times.append(time_command(cmd, env))
+        finally:
+            if cache_dir is not None:
+                shutil.rmtree(cache_dir)
+    times.sort()
+    return {
+        'min': round(times[0], 1),
+        'median': round(times[len(times) // 2], 1),
+        'max': round(times[-1], 1)
+    }
+
+def slowest_imports(cmd, num_imports):
+    """ Use python -X importtime to list the imports that take the longest """
+    output = subprocess.check_output(cmd[:1] + ['-X', 'importtime'] + cmd[1:], stderr=subprocess.STDOUT,
+                                     cwd=tempfile.gettempdir(), universal_newlines=True)
+    imports = list()
+    for line in output.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            fields = [ f.strip() for f in line[len('import time:'):].split('|') ]
+            if fields[0].isdigit():
+                imports.append((int(fields[1]) / 1000.0, fields[2]))
+    imports.sort(reverse=True)
+    return imports[:num_imports]
+
+@click.command()
+@click.option('-n', '--runs', 'num_runs', type=int, default=10, help="Number of runs of each benchmark")
+@click.option('--json', 'json_fn', type=click.Path(dir_okay=False), help="Save the results to this file")
+@click.option('--compare', 'compare_fn', type=click.Path(exists=True, dir_okay=False), help="Compare with results saved with --json")
+@click.option('--max-slowdown', type=float, default=1.2, help="With --compare, fail if a median time is this many times slower. Default: 1.2")
+@click.option('--importtime', is_flag=True, help="List the slowest imports for each benchmark (Python 3.7+)")
+def main(num_runs, json_fn, compare_fn, max_slowdown, importtime):
+    """ Benchmark how long MultiQC takes to start """
+    results = dict()
+    for name, cmd in BENCHMARKS:
+        # Make sure that the entry point cache exists for the warm runs
+        time_command(cmd, dict(os.environ))
+        for cache in ['cached', 'uncached']:
+            key = '{} ({})'.format(name, cache)
+            results[key] = run_benchmark(cmd, num_runs, cache == 'uncached')
+            print("{:<45} min {:>7.1f} ms   median {:>7.1f} ms   max {:>7.1f} ms".format(key, results[key]['min'], results[key]['median'], results[key]['max']))
+        if importtime:
+            for ms, module in slowest_imports(cmd, 10):
+                print("    {:>7.1f} ms  {}".format(ms, module))
+
+    if json_fn is not None:
+        with io.open(json_fn, 'w') as fh:
+            fh.write(json.dumps({'python': sys.version, 'runs': num_runs, 'results': results}, indent=4, sort_keys=True))
+
+    if compare_fn is not None:
+        with io.open(compare_fn) as fh:
+            previous = json.load(fh)['results']
+        slower = False
+        for key in sorted(results):
+            if key in previous:
+                ratio = results[key]['median'] / previous[key]['median']
+                print("{:<45} {:>5.2f} x previous median".format(key, ratio))
+                if ratio > max_slowdown:
+                    slower = True
+        if slower:
+            print("Start-up is more than {} times slower than before!".format(max_slowdown), file=sys.stderr)
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()